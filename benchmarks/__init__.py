@@ -0,0 +1,11 @@
+# Performance benchmarks for the engine.
+#
+# profiles builds the characters from the scripts in scripts/ as fixtures,
+# benchmark times the calculator entry points on them, and the cold import of
+# the engine in a new interpreter, and compares the results with a baseline.
+# runbenchmarks.py is the command line front end:
+#
+#   python benchmarks/runbenchmarks.py --output new.json --baseline old.json
+#
+# exits with status 1 when a benchmark got slower than the baseline by more
+# than the threshold.
@@ -0,0 +1,208 @@
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import timeit
+
+from benchmarks import profiles
+
+# The benchmarks are (profile, name, function) triples; function runs the
+# benchmarked call on a calculator built by the profile. Every call gets a
+# calculator of its own, built outside the timed section.
+
+aldriana_cases = [
+    ('get_dps', lambda calculator: calculator.get_dps()),
+    ('get_dps_breakdown', lambda calculator: calculator.get_dps_breakdown()),
+    ('get_ep', lambda calculator: calculator.get_ep()),
+    ('get_weapon_ep', lambda calculator: calculator.get_weapon_ep(dps=True, enchants=True)),
+    ('get_upgrades_ep', lambda calculator: calculator.get_upgrades_ep(profiles.upgrades)),
+    ('get_upgrades_ep_fast', lambda calculator: calculator.get_upgrades_ep_fast(profiles.upgrades)),
+    ('get_talents_ranking', lambda calculator: calculator.get_talents_ranking()),
+    ('get_glyphs_ranking', lambda calculator: calculator.get_glyphs_ranking()),
+]
+
+cases = []
+for profile in ('assassination', 'combat', 'subtlety'):
+    for name, function in aldriana_cases:
+        cases.append((profile, name, function))
+cases.append(('darkmantle', 'get_dps_breakdown', lambda calculator: calculator.get_dps_breakdown()))
+
+# The modules whose cold import is timed, under the 'import' profile.
+import_cases = ['shadowcraft.calcs.rogue.Aldriana']
+import_profile = 'import'
+root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Results files carry this, so that files from an incompatible version of
+# the runner are not compared.
+results_format = 1
+
+
+def get_cases(profile_names=None, case_names=None):
+    return [(profile, name, function) for profile, name, function in cases
+            if (not profile_names or profile in profile_names) and (not case_names or name in case_names)]
+
+
+class NullOutput(object):
+    # Swallows what the engine prints while being timed.
+
+    def write(self, text):
+        pass
+
+    def flush(self):
+        pass
+
+
+def time_case(build, function, repeat=5, min_sample_time=.2, max_number=1000):
+    # Times function the way timeit does: a sample is number calls in a row,
+    # number being picked so that a sample takes at least min_sample_time,
+    # and the garbage collector is off during samples. Returns the per call
+    # times of the repeat samples.
+    def run_sample(number):
+        calculators = [build() for i in xrange(number)]
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            start = timeit.default_timer()
+            for calculator in calculators:
+                function(calculator)
+            return (timeit.default_timer() - start) / number
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    # The first call warms up the module level caches and tells how many
+    # calls a sample needs.
+    warmup_time = run_sample(1)
+    number = int(min(max(min_sample_time / max(warmup_time, 1e-9), 1), max_number))
+    return [run_sample(number) for i in xrange(repeat)], number
+
+
+def time_import(module, repeat=5):
+    # Times the import of module in a new interpreter per sample, the way a
+    # short lived script pays for it. The .pyc files are written by a first,
+    # untimed, run, even when PYTHONDONTWRITEBYTECODE is set.
+    script = 'import time\nstart = time.time()\nimport {0}\nprint repr(time.time() - start)'.format(module)
+    environment = dict(os.environ)
+    environment.pop('PYTHONDONTWRITEBYTECODE', None)
+    if environment.get('PYTHONPATH'):
+        environment['PYTHONPATH'] = os.pathsep.join([root, environment['PYTHONPATH']])
+    else:
+        environment['PYTHONPATH'] = root
+    def run_sample():
+        return float(subprocess.check_output([sys.executable, '-c', script], cwd=root, env=environment))
+    run_sample()
+    return [run_sample() for i in xrange(repeat)]
+
+
+def get_statistics(times, number):
+    ordered = sorted(times)
+    middle = len(ordered) // 2
+    if len(ordered) % 2:
+        median = ordered[middle]
+    else:
+        median = (ordered[middle - 1] + ordered[middle]) / 2
+    return {
+        'best': ordered[0],
+        'median': median,
+        'worst': ordered[-1],
+        'repeat': len(times),
+        'number': number,
+    }
+
+
+def run(profile_names=None, case_names=None, repeat=5, min_sample_time=.2, progress=None):
+    # Runs the benchmarks and returns the results, ready to be dumped as
+    # JSON. progress, if given, is called with each benchmark key and
+    # statistics as they complete.
+    results = {}
+    stdout = sys.stdout
+    for profile, name, function in get_cases(profile_names, case_names):
+        key = '{0}/{1}'.format(profile, name)
+        sys.stdout = NullOutput()
+        try:
+            times, number = time_case(profiles.profiles[profile], function, repeat, min_sample_time)
+        finally:
+            sys.stdout = stdout
+        results[key] = get_statistics(times, number)
+        if progress is not None:
+            progress(key, results[key])
+    if not profile_names or import_profile in profile_names:
+        for module in import_cases:
+            if case_names and module not in case_names:
+                continue
+            key = '{0}/{1}'.format(import_profile, module)
+            results[key] = get_statistics(time_import(module, repeat), 1)
+            if progress is not None:
+                progress(key, results[key])
+    return {
+        'format': results_format,
+        'environment': get_environment(),
+        'results': results,
+    }
+
+
+def get_environment():
+    environment = profiles.get_combat_calculator().get_engine_info()
+    environment.update({
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+    })
+    return environment
+
+
+def save(results, path):
+    with open(path, 'w') as results_file:
+        json.dump(results, results_file, indent=2, sort_keys=True)
+
+
+def load(path):
+    with open(path) as results_file:
+        results = json.load(results_file)
+    if results.get('format') != results_format:
+        raise ValueError('{0} is not a benchmark results file of format {1}'.format(path, results_format))
+    return results
+
+
+def compare(results, baseline, threshold=.1, statistic='best'):
+    # Compares each benchmark found in both results with statistic, the best
+    # time by default as it is the least noisy. Returns a list of (key, old
+    # time, new time, ratio, regressed) tuples, where regressed is True when
+    # the new time is more than threshold (a fraction) above the old one.
+    comparison = []
+    for key in sorted(results['results']):
+        if key not in baseline['results']:
+            continue
+        old_time = baseline['results'][key][statistic]
+        new_time = results['results'][key][statistic]
+        ratio = new_time / old_time if old_time else float('inf')
+        comparison.append((key, old_time, new_time, ratio, ratio > 1 + threshold))
+    return comparison
+
+
+def get_table(results, comparison=None):
+    # The results as a text table, with the baseline times and ratios when
+    # comparison is given.
+    compared = {}
+    for key, old_time, new_time, ratio, regressed in comparison or []:
+        compared[key] = (old_time, ratio, regressed)
+    keys = sorted(results['results'])
+    width = max([len(key) for key in keys] + [9])
+    header = '{0:<{width}}  {1:>11}  {2:>11}  {3:>6}'.format('benchmark', 'best ms', 'median ms', 'calls', width=width)
+    if comparison is not None:
+        header += '  {0:>11}  {1:>7}'.format('baseline ms', 'ratio')
+    lines = [header]
+    for key in keys:
+        statistics = results['results'][key]
+        line = '{0:<{width}}  {1:>11.3f}  {2:>11.3f}  {3:>6}'.format(key, statistics['best'] * 1000,
+            statistics['median'] * 1000, statistics['number'] * statistics['repeat'], width=width)
+        if key in compared:
+            old_time, ratio, regressed = compared[key]
+            line += '  {0:>11.3f}  {1:>7.3f}'.format(old_time * 1000, ratio)
+            if regressed:
+                line += '  SLOWER'
+        lines.append(line)
+    return '\n'.join(lines)
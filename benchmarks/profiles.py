@@ -0,0 +1,116 @@
+from shadowcraft.calcs.darkmantle import settings as darkmantle_settings
+from shadowcraft.calcs.darkmantle.rogue import RogueDarkmantleCalculator
+from shadowcraft.calcs.rogue.Aldriana import AldrianasRogueDamageCalculator
+from shadowcraft.calcs.rogue.Aldriana import settings
+from shadowcraft.objects import buffs
+from shadowcraft.objects import glyphs
+from shadowcraft.objects import procs
+from shadowcraft.objects import race
+from shadowcraft.objects import stats
+from shadowcraft.objects import talents
+
+# The characters the benchmarks run on. The three Aldriana profiles are the
+# ones in scripts/assassination.py, scripts/combat.py and scripts/subtlety.py;
+# the darkmantle one is scripts/dm_combat.py with the inputs the current data
+# no longer has swapped out, and a fight long enough to be measurable. Each
+# call builds a new calculator, as the calculators keep state between calls.
+
+wod_buffs = (
+    'stat_multiplier_buff',
+    'crit_chance_buff',
+    'mastery_buff',
+    'haste_buff',
+    'multistrike_buff',
+    'versatility_buff',
+    'attack_power_buff',
+    'physical_vulnerability_debuff',
+    'spell_damage_debuff',
+)
+
+# The item list for the get_upgrades_ep benchmarks.
+upgrades = {
+    'scales_of_doom': [680, 691, 700],
+    'malicious_censer': [(700, 705), 715],
+}
+
+
+def get_assassination_calculator():
+    test_buffs = buffs.Buffs(*(wod_buffs + ('agi_flask_mop', 'food_mop_agi')))
+    test_mh = stats.Weapon(812.0, 1.8, 'dagger', 'mark_of_the_shattered_hand')
+    test_oh = stats.Weapon(812.0, 1.8, 'dagger', 'mark_of_the_frostwolf')
+    test_procs = procs.ProcsList(('scales_of_doom', 691), ('beating_heart_of_the_mountain', 701),
+                                 'draenic_agi_pot', 'draenic_agi_prepot', 'archmages_greater_incandescence')
+    test_gear_buffs = stats.GearBuffs('gear_specialization')
+    test_stats = stats.Stats(test_mh, test_oh, test_procs, test_gear_buffs, agi=3650, stam=2426, crit=1539, haste=0,
+                             mastery=1615, readiness=0, versatility=122, multistrike=1034)
+    test_talents = talents.Talents('3322122', 'rogue', 100)
+    test_glyphs = glyphs.Glyphs('rogue', 'disappearance', 'sprint', 'vendetta')
+    test_cycle = settings.AssassinationCycle(min_envenom_size_non_execute=4, min_envenom_size_execute=5)
+    test_settings = settings.Settings(test_cycle, response_time=.5, duration=360, dmg_poison='dp', utl_poison='lp',
+                                      is_pvp=False, use_opener='always', opener_name='mutilate')
+    return AldrianasRogueDamageCalculator(test_stats, test_talents, test_glyphs, test_buffs, race.Race('none'),
+                                          test_settings, 100)
+
+
+def get_combat_calculator():
+    test_buffs = buffs.Buffs(*(('short_term_haste_buff',) + wod_buffs + ('flask_wod_agi', 'food_mop_agi')))
+    test_mh = stats.Weapon(410., 2.6, 'sword', 'dancing_steel')
+    test_oh = stats.Weapon(410., 2.6, 'sword', 'dancing_steel')
+    test_procs = procs.ProcsList(('assurance_of_consequence', 588), ('draenic_philosophers_stone', 620), 'virmens_bite',
+                                 'virmens_bite_prepot', 'archmages_incandescence')
+    test_gear_buffs = stats.GearBuffs('gear_specialization', 'rogue_t17_2pc', 'rogue_t17_4pc')
+    test_stats = stats.Stats(test_mh, test_oh, test_procs, test_gear_buffs, agi=3650, stam=2426, crit=1039, haste=1100,
+                             mastery=1015, readiness=0, versatility=122, multistrike=1034)
+    test_talents = talents.Talents('3111121', 'rogue', 100)
+    test_glyphs = glyphs.Glyphs('rogue', 'energy', 'disappearance')
+    test_cycle = settings.CombatCycle(revealing_strike_pooling=True, blade_flurry=False, dfa_during_ar=True)
+    test_settings = settings.Settings(test_cycle, response_time=.5, duration=360, dmg_poison='dp', utl_poison='lp',
+                                      latency=.03, merge_damage=True, use_opener='always', opener_name='ambush',
+                                      num_boss_adds=0.0, adv_params="")
+    return AldrianasRogueDamageCalculator(test_stats, test_talents, test_glyphs, test_buffs, race.Race('troll'),
+                                          test_settings, 100)
+
+
+def get_subtlety_calculator():
+    test_buffs = buffs.Buffs(*(('short_term_haste_buff',) + wod_buffs + ('flask_wod_agi', 'food_mop_agi')))
+    test_mh = stats.Weapon(812.0, 1.8, 'dagger', 'mark_of_the_shattered_hand')
+    test_oh = stats.Weapon(812.0, 1.8, 'dagger', 'mark_of_the_frostwolf')
+    test_procs = procs.ProcsList(('scales_of_doom', 691), ('beating_heart_of_the_mountain', 701),
+                                 'draenic_agi_pot', 'draenic_agi_prepot', 'archmages_greater_incandescence')
+    test_gear_buffs = stats.GearBuffs('gear_specialization')
+    test_stats = stats.Stats(test_mh, test_oh, test_procs, test_gear_buffs, agi=3650, stam=2426, crit=1039, haste=0,
+                             mastery=1315, readiness=0, versatility=122, multistrike=1834)
+    test_talents = talents.Talents('2000002', 'rogue', 100)
+    test_glyphs = glyphs.Glyphs('rogue')
+    test_cycle = settings.SubtletyCycle(5, use_hemorrhage='never', clip_fw=False)
+    test_settings = settings.Settings(test_cycle, response_time=.5, duration=360, dmg_poison='dp', utl_poison='lp',
+                                      adv_params="")
+    return AldrianasRogueDamageCalculator(test_stats, test_talents, test_glyphs, test_buffs, race.Race('night_elf'),
+                                          test_settings, 100)
+
+
+def get_darkmantle_calculator():
+    test_buffs = buffs.Buffs('short_term_haste_buff', 'stat_multiplier_buff', 'crit_chance_buff', 'mastery_buff',
+                             'haste_buff', 'multistrike_buff', 'attack_power_buff', 'physical_vulnerability_debuff',
+                             'spell_damage_debuff')
+    test_mh = stats.Weapon(571.0, 2.6, 'axe', 'dancing_steel')
+    test_oh = stats.Weapon(571.0, 2.6, 'axe', 'dancing_steel')
+    test_procs = procs.ProcsList(('assurance_of_consequence', 580))
+    test_gear_buffs = stats.GearBuffs('gear_specialization')
+    test_stats = stats.Stats(test_mh, test_oh, test_procs, test_gear_buffs, agi=862, stam=1000, crit=87, haste=553,
+                             mastery=200, versatility=160, multistrike=120)
+    test_talents = talents.Talents('332213', 'rogue', 90)
+    test_glyphs = glyphs.Glyphs('rogue', 'recuperate')
+    test_cycle = darkmantle_settings.CombatCycle()
+    test_settings = darkmantle_settings.Settings(test_cycle, response_time=.5, latency=.03, merge_damage=True,
+                                                 style='time', limit=300)
+    return RogueDarkmantleCalculator(test_stats, test_talents, test_glyphs, test_buffs, race.Race('pandaren'),
+                                     test_settings, 90)
+
+
+profiles = {
+    'assassination': get_assassination_calculator,
+    'combat': get_combat_calculator,
+    'subtlety': get_subtlety_calculator,
+    'darkmantle': get_darkmantle_calculator,
+}
@@ -0,0 +1,56 @@
+from os import path
+import optparse
+import sys
+sys.path.append(path.abspath(path.join(path.dirname(__file__), '..')))
+
+from benchmarks import benchmark
+from benchmarks import profiles
+
+
+def main(arguments=None):
+    parser = optparse.OptionParser(usage='%prog [options]')
+    parser.add_option('-o', '--output', help='write the results as JSON to this file')
+    parser.add_option('-b', '--baseline', help='compare with the results in this file')
+    parser.add_option('-t', '--threshold', type='float', default=.1,
+                      help='fail when a benchmark is slower than the baseline by more than this fraction [%default]')
+    parser.add_option('-p', '--profile', action='append', choices=sorted(profiles.profiles) + [benchmark.import_profile],
+                      help='only run the benchmarks for this profile, can be repeated')
+    parser.add_option('-c', '--case', action='append',
+                      help='only run this benchmark, e.g. get_ep or shadowcraft.calcs.rogue.Aldriana, can be repeated')
+    parser.add_option('-r', '--repeat', type='int', default=5, help='samples per benchmark [%default]')
+    parser.add_option('-s', '--sample-time', type='float', default=.2,
+                      help='minimum duration of a sample in seconds [%default]')
+    options, positional = parser.parse_args(arguments)
+    if positional:
+        parser.error('unexpected arguments: {0}'.format(' '.join(positional)))
+
+    baseline = None
+    if options.baseline:
+        baseline = benchmark.load(options.baseline)
+
+    def progress(key, statistics):
+        sys.stderr.write('{0}: {1:.3f} ms\n'.format(key, statistics['best'] * 1000))
+
+    results = benchmark.run(options.profile, options.case, options.repeat, options.sample_time, progress)
+    if not results['results']:
+        parser.error('no benchmark matches the given profiles and cases')
+    if options.output:
+        benchmark.save(results, options.output)
+
+    comparison = None
+    if baseline is not None:
+        comparison = benchmark.compare(results, baseline, options.threshold)
+        if baseline['environment'] != results['environment']:
+            print 'Warning: the baseline was run in a different environment.'
+    print benchmark.get_table(results, comparison)
+
+    regressions = [key for key, old_time, new_time, ratio, regressed in comparison or [] if regressed]
+    if regressions:
+        print '{0} benchmark(s) slower than the baseline by more than {1:.0%}: {2}'.format(
+            len(regressions), options.threshold, ', '.join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
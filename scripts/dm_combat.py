@@ -6,6 +6,7 @@ sys.path.append(path.abspath(path.join(path.dirname(__file__), '..')))
 from shadowcraft.calcs.darkmantle import DarkmantleCalculator
 from shadowcraft.calcs.darkmantle.rogue import RogueDarkmantleCalculator
 from shadowcraft.calcs.darkmantle import settings
+from shadowcraft.calcs.darkmantle import tracing
 
 from shadowcraft.objects import buffs
 from shadowcraft.objects import race
@@ -83,6 +84,9 @@ test_settings = settings.Settings(test_cycle, response_time=.5, latency=.03, mer
 # Build a DPS object.
 calculator = RogueDarkmantleCalculator(test_stats, test_talents, test_glyphs, test_buffs, test_race, test_settings, test_level)
 
+# Print every event as it happens.
+calculator.tracer = tracing.Tracer(tracing.EVENTS, [tracing.StreamSink()])
+
 # Compute DPS Breakdown.
 dps_breakdown = calculator.get_dps_breakdown()
 total_dps = sum(entry[1] for entry in dps_breakdown.items())
@@ -1,11 +1,14 @@
 import gettext
 import __builtin__
-import math
 
 __builtin__._ = gettext.gettext
 
 from shadowcraft.core import exceptions
 from shadowcraft.calcs import armor_mitigation
+from shadowcraft.calcs import dps_cache
+from shadowcraft.calcs import parallel
+from shadowcraft.calcs import proc_engine
+from shadowcraft.calcs import timing_recorder
 from shadowcraft.objects import class_data
 from shadowcraft.objects import talents
 from shadowcraft.objects import procs
@@ -26,8 +29,17 @@ class DamageCalculator(object):
     # Override this in your class specfic subclass to list appropriate stats
     # possible values are agi, str, spi, int, haste, crit, mastery
     default_ep_stats = []
+    # The step of the finite differences of get_dps_gradient, in rating points.
+    gradient_step = 1.
     # normalize_ep_stat is the stat with value 1 EP, override in your subclass
     normalize_ep_stat = None
+    # Set this to a dps_cache.DpsCache, on the class or on an instance, to
+    # memoize get_dps and get_dps_breakdown by input fingerprint. A single
+    # cache can be shared by any number of calculators.
+    dps_cache = None
+    # Set this to a timing_recorder.TimingRecorder to time the calculation
+    # phases.
+    recorder = None
 
     def __init__(self, stats, talents, glyphs, buffs, race, settings=None, level=100, target_level=None, char_class='rogue'):
         self.WOW_BUILD_TARGET = '6.2.0' # should reflect the game patch being targetted
@@ -71,6 +83,13 @@ class DamageCalculator(object):
             return False
         object.__getattribute__(self, name)
 
+    def __getstate__(self):
+        # Caches stay in the process they were created in.
+        state = self.__dict__.copy()
+        state.pop('dps_cache', None)
+        state.pop('recorder', None)
+        return state
+
     def _set_constants_for_level(self):
         self.buffs.level = self.level
         self.stats.level = self.level
@@ -110,25 +129,13 @@ class DamageCalculator(object):
         if self.get_version_number:
             damage_breakdown['version_' + self.WOW_BUILD_TARGET + '_' + self.SHADOWCRAFT_BUILD] = [.0, 0]
     
+    def get_rppm_haste_multiplier(self):
+        # The haste real ppm procs scale with, see proc_engine.
+        return self.stats.get_haste_multiplier_from_rating(self.base_stats['haste']) * self.true_haste_mod
+
     def set_rppm_uptime(self, proc):
-        #http://iam.yellingontheinternet.com/2013/04/12/theorycraft-201-advanced-rppm/
-        haste = 1.
-        if proc.haste_scales:
-            haste *= self.stats.get_haste_multiplier_from_rating(self.base_stats['haste']) * self.true_haste_mod
-        if proc.att_spd_scales:
-            haste *= 1.4
-        #The 1.1307 is a value that increases the proc rate due to bad luck prevention. It /should/ be constant among all rppm proc styles
-        if not proc.icd:
-            if proc.max_stacks <= 1:
-                proc.uptime = 1.1307 * (1 - math.e ** (-1 * haste * proc.get_rppm_proc_rate() * proc.duration / 60))
-            else:
-                lambd = haste * proc.get_rppm_proc_rate() * proc.duration / 60
-                e_lambda = math.e ** lambd
-                e_minus_lambda = math.e ** (-1 * lambd)
-                proc.uptime = 1.1307 * (e_lambda - 1) * (1 - ((1 - e_minus_lambda) ** proc.max_stacks))
-        else:
-            mean_proc_time = 60. / (haste * proc.get_rppm_proc_rate()) + proc.icd - min(proc.icd, 10)
-            proc.uptime = 1.1307 * proc.duration / mean_proc_time
+        haste = proc_engine.get_haste_factor(proc, self.get_rppm_haste_multiplier())
+        proc.uptime = proc_engine.get_rppm_uptime(haste, proc.get_rppm_proc_rate(), proc.duration, proc.icd, proc.max_stacks)
     
     def set_uptime(self, proc, attacks_per_second, crit_rates):
         if proc.is_real_ppm():
@@ -172,77 +179,157 @@ class DamageCalculator(object):
         setattr(self.stats, stat, getattr(self.stats, stat) - 1.)
         return dps
 
-    def get_ep(self, ep_stats=None, normalize_ep_stat=None, baseline_dps=None):
+    @timing_recorder.timed
+    def get_ep(self, ep_stats=None, normalize_ep_stat=None, baseline_dps=None, executor=None, deltas=None):
+        # deltas maps stats to the perturbation used for them (1 rating point
+        # if missing); ep values are scaled back to a per-point basis.
         if not normalize_ep_stat:
             normalize_ep_stat = self.get_adv_param('normalize_stat', self.settings.default_ep_stat, ignore_bounds=True)
         if not ep_stats:
             ep_stats = self.default_ep_stats
-        
+        if deltas is None:
+            deltas = {}
+
+        perturbed_stats = [stat for stat in ep_stats if stat != normalize_ep_stat]
+        deltas_list = []
         if baseline_dps == None:
-            baseline_dps = self.get_dps()
-        
+            deltas_list.append({})
+        if normalize_ep_stat != 'dps':
+            deltas_list.append({normalize_ep_stat: deltas.get(normalize_ep_stat, 1.)})
+        for stat in perturbed_stats:
+            deltas_list.append({stat: deltas.get(stat, 1.)})
+        dps_values = parallel.get_dps_for_stat_deltas(self, deltas_list, executor)
+
+        if baseline_dps == None:
+            baseline_dps = dps_values.pop(0)
         if normalize_ep_stat == 'dps':
             normalize_dps_difference = 1.
         else:
-            normalize_dps = self.ep_helper(normalize_ep_stat)
-            normalize_dps_difference = normalize_dps - baseline_dps
+            normalize_dps = dps_values.pop(0)
+            normalize_dps_difference = (normalize_dps - baseline_dps) / deltas.get(normalize_ep_stat, 1.)
         if normalize_dps_difference == 0:
             normalize_dps_difference = 1
         
+        ep_values = {}
+        for stat in ep_stats:
+            ep_values[stat] = 1.0
+        for stat, dps in zip(perturbed_stats, dps_values):
+            ep_values[stat] = abs(dps - baseline_dps) / deltas.get(stat, 1.) / normalize_dps_difference
+
+        return ep_values
+
+    @timing_recorder.timed
+    def get_ep_gradient(self, ep_stats=None, normalize_ep_stat=None):
+        # Same as get_ep, but the ep values are ratios of the partial
+        # derivatives returned by get_dps_gradient. For models that compute
+        # them exactly, they carry no convergence noise.
+        if not normalize_ep_stat:
+            normalize_ep_stat = self.get_adv_param('normalize_stat', self.settings.default_ep_stat, ignore_bounds=True)
+        if not ep_stats:
+            ep_stats = self.default_ep_stats
+
+        gradient_stats = []
+        for stat in list(ep_stats) + [normalize_ep_stat]:
+            if stat != 'dps' and stat not in gradient_stats:
+                gradient_stats.append(stat)
+        dps, gradient = self.get_dps_gradient(gradient_stats)
+
+        if normalize_ep_stat == 'dps':
+            normalize_dps_difference = 1.
+        else:
+            normalize_dps_difference = gradient[normalize_ep_stat]
+        if normalize_dps_difference == 0:
+            normalize_dps_difference = 1
+
         ep_values = {}
         for stat in ep_stats:
             ep_values[stat] = 1.0
             if normalize_ep_stat != stat:
-                dps = self.ep_helper(stat)
-                ep_values[stat] = abs(dps - baseline_dps) / normalize_dps_difference
+                ep_values[stat] = abs(gradient[stat]) / normalize_dps_difference
 
         return ep_values
 
-    def get_weapon_ep(self, speed_list=None, dps=False, enchants=False, normalize_ep_stat=None):
+    @timing_recorder.timed
+    def get_dps_for_changes(self, jobs, executor=None, catch=()):
+        # Returns the dps for each list of changes in jobs, see calcs.parallel
+        # for their format. Pass a process pool as executor to spread the
+        # evaluations over several processes.
+        return parallel.get_dps_for_changes(self, jobs, executor, catch)
+
+    @timing_recorder.timed
+    def get_dps_for_stat_deltas(self, deltas_list):
+        # Returns the dps for each {stat: delta} dict in deltas_list, the empty
+        # dict being the unmodified character. This version just runs get_dps
+        # for every entry; override it in your subclass if the setup of your
+        # model can be shared between evaluations.
+        dps_values = []
+        for deltas in deltas_list:
+            for stat in deltas:
+                setattr(self.stats, stat, getattr(self.stats, stat) + deltas[stat])
+            try:
+                dps_values.append(self.get_dps())
+            finally:
+                for stat in deltas:
+                    setattr(self.stats, stat, getattr(self.stats, stat) - deltas[stat])
+        return dps_values
+
+    def get_ep_batch(self, ep_stats=None, deltas=None, normalize_ep_stat=None):
+        # get_ep with the perturbations in deltas first.
+        return self.get_ep(ep_stats, normalize_ep_stat, deltas=deltas)
+
+    @timing_recorder.timed
+    def get_weapon_ep(self, speed_list=None, dps=False, enchants=False, normalize_ep_stat=None, executor=None):
         if not normalize_ep_stat:
             normalize_ep_stat = self.normalize_ep_stat
         weapons = ('mh', 'oh')
+        jobs = []
         if speed_list is not None or dps:
-            baseline_dps = self.get_dps()
-            normalize_dps = self.ep_helper(normalize_ep_stat)
+            jobs.append([])
+            jobs.append([('stat', normalize_ep_stat, 1.)])
+
+        for hand in weapons:
+            # Weapon dps EP
+            if dps:
+                jobs.append([('weapon', hand, 'weapon_dps', getattr(self.stats, hand).weapon_dps + 1.)])
+            # Enchant EP
+            if enchants:
+                jobs.append([('enchant', hand, None)])
+                jobs.append([('enchant', hand, None), ('stat', normalize_ep_stat, 1.)])
+                for enchant in getattr(self.stats, hand).allowed_melee_enchants:
+                    jobs.append([('enchant', hand, enchant)])
+            # Weapon speed EP
+            if speed_list is not None:
+                for speed in speed_list:
+                    jobs.append([('weapon', hand, 'speed', speed)])
+
+        dps_values = self.get_dps_for_changes(jobs, executor)
+        dps_values.reverse()
+        if speed_list is not None or dps:
+            baseline_dps = dps_values.pop()
+            normalize_dps = dps_values.pop()
 
         for hand in weapons:
             ep_values = {}
 
-            # Weapon dps EP
             if dps:
-                getattr(self.stats, hand).weapon_dps += 1.
-                new_dps = self.get_dps()
+                new_dps = dps_values.pop()
                 ep = abs(new_dps - baseline_dps) / (normalize_dps - baseline_dps)
                 ep_values[hand + '_dps'] = ep
-                getattr(self.stats, hand).weapon_dps -= 1.
 
-            # Enchant EP
             if enchants:
-                old_enchant = None
+                no_enchant_dps = dps_values.pop()
+                no_enchant_normalize_dps = dps_values.pop()
                 for enchant in getattr(self.stats, hand).allowed_melee_enchants:
-                    if getattr(getattr(self.stats, hand), enchant):
-                        old_enchant = enchant
-                getattr(self.stats, hand).del_enchant()
-                no_enchant_dps = self.get_dps()
-                no_enchant_normalize_dps = self.ep_helper(normalize_ep_stat)
-                for enchant in getattr(self.stats, hand).allowed_melee_enchants:
-                    getattr(self.stats, hand).set_enchant(enchant)
-                    new_dps = self.get_dps()
+                    new_dps = dps_values.pop()
                     if new_dps != no_enchant_dps:
                         ep = abs(new_dps - no_enchant_dps) / (no_enchant_normalize_dps - no_enchant_dps)
                         ep_values[hand + '_' + enchant] = ep
-                    getattr(self.stats, hand).set_enchant(old_enchant)
 
-            # Weapon speed EP
             if speed_list is not None:
-                old_speed = getattr(self.stats, hand).speed
                 for speed in speed_list:
-                    getattr(self.stats, hand).speed = speed
-                    new_dps = self.get_dps()
+                    new_dps = dps_values.pop()
                     ep = (new_dps - baseline_dps) / (normalize_dps - baseline_dps)
                     ep_values[hand + '_' + str(speed)] = ep
-                    getattr(self.stats, hand).speed = old_speed
 
             if hand == 'mh':
                 mh_ep_values = ep_values
@@ -396,165 +483,160 @@ class DamageCalculator(object):
 
         return ep_values
     
-    def get_upgrades_ep(self, _list, normalize_ep_stat=None):
+    @timing_recorder.timed
+    def get_upgrades_ep(self, _list, normalize_ep_stat=None, executor=None):
         if not normalize_ep_stat:
             normalize_ep_stat = self.normalize_ep_stat
         # This method computes ep for every other buff/proc not covered by
         # get_ep or get_weapon_ep. Weapon enchants, being tied to the
         # weapons they are on, are computed by get_weapon_ep.
         
-        active_procs_cache = []
+        removed_procs = [] # procs we take off for the duration of the ranking
         procs_list = []
         ep_values = {}
         for i in _list:
             if i in self.stats.procs.allowed_procs:
                 procs_list.append( (i, _list[i]) )
                 if getattr(self.stats.procs, i):
-                    active_procs_cache.append((i, getattr(self.stats.procs, i).item_level))
-                    delattr(self.stats.procs, i)
+                    removed_procs.append(('del_proc', i))
             else:
                 ep_values[i] = _('not allowed')
 
-        baseline_dps = self.get_dps()
-        normalize_dps = self.ep_helper(normalize_ep_stat)
-        for i in procs_list:
-            proc_name, item_levels = i
-            ep_values[proc_name] = {}
-            try:
-                if getattr(self.stats.procs, proc_name):
-                    old_proc = getattr(self.stats.procs, proc_name)
-                    delattr(self.stats.procs, proc_name)
-                    base_dps = self.get_dps()
-                    base_normalize_dps = self.ep_helper(normalize_ep_stat)
-                else:
-                    old_proc = False
-                    base_dps = baseline_dps
-                    base_normalize_dps = normalize_dps
-                self.stats.procs.set_proc(proc_name)
-                proc = getattr(self.stats.procs, proc_name)
+        undo_list = parallel.apply_changes(self, removed_procs)
+        try:
+            jobs = [[], [('stat', normalize_ep_stat, 1.)]]
+            for proc_name, item_levels in procs_list:
                 for group in item_levels:
                     if not isinstance(group, (list,tuple)):
                         group = group,
                     for l in group:
-                        proc.item_level = l
-                        proc.update_proc_value() # after setting item_level re-set the proc value
-                        new_dps = self.get_dps()
-                        if new_dps != base_dps:
-                            ep = abs(new_dps - base_dps) / (base_normalize_dps - base_dps)
-                            ep_values[proc_name][l] = ep
-                if old_proc:
-                    self.stats.procs.set_proc(proc_name)
-                else:
-                    delattr(self.stats.procs, proc_name)
-            except InvalidProcException:
-                # Data for these procs is not complete/correct
-                ep_values[i].append(_('not supported'))
-                delattr(self.stats.procs, proc_name)
-
-        for proc in active_procs_cache:
-            self.stats.procs.set_proc(proc[0])
-            getattr(self.stats.procs, proc[0]).item_level = proc[1]
+                        jobs.append([('set_proc', proc_name, l)])
+            dps_values = self.get_dps_for_changes(jobs, executor, catch=InvalidProcException)
+        finally:
+            parallel.revert_changes(self, undo_list)
+
+        dps_values.reverse()
+        base_dps = dps_values.pop()
+        base_normalize_dps = dps_values.pop()
+        for proc_name, item_levels in procs_list:
+            ep_values[proc_name] = {}
+            for group in item_levels:
+                if not isinstance(group, (list,tuple)):
+                    group = group,
+                for l in group:
+                    new_dps = dps_values.pop()
+                    if isinstance(new_dps, InvalidProcException):
+                        # Data for these procs is not complete/correct
+                        ep_values[proc_name] = _('not supported')
+                    elif isinstance(ep_values[proc_name], dict) and new_dps != base_dps:
+                        ep = abs(new_dps - base_dps) / (base_normalize_dps - base_dps)
+                        ep_values[proc_name][l] = ep
 
         return ep_values
 
     # this function is in comparison to get_upgrades_ep a lot faster but not 100% accurate
     # the error is around 1% which is accurate enough for the ranking in Shadowcraft-UI
-    def get_upgrades_ep_fast(self, _list, normalize_ep_stat=None, exclude_list=None):
+    @timing_recorder.timed
+    def get_upgrades_ep_fast(self, _list, normalize_ep_stat=None, exclude_list=None, executor=None):
         if not normalize_ep_stat:
             normalize_ep_stat = self.normalize_ep_stat
         # This method computes ep for every other buff/proc not covered by
         # get_ep or get_weapon_ep. Weapon enchants, being tied to the
         # weapons they are on, are computed by get_weapon_ep.
         
-        active_procs_cache = [] #procs removed by ranker, all procs if no exclude_list provided
+        removed_procs = [] #procs removed by ranker, all procs if no exclude_list provided
         procs_list = [] #holds all procs to consider
+        equipped_procs = set() #procs left on, measured against a baseline without them
         ep_values = {}
         for i in _list:
 
             if i in self.stats.procs.allowed_procs:
                 procs_list.append( (i, _list[i]) )
-                #if an excludelist is provided only add values on exclude_list to active_proc_cache
-                #if no exclude_list add all procs to active_proc_cache 
+                #if an excludelist is provided only remove procs on exclude_list
+                #if no exclude_list remove all procs
                 if (exclude_list and i in exclude_list) or (not exclude_list and getattr(self.stats.procs, i)):
-                    active_procs_cache.append((i, getattr(self.stats.procs, i).item_level))
-                    delattr(self.stats.procs, i)
+                    removed_procs.append(('del_proc', i))
+                elif getattr(self.stats.procs, i):
+                    equipped_procs.add(i)
             else:
                 ep_values[i] = _('not allowed')
-       
-        baseline_dps = self.get_dps()
-        normalize_dps = self.ep_helper(normalize_ep_stat)
 
-        for i in procs_list:
-            proc_name, item_levels = i
-            ep_values[proc_name] = {}
-            try:
-                if getattr(self.stats.procs, proc_name):
-                    old_proc = getattr(self.stats.procs, proc_name)
-                    delattr(self.stats.procs, proc_name)
-                    base_dps = self.get_dps()
-                    base_normalize_dps = self.ep_helper(normalize_ep_stat)
-                else:
-                    old_proc = False
-                    base_dps = baseline_dps
-                    base_normalize_dps = normalize_dps
-                self.stats.procs.set_proc(proc_name)
-                proc = getattr(self.stats.procs, proc_name)
+        undo_list = parallel.apply_changes(self, removed_procs)
+        try:
+            jobs = [[], [('stat', normalize_ep_stat, 1.)]]
+            for proc_name, item_levels in procs_list:
+                if proc_name in equipped_procs:
+                    jobs.append([('del_proc', proc_name)])
+                    jobs.append([('del_proc', proc_name), ('stat', normalize_ep_stat, 1.)])
+                scaling = self.stats.procs.allowed_procs[proc_name].get('scaling')
                 for group in item_levels:
                     if not isinstance(group, (list,tuple)):
                         group = group,
-                    if proc.scaling:
-                        proc.item_level = group[0]
-                        proc.update_proc_value() # after setting item_level re-set the proc value
-                        item_level = proc.item_level
-                        scale_factor = self.tools.get_random_prop_point(item_level)
-                    new_dps = self.get_dps()
-                    if new_dps != base_dps:
-                        for l in group:
-                            ep = abs(new_dps - base_dps) / (base_normalize_dps - base_dps)
-                            if l > proc.item_level:
-                                upgraded_scale_factor = self.tools.get_random_prop_point(l)
-                                ep *= float(upgraded_scale_factor) / float(scale_factor)
-                            ep_values[proc_name][l] = ep
-                if old_proc:
-                    self.stats.procs.set_proc(proc_name)
-                else:
-                    delattr(self.stats.procs, proc_name)
-            except InvalidProcException:
-                # Data for these procs is not complete/correct
-                ep_values[i].append(_('not supported'))
-                delattr(self.stats.procs, i)
-
-        for proc in active_procs_cache:
-            self.stats.procs.set_proc(proc[0])
-            getattr(self.stats.procs, proc[0]).item_level = proc[1]
+                    if scaling:
+                        jobs.append([('set_proc', proc_name, group[0])])
+                    else:
+                        jobs.append([('set_proc', proc_name, None)])
+            dps_values = self.get_dps_for_changes(jobs, executor, catch=InvalidProcException)
+        finally:
+            parallel.revert_changes(self, undo_list)
+
+        dps_values.reverse()
+        baseline_dps = dps_values.pop()
+        normalize_dps = dps_values.pop()
+        for proc_name, item_levels in procs_list:
+            ep_values[proc_name] = {}
+            if proc_name in equipped_procs:
+                base_dps = dps_values.pop()
+                base_normalize_dps = dps_values.pop()
+            else:
+                base_dps = baseline_dps
+                base_normalize_dps = normalize_dps
+            scaling = self.stats.procs.allowed_procs[proc_name].get('scaling')
+            for group in item_levels:
+                if not isinstance(group, (list,tuple)):
+                    group = group,
+                new_dps = dps_values.pop()
+                if isinstance(new_dps, InvalidProcException):
+                    # Data for these procs is not complete/correct
+                    ep_values[proc_name] = _('not supported')
+                elif isinstance(ep_values[proc_name], dict) and new_dps != base_dps:
+                    for l in group:
+                        ep = abs(new_dps - base_dps) / (base_normalize_dps - base_dps)
+                        if scaling and l > group[0]:
+                            scale_factor = self.tools.get_random_prop_point(group[0])
+                            upgraded_scale_factor = self.tools.get_random_prop_point(l)
+                            ep *= float(upgraded_scale_factor) / float(scale_factor)
+                        ep_values[proc_name][l] = ep
 
         return ep_values
 
-    def get_glyphs_ranking(self, list=None):
+    @timing_recorder.timed
+    def get_glyphs_ranking(self, list=None, executor=None):
         glyphs = []
         glyphs_ranking = {}
-        baseline_dps = self.get_dps()
 
         if list == None:
             glyphs = self.glyphs.allowed_glyphs
         else:
             glyphs = list
 
-        for i in glyphs:
-            setattr(self.glyphs, i, not getattr(self.glyphs, i))
-            try:
-                new_dps = self.get_dps()
-                if new_dps != baseline_dps:
-                    glyphs_ranking[i] = abs(new_dps - baseline_dps)
-            except:
+        jobs = [[]] + [[('glyph', i)] for i in glyphs]
+        dps_values = self.get_dps_for_changes(jobs, executor, catch=Exception)
+        baseline_dps = dps_values.pop(0)
+        if isinstance(baseline_dps, Exception):
+            raise baseline_dps
+
+        for i, new_dps in zip(glyphs, dps_values):
+            if isinstance(new_dps, Exception):
                 glyphs_ranking[i] = _('not implemented')
-            setattr(self.glyphs, i, not getattr(self.glyphs, i))
+            elif new_dps != baseline_dps:
+                glyphs_ranking[i] = abs(new_dps - baseline_dps)
 
         return glyphs_ranking
 
-    def get_talents_ranking(self, list=None):
+    @timing_recorder.timed
+    def get_talents_ranking(self, list=None, executor=None):
         talents_ranking = {}
-        baseline_dps = self.get_dps()
         talent_list = []
 
         if list is None:
@@ -562,15 +644,17 @@ class DamageCalculator(object):
         else:
             talent_list = list
 
-        for talent in talent_list:
-            setattr(self.talents, talent, not getattr(self.talents, talent))
-            try:
-                new_dps = self.get_dps()
-                if new_dps != baseline_dps:
-                    talents_ranking[talent] = abs(new_dps - baseline_dps)
-            except:
+        jobs = [[]] + [[('talent', talent)] for talent in talent_list]
+        dps_values = self.get_dps_for_changes(jobs, executor, catch=Exception)
+        baseline_dps = dps_values.pop(0)
+        if isinstance(baseline_dps, Exception):
+            raise baseline_dps
+
+        for talent, new_dps in zip(talent_list, dps_values):
+            if isinstance(new_dps, Exception):
                 talents_ranking[talent] = _('not implemented')
-            setattr(self.talents, talent, not getattr(self.talents, talent))
+            elif new_dps != baseline_dps:
+                talents_ranking[talent] = abs(new_dps - baseline_dps)
         
         return talents_ranking
 
@@ -586,6 +670,57 @@ class DamageCalculator(object):
         # this is what callers will (initially) be looking at.
         pass
 
+    def get_warm_start(self):
+        # Overwrite this, along with set_warm_start, if your model can start
+        # from the converged state of an earlier evaluation. It should return
+        # None when it doesn't.
+        return None
+
+    def set_warm_start(self, warm_start):
+        pass
+
+    def timer(self, name):
+        # Times a block as a phase when there's a recorder.
+        if self.recorder is None:
+            return timing_recorder.null_timer
+        return self.recorder.timer(name)
+
+    def get_fingerprint(self):
+        return dps_cache.get_fingerprint(self)
+
+    def get_cached(self, kind, compute):
+        # Returns compute(), going through dps_cache when there is one; kind
+        # tells apart the different results cached for the same inputs.
+        if self.dps_cache is None:
+            return compute()
+        fingerprint = self.get_fingerprint()
+        if (kind, fingerprint) in self.dps_cache:
+            return self.dps_cache.get((kind, fingerprint), compute)
+        result = self.dps_cache.get((kind, fingerprint), compute)
+        # Models may normalize their settings on the first run (combat swaps
+        # deadly poison for instant poison, for instance), so file the result
+        # under the fingerprint of the normalized inputs as well.
+        normalized_fingerprint = self.get_fingerprint()
+        if normalized_fingerprint != fingerprint:
+            self.dps_cache.put((kind, normalized_fingerprint), result)
+        return result
+
+    @timing_recorder.timed
+    def get_dps_gradient(self, gradient_stats=None):
+        # Returns the dps and a dict of its partial derivatives with respect to
+        # each stat in gradient_stats. This version takes forward differences
+        # of gradient_step rating points over get_dps_for_stat_deltas;
+        # overwrite it if your model can be differentiated exactly.
+        if gradient_stats is None:
+            gradient_stats = self.default_ep_stats
+        deltas_list = [{}] + [{stat: self.gradient_step} for stat in gradient_stats]
+        dps_values = self.get_dps_for_stat_deltas(deltas_list)
+        dps = dps_values.pop(0)
+        gradient = {}
+        for stat, stat_dps in zip(gradient_stats, dps_values):
+            gradient[stat] = (stat_dps - dps) / self.gradient_step
+        return dps, gradient
+
     #def get_all_activated_stat_boosts(self):
     #    racial_boosts = self.race.get_racial_stat_boosts()
     #    gear_boosts = self.stats.gear_buffs.get_all_activated_boosts()
@@ -0,0 +1,194 @@
+import gettext
+import __builtin__
+
+__builtin__._ = gettext.gettext
+
+from shadowcraft.core import exceptions
+
+# Strategies for fixed-point iterations like the one in determine_stats,
+# where a guess of the attacks per second goes in and a new attacks per
+# second dict comes out until the two agree.
+#
+# next_guess(guess, result) returns what to feed back in after result came
+# out of guess. Plain iteration feeds result back unchanged. The others treat
+# the dicts as vectors (values in sorted key order, lists flattened) and
+# extrapolate from the previous iterations:
+#   aitken      every third guess is the componentwise Aitken delta-squared
+#               extrapolation of the last three iterates
+#   anderson    Anderson mixing over the last few guesses and results
+# Extrapolated entries are clamped at 0, as they are rates. A change in the
+# dict layout drops the history and falls back to a plain step.
+
+
+class PlainConvergence(object):
+
+    def reset(self):
+        pass
+
+    def next_guess(self, guess, result):
+        return result
+
+
+class VectorConvergence(PlainConvergence):
+    # Base class for the strategies working on the flattened dicts.
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.layout = None
+        self.guesses = []
+        self.results = []
+
+    def next_guess(self, guess, result):
+        layout = get_layout(result)
+        if layout != self.layout or get_layout(guess) != layout:
+            self.reset()
+            self.layout = layout
+        self.guesses.append(flatten(guess, layout))
+        self.results.append(flatten(result, layout))
+        new_guess = self.extrapolate()
+        if new_guess is None:
+            return result
+        return unflatten([max(value, 0.) for value in new_guess], layout)
+
+    def extrapolate(self):
+        # Returns the next guess as a flat list, or None for a plain step.
+        return None
+
+
+class AitkenConvergence(VectorConvergence):
+
+    def extrapolate(self):
+        # Needs three successive plain iterates: x0, x1 = F(x0), x2 = F(x1).
+        if len(self.guesses) < 2 or self.guesses[-1] != self.results[-2]:
+            return None
+        x0 = self.guesses[-2]
+        x1 = self.guesses[-1]
+        x2 = self.results[-1]
+        new_guess = []
+        for a, b, c in zip(x0, x1, x2):
+            denominator = c - 2 * b + a
+            if abs(denominator) < 1e-12:
+                new_guess.append(c)
+            else:
+                new_guess.append(c - (c - b) ** 2 / denominator)
+        # Start over with plain steps from the extrapolated point.
+        del self.guesses[:]
+        del self.results[:]
+        return new_guess
+
+
+class AndersonConvergence(VectorConvergence):
+
+    def __init__(self, depth=3):
+        self.depth = depth
+        super(AndersonConvergence, self).__init__()
+
+    def extrapolate(self):
+        del self.guesses[:-(self.depth + 1)]
+        del self.results[:-(self.depth + 1)]
+        if len(self.guesses) < 2:
+            return None
+        residuals = [[r - g for g, r in zip(guess, result)] for guess, result in zip(self.guesses, self.results)]
+        # Differences between successive residuals and results.
+        residual_steps = [[b - a for a, b in zip(residuals[i], residuals[i + 1])] for i in xrange(len(residuals) - 1)]
+        result_steps = [[b - a for a, b in zip(self.results[i], self.results[i + 1])] for i in xrange(len(self.results) - 1)]
+        # Least squares fit of the last residual on the residual steps, via
+        # the normal equations.
+        size = len(residual_steps)
+        matrix = []
+        for i in xrange(size):
+            row = [dot(residual_steps[i], residual_steps[j]) for j in xrange(size)]
+            row.append(dot(residual_steps[i], residuals[-1]))
+            matrix.append(row)
+        gamma = solve_linear_system(matrix)
+        if gamma is None:
+            # Degenerate history; keep only the last iterate.
+            del self.guesses[:-1]
+            del self.results[:-1]
+            return None
+        new_guess = list(self.results[-1])
+        for coefficient, step in zip(gamma, result_steps):
+            for i in xrange(len(new_guess)):
+                new_guess[i] -= coefficient * step[i]
+        return new_guess
+
+
+strategies = {
+    'plain': PlainConvergence,
+    'aitken': AitkenConvergence,
+    'anderson': AndersonConvergence,
+}
+
+
+def get_strategy(name):
+    try:
+        return strategies[name]()
+    except KeyError:
+        raise exceptions.InvalidInputException(_('Unknown convergence strategy {name}').format(name=name))
+
+
+def get_layout(values):
+    # Nested dicts get the layout of their own values in place of a length.
+    layout = []
+    for key in sorted(values):
+        if isinstance(values[key], dict):
+            layout.append((key, get_layout(values[key])))
+        elif hasattr(values[key], '__iter__'):
+            layout.append((key, len(values[key])))
+        else:
+            layout.append((key, None))
+    return tuple(layout)
+
+
+def flatten(values, layout, flat=None):
+    if flat is None:
+        flat = []
+    for key, length in layout:
+        if isinstance(length, tuple):
+            flatten(values[key], length, flat)
+        elif length is None:
+            flat.append(values[key])
+        else:
+            flat.extend(values[key])
+    return flat
+
+
+def unflatten(flat, layout):
+    return _unflatten(flat, layout, 0)[0]
+
+
+def _unflatten(flat, layout, index):
+    values = {}
+    for key, length in layout:
+        if isinstance(length, tuple):
+            values[key], index = _unflatten(flat, length, index)
+        elif length is None:
+            values[key] = flat[index]
+            index += 1
+        else:
+            values[key] = flat[index:index + length]
+            index += length
+    return values, index
+
+
+def dot(a, b):
+    return sum([x * y for x, y in zip(a, b)])
+
+
+def solve_linear_system(matrix):
+    # Gauss-Jordan elimination with partial pivoting on an augmented matrix,
+    # in place. Returns None if the system is singular.
+    size = len(matrix)
+    for column in xrange(size):
+        pivot = max(xrange(column, size), key=lambda row: abs(matrix[row][column]))
+        if abs(matrix[pivot][column]) < 1e-30:
+            return None
+        matrix[column], matrix[pivot] = matrix[pivot], matrix[column]
+        for row in xrange(size):
+            if row != column and matrix[row][column]:
+                factor = matrix[row][column] / matrix[column][column]
+                for k in xrange(column, size + 1):
+                    matrix[row][k] -= factor * matrix[column][k]
+    return [matrix[i][size] / matrix[i][i] for i in xrange(size)]
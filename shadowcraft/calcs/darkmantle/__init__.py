@@ -7,6 +7,9 @@ __builtin__._ = gettext.gettext
 
 from shadowcraft.core import exceptions
 from shadowcraft.calcs import armor_mitigation
+from shadowcraft.calcs.darkmantle import auras
+from shadowcraft.calcs.darkmantle import state
+from shadowcraft.calcs.darkmantle import tracing
 from shadowcraft.objects import class_data
 from shadowcraft.objects.procs import InvalidProcException
 
@@ -14,6 +17,26 @@ class InputNotModeledException(exceptions.InvalidInputException):
     pass
 
 class DarkmantleCalculator(object):
+    # Set this to a tracing.Tracer, on the class or on an instance, to trace
+    # the simulation.
+    tracer = tracing.null_tracer
+    # The simulation state, a state.SimulationState subclass with the fields
+    # of your class specific subclass.
+    state_class = state.SimulationState
+    # The state fields traced as the resources, override in your class
+    # specific subclass.
+    resource_names = ()
+    # Set this to a random.Random to roll crits; see monte_carlo for running
+    # many seeded iterations.
+    rng = None
+    crit_damage_multiplier = 2.
+    # The length in seconds of the last simulated fight.
+    fight_length = 0
+    # See get_wake_up_time.
+    threshold_margin = 1e-9
+    # The auras that apply_aura knows, auras.Aura objects by name; extend it
+    # in your class specific subclass.
+    aura_definitions = {}
 
     def __init__(self, stats, talents, glyphs, buffs, race, settings=None, level=100, target_level=103, char_class='rogue'):
         #load stats, class, procs, etc to main content
@@ -35,16 +58,12 @@ class DarkmantleCalculator(object):
         # calculate and cache the level-dependent armor mitigation parameter
         self.armor_mitigation_parameter = armor_mitigation.parameter(self.level)
         
-        #setup global variables, these get deep-copy and passed to new objects
-        self.state_values = {}
-        self.state_values['damage_multiplier'] = 1.0
-        self.state_values['gcd_size'] = 1.0
-        self.state_values['trinket_1'] = {'name':'null', 'last_proc_time': -600}
-        self.state_values['trinket_2'] = {'name':'null', 'last_proc_time': -600}
-        self.state_values['weapon_proc_1'] = {'name':'null', 'last_proc_time': -600}
-        self.state_values['weapon_proc_2'] = {'name':'null', 'last_proc_time': -600}
-        self.state_values['cooldown'] = {}
-        self.state_values['stat_multipliers'] = {
+        #setup global variables, these get copied and passed to new objects
+        self.state = self.state_class()
+        self.state.damage_multiplier = 1.0
+        self.state.gcd_size = 1.0
+        self.state.last_proc_times = {'trinket_1': -600, 'trinket_2': -600, 'weapon_proc_1': -600, 'weapon_proc_2': -600}
+        self.state.stat_multipliers = {
             'primary':self.stats.gear_buffs.gear_specialization_multiplier(), #armor specialization
             'ap':self.buffs.attack_power_multiplier(),
             'haste':1.0,
@@ -54,7 +73,7 @@ class DarkmantleCalculator(object):
             'readiness':1.0,
             'multistrike':1.0,
         }
-        self.state_values['current_stats'] = {
+        self.state.current_stats = {
             'str': (self.stats.str), #useless for rogues now
             'agi': (self.stats.agi + self.race.racial_agi), #+ self.buffs.buff_agi()
             'int': (self.stats.int), #useless for rogues now
@@ -68,9 +87,10 @@ class DarkmantleCalculator(object):
         }
         self.calculate_effective_ap()
 
-        self.state_values['auras'] = [] #handles permanent and temporary
+        #handles permanent and temporary auras, name -> expiration time
         for e in self.buffs.buffs_debuffs:
-            self.state_values['auras'].append((e, 'inf')) # ('name', time), time = 'inf' or number
+            self.state.auras[e] = float('inf')
+            self.state.aura_stacks[e] = 1
             
         #change stats to match buffs
         
@@ -86,23 +106,247 @@ class DarkmantleCalculator(object):
         #load class module data
         class_variables = self._get_values_for_class()
         for key in class_variables:
-            self.state_values[key] = class_variables[key]
+            setattr(self.state, key, class_variables[key])
             
     def calculate_effective_ap(self):
-        self.state_values['effective_ap'] = (self.state_values['current_stats']['agi'] * self.state_values['stat_multipliers']['primary'] + self.stats.ap)
-        self.state_values['effective_ap'] *= self.state_values['stat_multipliers']['ap']
+        self.state.effective_ap = (self.state.current_stats['agi'] * self.state.stat_multipliers['primary'] + self.stats.ap)
+        self.state.effective_ap *= self.state.stat_multipliers['ap']
         
     def end_calc_branch(self, current_time, total_damage_done):
         if self.settings.style == 'time' and current_time >= self.settings.limit:
-            print 'Stopping calculations at: ', current_time, ' seconds'
-            print '--------'
+            if self.tracer.level >= tracing.SUMMARY:
+                self.tracer.record(tracing.SUMMARY, current_time, 'end', damage=total_damage_done,
+                                   message='stopping calculations at {0} seconds'.format(current_time))
             return True
         if self.settings.style == 'health' and total_damage_done >= self.settings.limit:
-            print 'Stopping calculations at: ', total_damage_done, ' damage'
-            print '--------'
+            if self.tracer.level >= tracing.SUMMARY:
+                self.tracer.record(tracing.SUMMARY, current_time, 'end', damage=total_damage_done,
+                                   message='stopping calculations at {0} damage'.format(total_damage_done))
             return True
         return False
+
+    def get_resources(self):
+        # A copy of the resources, for tracing.
+        return dict((name, getattr(self.state, name)) for name in self.resource_names)
         
+    def get_timeline(self):
+        # The opening events of the fight as a timeline.Timeline, override in
+        # your class specific subclass.
+        return None
+
+    def get_lockstep_key(self):
+        # The inputs that decide which events get queued and when, besides the
+        # state: batch.BatchSimulation runs calculators with equal keys in
+        # lockstep on one timeline. Extend it in your class specific subclass.
+        return (type(self), self.settings.style, self.state.gcd_size)
+
+    def get_priority_list(self):
+        # The priority list of the cycle, compiled for this calculator on first
+        # use.
+        compiled = self.__dict__.get('compiled_priority_list')
+        if compiled is None:
+            priority_list = self.settings.cycle.priority_list
+            if priority_list is None:
+                raise InputNotModeledException(_('No priority list for the {spec} cycle').format(spec=self.settings.get_spec()))
+            compiled = priority_list.compile(self.get_apl_variable, self.get_ready_check)
+            self.compiled_priority_list = compiled
+        return compiled
+
+    def update_resources(self, state, time):
+        # Brings the resources that change over time up to time, override in
+        # your class specific subclass.
+        pass
+
+    def decide(self, state, time):
+        # The event the rotation queues at time, as a (time, name) tuple: the
+        # action the priority list picks, to be used right away, or else a
+        # wake-up at the first time the pick may change. None when it can't.
+        self.update_resources(state, time)
+        state.wake_up_time = None
+        priority_list = self.get_priority_list()
+        action = priority_list.get_action(state, time)
+        if action is not None:
+            return time, action
+        wake_up_time = self.get_wake_up_time(priority_list, state, time)
+        if wake_up_time is None:
+            return None
+        state.wake_up_time = wake_up_time
+        return wake_up_time, 'priority_queue'
+
+    def set_haste_multiplier(self, state, timeline, time, multiplier):
+        # Sets the haste multiplier at time, for haste buffs and their
+        # expirations. What is left of the pending swings goes at the new
+        # speed, and the pending wake-up, worked out with the old regeneration,
+        # moves to time so that the rotation decides again; each is a single
+        # reschedule on timeline.
+        self.update_resources(state, time)
+        ratio = state.stat_multipliers['haste'] / multiplier
+        state.stat_multipliers['haste'] = multiplier
+        for name, swing_time in state.swing_times.items():
+            if swing_time > time:
+                state.swing_times[name] = timeline.reschedule((swing_time, name), time + (swing_time - time) * ratio)[0]
+        if state.wake_up_time is not None and state.wake_up_time > time:
+            timeline.reschedule((state.wake_up_time, 'priority_queue'), time)
+            state.wake_up_time = time
+
+    def get_aura(self, name):
+        if name not in self.aura_definitions:
+            raise InputNotModeledException(_('Can\'t locate aura: {aura}').format(aura=str(name)))
+        return self.aura_definitions[name]
+
+    def get_aura_expiration(self, name):
+        # The event class of the aura expiration named name, None when name
+        # isn't one; for get_next_attack.
+        if not name.endswith(auras.expiration_suffix):
+            return None
+        aura = self.aura_definitions.get(name[:-len(auras.expiration_suffix)])
+        if aura is None:
+            return None
+        return aura.expiration
+
+    def apply_aura(self, state, timeline, time, name, stacks=1):
+        # Applies stacks of the aura name at time, up to its max_stacks, and
+        # starts its duration over: the expiration pending on timeline, if any,
+        # gets rescheduled.
+        aura = self.get_aura(name)
+        expiration = float('inf')
+        if aura.duration is not None:
+            expiration = time + aura.duration
+        old_expiration = state.auras.get(name)
+        # an aura that runs out at time has its expiration still pending
+        if old_expiration is not None and old_expiration > time:
+            stacks += state.aura_stacks.get(name, 1)
+        state.aura_stacks[name] = min(stacks, aura.max_stacks)
+        if old_expiration is not None and old_expiration != float('inf'):
+            timeline.reschedule((old_expiration, aura.expiration_name), expiration)
+        elif expiration != float('inf'):
+            timeline.append((expiration, aura.expiration_name))
+        state.auras[name] = expiration
+
+    def remove_aura(self, state, timeline, name):
+        # Removes the aura name, if active, before it runs out.
+        if name not in state.auras:
+            return
+        expiration = state.auras.pop(name)
+        state.aura_stacks.pop(name, None)
+        if expiration != float('inf'):
+            timeline.cancel((expiration, self.get_aura(name).expiration_name))
+
+    def get_wake_up_time(self, priority_list, state, time):
+        # The first time after time at which an action of priority_list whose
+        # condition holds gets ready, or a variable of the conditions crosses a
+        # threshold; None if there is none. A strict comparison, or rounding,
+        # can leave a condition unchanged at the crossing time, so crossings get
+        # a second wake-up threshold_margin later. Changes made by other events,
+        # like combo points, don't need wake-ups: the events that change them
+        # queue a decision themselves.
+        candidates = []
+        for (name, check), condition in zip(priority_list.actions, priority_list.conditions):
+            # the actions whose condition fails can't be picked before a
+            # threshold crossing
+            if condition is None or condition(state, time):
+                candidates.append(self.get_ready_time(name, state, time))
+        for variable, value in priority_list.thresholds:
+            for crossing_time in self.get_crossing_times(variable, value, state, time):
+                candidates.append(crossing_time)
+                candidates.append(crossing_time + self.threshold_margin)
+        candidates = [candidate for candidate in candidates if time < candidate < float('inf')]
+        if not candidates:
+            return None
+        return min(candidates)
+
+    def get_crossing_times(self, variable, value, state, time):
+        # The times at which the priority list variable reaches value, or
+        # changes for a None value, as far as they can be told from state at
+        # time. Extend it in your class specific subclass.
+        if value is None:
+            value = 0
+        parts = variable.split('.')
+        if variable == 'time':
+            return (value,)
+        if len(parts) != 3:
+            return ()
+        kind, key, attribute = parts
+        if kind == 'buff' and key in state.auras:
+            if attribute == 'remains':
+                return (state.auras[key] - value,)
+            return (state.auras[key],)
+        if kind == 'cooldown':
+            return (state.cooldowns.get(key, 0) - value,)
+        if kind == 'action' and attribute == 'ready_in':
+            return (self.get_ready_time(key, state, time) - value,)
+        return ()
+
+    def get_ready_check(self, name):
+        # For the priority list: whether the action name can be used.
+        self.get_next_attack(name) # unknown actions fail at compile time
+        return lambda state, time: self.get_ready_time(name, state, time) <= time
+
+    def get_ready_time(self, name, state, time):
+        # The earliest time from time on at which the action name can be
+        # used, override in your class specific subclass to add resources.
+        ready_time = max(time, state.cooldowns.get(name, 0))
+        if self.get_next_attack(name)._triggers_gcd:
+            ready_time = max(ready_time, state.gcd_end)
+        return ready_time
+
+    def get_apl_variable(self, name):
+        # A function of (state, time) giving the value of the priority list
+        # variable name, or None when there is no such variable. Extend it in
+        # your class specific subclass.
+        parts = name.split('.')
+        if name == 'time':
+            return lambda state, time: time
+        if name == 'gcd':
+            return lambda state, time: state.gcd_size
+        if len(parts) != 3:
+            return None
+        kind, key, attribute = parts
+        if kind == 'buff':
+            if attribute == 'up':
+                return lambda state, time: state.auras.get(key, time) > time
+            if attribute == 'down':
+                return lambda state, time: state.auras.get(key, time) <= time
+            if attribute == 'remains':
+                return lambda state, time: max(state.auras.get(key, time) - time, 0)
+            if attribute == 'stack':
+                return lambda state, time: state.aura_stacks.get(key, 1) if state.auras.get(key, time) > time else 0
+        if kind == 'cooldown':
+            if attribute == 'up':
+                return lambda state, time: state.cooldowns.get(key, 0) <= time
+            if attribute == 'remains':
+                return lambda state, time: max(state.cooldowns.get(key, 0) - time, 0)
+        if kind == 'action' and attribute == 'ready_in':
+            self.get_next_attack(key)
+            return lambda state, time: self.get_ready_time(key, state, time) - time
+        return None
+
+    def __getstate__(self):
+        # The compiled priority list is made of closures, which don't pickle;
+        # it gets compiled again when needed.
+        values = self.__dict__.copy()
+        values.pop('compiled_priority_list', None)
+        return values
+
+    def run_timeline(self, timeline, breakdown):
+        # Runs the events of timeline, a timeline.Timeline, in time order until
+        # it runs out or end_calc_branch ends the fight. Every event is built
+        # from its name with get_next_attack and can queue more through its
+        # setup_queues; one loop runs them all, so fights can be of any length.
+        total_damage = 0
+        self.fight_length = 0
+        while timeline:
+            time, name = timeline.pop()
+            if self.end_calc_branch(time, total_damage):
+                if self.settings.style == 'time':
+                    self.fight_length = self.settings.limit
+                break
+            self.fight_length = time
+            event = self.get_next_attack(name)(self, breakdown, time, timeline, total_damage, self.state)
+            event.calculate_breakdown()
+            total_damage = event.total_damage
+        return breakdown
+
     def shallow_copy_table(self, base):
         #need a deep copy variant
         table = {}
@@ -110,17 +354,11 @@ class DarkmantleCalculator(object):
             table[key] = base[key]
         return table
     
-    def shallow_copy_array(self, base):
-        lst = []
-        for e in base:
-            lst.append(e)
-        return lst
-    
     def _class_bonus_crit(self):
         return 0 #should be overwritten by individual class modules if the crit rate needs to be shifted
     
     def calculate_crit_rate(self):
-        crit = self.stats.get_crit_from_rating(rating=self.state_values['current_stats']['crit'])
+        crit = self.stats.get_crit_from_rating(rating=self.state.current_stats['crit'])
         crit += self._class_bonus_crit() + self.buffs.buff_all_crit()
         return crit
         
\ No newline at end of file
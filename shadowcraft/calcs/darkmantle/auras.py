@@ -0,0 +1,53 @@
+import gettext
+import __builtin__
+
+__builtin__._ = gettext.gettext
+
+from shadowcraft.calcs.darkmantle import tracing
+from shadowcraft.calcs.darkmantle.generic_event import GenericEvent
+
+# Timed and stacking auras of darkmantle simulations.
+#
+# An engine lists the auras it models in aura_definitions, by name, and
+# applies and removes them with its apply_aura and remove_aura methods. The
+# active auras are two state dicts: auras, the expiration time of each one by
+# name (float('inf') when it lasts until removed), and aura_stacks, their
+# stacks. Whether an aura is up, when it runs out or how many stacks it has
+# are dict lookups.
+#
+# Applying an aura with a duration queues its expiration on the timeline, an
+# event named after the aura with expiration_suffix, which removes the aura
+# when it comes up. Refreshing the aura reschedules that event and removing
+# the aura cancels it, see timeline.Timeline; nothing ever scans the auras.
+
+expiration_suffix = '_expires'
+
+
+class Aura(object):
+
+    def __init__(self, name, duration=None, max_stacks=1):
+        # duration is in seconds, None for auras that last until removed.
+        self.name = name
+        self.duration = duration
+        self.max_stacks = max_stacks
+        self.expiration_name = name + expiration_suffix
+        # the event class that expires this aura, see get_aura_expiration
+        self.expiration = type('AuraExpiration', (AuraExpiration,), {'_name': self.expiration_name, 'aura': name})
+
+
+class AuraExpiration(GenericEvent):
+    # Removes an aura at the end of its duration. Aura makes a subclass for
+    # each aura, with aura set to its name.
+    aura = None
+
+    def secondary_effects(self):
+        # on the state only, so that it also runs in batches
+        del self.state.auras[self.aura]
+        self.state.aura_stacks.pop(self.aura, None)
+
+    def calculate_breakdown(self):
+        self.secondary_effects()
+        tracer = self.engine.tracer
+        if tracer.level >= tracing.EVENTS:
+            tracer.record(tracing.EVENTS, self.time, self._name, auras=tuple(sorted(self.state.auras.items())))
+        return self.breakdown
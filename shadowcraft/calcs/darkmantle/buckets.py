@@ -0,0 +1,181 @@
+from shadowcraft.calcs.darkmantle import monte_carlo
+from shadowcraft.calcs.darkmantle import tracing
+
+# Damage over time of darkmantle simulations, in fixed-width time buckets.
+#
+# BucketSink is a tracing sink. Given to a tracer at the EVENTS level, it sums
+# the damage of every ability over buckets of width seconds, and hands each
+# bucket to its callback as soon as the fight moves past it, so that a fight of
+# any length takes the memory of one bucket:
+#
+#   sink = buckets.BucketSink(5, callback)
+#   calculator.tracer = tracing.Tracer(tracing.EVENTS, [sink])
+#   calculator.get_dps_breakdown()
+#   sink.finish(calculator.fight_length)
+#
+# The start record of a fight starts the buckets over, and finish() hands over
+# the last buckets, cut at the end of the fight: the fight length isn't in the
+# records.
+#
+# BucketStatistics aggregates the buckets of many fights, bucket index by
+# bucket index, into monte_carlo.RunningStatistics, and merges with the
+# statistics of other fights; monte_carlo.run does so with a bucket_width. Its
+# memory grows with the number of buckets of the longest fight, not with the
+# number of fights.
+
+
+class Bucket(object):
+    # The events from start to start + duration: the damage of each ability,
+    # and the resources and the names of the active auras as of the last
+    # event, or of the bucket before when there was none.
+
+    def __init__(self, index, width, resources, auras):
+        self.index = index
+        self.start = index * width
+        self.duration = width
+        self.damage = {}
+        self.resources = resources
+        self.auras = auras
+
+    def get_dps(self):
+        if self.duration <= 0:
+            return 0.
+        return sum(self.damage.values()) / self.duration
+
+
+class BucketSink(object):
+
+    def __init__(self, width, callback):
+        self.width = width
+        self.callback = callback
+        self.bucket = None
+
+    def write(self, record):
+        if record.level == tracing.SUMMARY:
+            # the end record can come after the end of the fight, see finish
+            if record.name != 'start':
+                return
+            self.bucket = None
+        index = int(record.time // self.width)
+        if self.bucket is None:
+            self.bucket = Bucket(index, self.width, {}, ())
+        while self.bucket.index < index:
+            bucket = self.bucket
+            self.bucket = Bucket(bucket.index + 1, self.width, bucket.resources, bucket.auras)
+            self.callback(bucket)
+        if record.damage is not None:
+            damage = self.bucket.damage
+            damage[record.name] = damage.get(record.name, 0.) + record.damage
+        if record.resources is not None:
+            self.bucket.resources = record.resources
+        if record.auras is not None:
+            self.bucket.auras = tuple(name for name, expiration in record.auras if expiration > record.time)
+
+    def finish(self, fight_length):
+        # Hands over the buckets up to fight_length.
+        bucket = self.bucket
+        self.bucket = None
+        if bucket is None:
+            return
+        # a health limit can end the fight with an event right at the start of
+        # a bucket, which then has no duration
+        if bucket.damage or bucket.start < fight_length:
+            bucket.duration = max(0, min(self.width, fight_length - bucket.start))
+            self.callback(bucket)
+        while bucket.start + self.width < fight_length:
+            bucket = Bucket(bucket.index + 1, self.width, bucket.resources, bucket.auras)
+            bucket.duration = min(self.width, fight_length - bucket.start)
+            self.callback(bucket)
+
+
+class BucketStatistics(object):
+    # For each bucket index, the statistics over the fights that reached it:
+    # dps, the total damage per second; ability_dps, resources and uptimes,
+    # the fraction of the fights with the aura up as of the bucket, by name.
+    # A name missing from a bucket counts as 0 for it.
+
+    def __init__(self, width):
+        self.width = width
+        self.dps = []
+        self.ability_dps = []
+        self.resources = []
+        self.uptimes = []
+
+    def add(self, bucket):
+        # Adds a bucket of a new fight; usable as a BucketSink callback.
+        index = bucket.index
+        self.extend(index + 1)
+        count = self.dps[index].count
+        self.dps[index].add(bucket.get_dps())
+        duration = bucket.duration
+        add_values(self.ability_dps[index], count,
+                   dict((name, damage / duration if duration > 0 else 0.) for name, damage in bucket.damage.items()))
+        add_values(self.resources[index], count, bucket.resources)
+        add_values(self.uptimes[index], count, dict((name, 1.) for name in bucket.auras))
+
+    def merge(self, other):
+        # Adds the fights behind other, as if their buckets had been added
+        # one by one.
+        self.extend(len(other.dps))
+        for index in xrange(len(other.dps)):
+            count = self.dps[index].count
+            other_count = other.dps[index].count
+            self.dps[index].merge(other.dps[index])
+            for tables, other_tables in ((self.ability_dps, other.ability_dps), (self.resources, other.resources),
+                                         (self.uptimes, other.uptimes)):
+                merge_values(tables[index], count, other_tables[index], other_count)
+
+    def extend(self, size):
+        # Makes room for size buckets.
+        while len(self.dps) < size:
+            self.dps.append(monte_carlo.RunningStatistics())
+            self.ability_dps.append({})
+            self.resources.append({})
+            self.uptimes.append({})
+
+    def get_results(self):
+        # The mean values of every bucket, as dicts.
+        results = []
+        for index, dps in enumerate(self.dps):
+            results.append({
+                'start': index * self.width,
+                'fights': dps.count,
+                'dps': dps.mean,
+                'standard_error': dps.get_standard_error(),
+                'breakdown': get_means(self.ability_dps[index]),
+                'resources': get_means(self.resources[index]),
+                'uptimes': get_means(self.uptimes[index]),
+            })
+        return results
+
+
+def get_statistics(table, name, count):
+    # The statistics of name in table, which has seen count values; count
+    # zeros for a new name.
+    statistics = table.get(name)
+    if statistics is None:
+        statistics = monte_carlo.RunningStatistics()
+        statistics.count = count
+        table[name] = statistics
+    return statistics
+
+
+def add_values(table, count, values):
+    for name, value in values.items():
+        get_statistics(table, name, count).add(value)
+    for name, statistics in table.items():
+        if name not in values:
+            statistics.add(0.)
+
+
+def merge_values(table, count, other_table, other_count):
+    for name in set(table) | set(other_table):
+        other = other_table.get(name)
+        if other is None:
+            other = monte_carlo.RunningStatistics()
+            other.count = other_count
+        get_statistics(table, name, count).merge(other)
+
+
+def get_means(table):
+    return dict((name, statistics.mean) for name, statistics in table.items())
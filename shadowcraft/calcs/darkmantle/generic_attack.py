@@ -6,6 +6,7 @@ import math
 __builtin__._ = gettext.gettext
 
 from shadowcraft.calcs.rogue import RogueDamageCalculator
+from shadowcraft.calcs.darkmantle import tracing
 from shadowcraft.calcs.darkmantle.generic_event import GenericEvent
 from shadowcraft.core import exceptions
 from shadowcraft.objects import procs
@@ -16,6 +17,8 @@ class GenericAttack(GenericEvent):
     _hand = 'mh'
     _cost = 0
     _cast_time = 0.0
+    _triggers_gcd = False
+    is_attack = True
     
     def calculate_damage(self):
         return 1 #to be overwritten by actual actions
@@ -23,29 +26,42 @@ class GenericAttack(GenericEvent):
     def secondary_effects(self):
         return
     
+    def pay_costs(self):
+        self.state.current_power -= self._cost
+        if self._triggers_gcd:
+            self.state.gcd_end = self.time + self.state.gcd_size
+
+    def queue_swing(self, timeline, speed):
+        # Queues the next swing of an autoattack, speed seconds before haste
+        # from now, and records it in state.swing_times so that haste changes
+        # can reschedule it.
+        swing_time = self.time + speed / self.state.stat_multipliers['haste']
+        self.state.swing_times[self._name] = swing_time
+        timeline.append((swing_time, self._name))
+
     def calculate_breakdown(self):
-        if self.engine.end_calc_branch(self.time, self.total_damage):
-            return self.breakdown
+        # Applies this event and queues the ones it triggers, which the
+        # engine's run_timeline loop runs next.
         normal_damage = self.calculate_damage()
         a = self.secondary_effects()
-        self.state_values['current_power'] -= self._cost
+        self.pay_costs()
         crit_rate = 0
         crit_damage = 0
         if self.can_crit:
             crit_rate = self.engine.calculate_crit_rate()
-        #deal with crits at a later time
+        #crits are rolled with the engine's rng; without one the pass is deterministic and crits are left out
+        rng = self.engine.rng
+        if rng is not None and crit_rate and rng.random() < crit_rate:
+            normal_damage *= self.engine.crit_damage_multiplier
         if self._name in self.breakdown:
             self.breakdown[self._name] += normal_damage
         else:
             self.breakdown[self._name] = normal_damage
-        #spawn child objects
-        self.timeline = self.timeline[1:]
-        self.setup_queues(self.timeline, self.state_values['auras'])
-        next_attack_constructor = self.engine.get_next_attack(self.timeline[0][1])
-        #                              engine,      breakdown,      time,                timeline,
-        #                              total_damage,                state_values
-        next = next_attack_constructor(self.engine, self.breakdown, self.timeline[0][0], self.engine.shallow_copy_array(self.timeline),
-                                       self.total_damage,           self.state_values)
-        next.calculate_breakdown()
-        average_breakdown = self.breakdown
-        return average_breakdown
+        self.total_damage += normal_damage
+        tracer = self.engine.tracer
+        if tracer.level >= tracing.EVENTS:
+            tracer.record(tracing.EVENTS, self.time, self._name, damage=normal_damage,
+                          resources=self.engine.get_resources(), auras=tuple(sorted(self.state.auras.items())))
+        #queue child events
+        self.setup_queues(self.timeline, self.state.auras)
+        return self.breakdown
@@ -10,16 +10,24 @@ from shadowcraft.objects import procs
 from shadowcraft.objects import proc_data
 
 class GenericEvent(object):
+    # Decisions run once per actor in batch.BatchSimulation.
+    is_decision = False
+    # Attacks deal damage; the other events only change the state and queue
+    # events.
+    is_attack = False
     
-    def __init__(self, engine, breakdown, time, timeline, total_damage, state_values):
+    def __init__(self, engine, breakdown, time, timeline, total_damage, state):
         self.engine = engine
         self.breakdown = breakdown
         self.time = time
         self.timeline = timeline
         self.total_damage = total_damage
-        self.state_values = state_values
+        self.state = state
         
         self.can_crit = True
     
+    def secondary_effects(self):
+        pass
+
     def setup_queues(self, timeline, buffs):
         pass #to be overwritten by actual actions
@@ -0,0 +1,191 @@
+import gettext
+import __builtin__
+import math
+import random
+
+__builtin__._ = gettext.gettext
+
+from shadowcraft.calcs.darkmantle import tracing
+from shadowcraft.core import exceptions
+
+# Seeded Monte Carlo runs of darkmantle calculators.
+#
+# run() simulates up to a number of iterations of the fight and aggregates the
+# dps of each into a mean and standard error, along with the mean dps of
+# every ability. Iteration i of a run with seed s gets a random.Random of its
+# own, seeded from (s, i), as the engine rng; it also starts from the
+# calculator's state as it was before the run, restored from a snapshot. The result of an
+# iteration therefore only depends on s and i, and a run gives the same
+# numbers whichever worker simulates which iteration.
+#
+# Iterations go by batches of batch_size. Without an executor the batches run
+# in process, on the calculator itself. With one, the calculator is pickled
+# once and rounds of parallel_batches batches go through executor.map, as in
+# calcs.parallel: multiprocessing.Pool or a ProcessPoolExecutor for instance.
+# Batch results are merged in submission order, so the executor and the
+# number of workers don't change the results either.
+#
+# With a target_error, the run stops after the first round that brings the
+# standard error of the mean dps down to target_error times the mean dps
+# (0.001 for 0.1%), once min_iterations are done.
+#
+# With a bucket_width, the run also aggregates the damage over time of the
+# iterations in buckets of bucket_width seconds, see buckets.BucketStatistics;
+# the calculator's tracer is replaced during the run.
+
+
+class RunningStatistics(object):
+    # Count, mean and variance of a stream of values, updated one value at a
+    # time with Welford's algorithm, and mergeable with the statistics of
+    # another stream.
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.
+        self.m2 = 0.
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def merge(self, other):
+        # Adds the values behind other, as if they had been added one by one.
+        if not other.count:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+
+    def get_variance(self):
+        # The sample variance.
+        if self.count < 2:
+            return 0.
+        return self.m2 / (self.count - 1)
+
+    def get_standard_error(self):
+        # The standard error of the mean.
+        if self.count < 2:
+            return 0.
+        return math.sqrt(self.get_variance() / self.count)
+
+
+class BatchResult(object):
+    # The aggregated results of some iterations: the dps statistics, the
+    # sum over the iterations of every ability's dps and, with a bucket_width,
+    # their buckets.BucketStatistics.
+
+    def __init__(self, bucket_width=None):
+        self.dps = RunningStatistics()
+        self.ability_dps = {}
+        self.buckets = None
+        if bucket_width is not None:
+            from shadowcraft.calcs.darkmantle import buckets # which imports this module
+            self.buckets = buckets.BucketStatistics(bucket_width)
+
+    def add(self, breakdown, fight_length):
+        self.dps.add(sum(breakdown.values()) / fight_length)
+        for ability, damage in breakdown.items():
+            self.ability_dps[ability] = self.ability_dps.get(ability, 0.) + damage / fight_length
+
+    def merge(self, other):
+        self.dps.merge(other.dps)
+        for ability, dps in other.ability_dps.items():
+            self.ability_dps[ability] = self.ability_dps.get(ability, 0.) + dps
+        if self.buckets is not None:
+            self.buckets.merge(other.buckets)
+
+
+def get_iteration_seed(seed, iteration):
+    # Distinct for every (seed, iteration) pair with 0 <= iteration < 2 ** 32.
+    return seed * 2 ** 32 + iteration
+
+
+def run(calculator, iterations=1000, seed=0, target_error=None, min_iterations=100, batch_size=100, executor=None,
+        parallel_batches=4, bucket_width=None):
+    if iterations < 1 or batch_size < 1 or parallel_batches < 1:
+        raise exceptions.InvalidInputException(_('iterations, batch_size and parallel_batches need to be >= 1'))
+    if bucket_width is not None and bucket_width <= 0:
+        raise exceptions.InvalidInputException(_('bucket_width={bucket_width} needs to be > 0').format(bucket_width=bucket_width))
+    if target_error is not None and target_error <= 0:
+        raise exceptions.InvalidInputException(_('target_error={target_error} needs to be > 0').format(target_error=target_error))
+    if seed < 0:
+        raise exceptions.InvalidInputException(_('seed={seed} needs to be >= 0').format(seed=seed))
+
+    batches = [(start, min(start + batch_size, iterations)) for start in xrange(0, iterations, batch_size)]
+    if executor is None:
+        rounds = [[batch] for batch in batches]
+        snapshot = None
+    else:
+        rounds = [batches[i:i + parallel_batches] for i in xrange(0, len(batches), parallel_batches)]
+        import cPickle
+        snapshot = cPickle.dumps(calculator, cPickle.HIGHEST_PROTOCOL)
+
+    result = BatchResult(bucket_width)
+    converged = False
+    for round_batches in rounds:
+        if executor is None:
+            round_results = [_run_batch(calculator, seed, start, stop, bucket_width) for start, stop in round_batches]
+        else:
+            round_results = executor.map(_run_batch_snapshot, [(snapshot, seed, start, stop, bucket_width)
+                                                               for start, stop in round_batches])
+        for batch_result in round_results:
+            result.merge(batch_result)
+        if target_error is not None and result.dps.count >= min_iterations and \
+           result.dps.get_standard_error() <= target_error * abs(result.dps.mean):
+            converged = True
+            break
+
+    count = result.dps.count
+    results = {
+        'iterations': count,
+        'dps': result.dps.mean,
+        'standard_error': result.dps.get_standard_error(),
+        'breakdown': dict((ability, dps / count) for ability, dps in result.ability_dps.items()),
+        'converged': converged,
+    }
+    if result.buckets is not None:
+        results['buckets'] = result.buckets.get_results()
+    return results
+
+
+def _run_batch_snapshot(args):
+    # Runs in the worker; module level so it can be pickled.
+    import cPickle
+    snapshot, seed, start, stop, bucket_width = args
+    return _run_batch(cPickle.loads(snapshot), seed, start, stop, bucket_width)
+
+
+def _run_batch(calculator, seed, start, stop, bucket_width=None):
+    # Leaves the calculator as it found it.
+    state = calculator.state
+    snapshot = state.snapshot()
+    rng = calculator.__dict__.get('rng')
+    tracer = calculator.__dict__.get('tracer')
+    result = BatchResult(bucket_width)
+    sink = None
+    if bucket_width is not None:
+        from shadowcraft.calcs.darkmantle import buckets
+        sink = buckets.BucketSink(bucket_width, result.buckets.add)
+        calculator.tracer = tracing.Tracer(tracing.EVENTS, [sink])
+    try:
+        for iteration in xrange(start, stop):
+            state.restore(snapshot)
+            calculator.rng = random.Random(get_iteration_seed(seed, iteration))
+            breakdown = calculator.get_dps_breakdown()
+            if calculator.fight_length <= 0:
+                raise exceptions.InvalidInputException(_('The simulated fight has no length'))
+            result.add(breakdown, calculator.fight_length)
+            if sink is not None:
+                sink.finish(calculator.fight_length)
+    finally:
+        state.restore(snapshot)
+        for name, value in (('rng', rng), ('tracer', tracer)):
+            if value is None:
+                calculator.__dict__.pop(name, None)
+            else:
+                setattr(calculator, name, value)
+    return result
@@ -0,0 +1,18 @@
+import gettext
+import __builtin__
+
+__builtin__._ = gettext.gettext
+
+from shadowcraft.calcs.darkmantle.generic_event import GenericEvent
+
+class PriorityEvent(GenericEvent):
+    # Wakes the rotation up: queues the action the priority list picks, or
+    # the next wake-up when it picks none (see DarkmantleCalculator.decide).
+    _name = 'priority_queue'
+    is_decision = True
+
+    def calculate_breakdown(self):
+        event = self.engine.decide(self.state, self.time)
+        if event is not None:
+            self.timeline.append(event)
+        return self.breakdown
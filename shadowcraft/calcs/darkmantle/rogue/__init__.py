@@ -6,41 +6,139 @@ import math
 __builtin__._ = gettext.gettext
 
 import shadowcraft
+from shadowcraft.calcs import darkmantle
 from shadowcraft.calcs.darkmantle import DarkmantleCalculator
+from shadowcraft.calcs.darkmantle import priority_event
+from shadowcraft.calcs.darkmantle import state
+from shadowcraft.calcs.darkmantle import timeline
+from shadowcraft.calcs.darkmantle import tracing
 from shadowcraft.calcs.darkmantle.rogue import mh_attack
 from shadowcraft.calcs.darkmantle.rogue import oh_attack
 from shadowcraft.calcs.darkmantle.rogue import instant_poison
+from shadowcraft.calcs.darkmantle.rogue import eviscerate
+from shadowcraft.calcs.darkmantle.rogue import sinister_strike
 from shadowcraft.core import exceptions
 from shadowcraft.objects import procs
 from shadowcraft.objects import proc_data
 
 
-class InputNotModeledException(exceptions.InvalidInputException):
+class InputNotModeledException(darkmantle.InputNotModeledException):
     # I'll return these when inputs don't make sense to the model.
     pass
 
+class RogueSimulationState(state.SimulationState):
+    __slots__ = (
+        'anticipation',         # combo points banked past max_second_power
+        'anticipation_max',
+        'bg_counter',           # bandit's guile
+    )
+    fields = state.SimulationState.fields + __slots__
+
+    def __init__(self):
+        super(RogueSimulationState, self).__init__()
+        self.anticipation = 0
+        self.anticipation_max = 0
+        self.bg_counter = 0
+
 class RogueDarkmantleCalculator(DarkmantleCalculator):
+    state_class = RogueSimulationState
     abilities_list = {
         'mh_autoattack': mh_attack,
         'oh_autoattack': oh_attack,
         'instant_poison': instant_poison,
+        'eviscerate': eviscerate,
+        'sinister_strike': sinister_strike,
     }    
     ability_constructors = {
         'mh_autoattack': mh_attack.MHAttack,
         'oh_autoattack': oh_attack.OHAttack,
         'instant_poison': instant_poison.InstantPoison,
+        'eviscerate': eviscerate.Eviscerate,
+        'sinister_strike': sinister_strike.SinisterStrike,
+        'priority_queue': priority_event.PriorityEvent,
+    }
+    resource_names = ('current_power', 'current_second_power', 'anticipation')
+    # the priority list variables that are state fields
+    apl_resources = {
+        'energy': 'current_power',
+        'energy.max': 'max_power',
+        'combo_points': 'current_second_power',
+        'combo_points.max': 'max_second_power',
+        'anticipation': 'anticipation',
+        'anticipation.max': 'anticipation_max',
     }
     
     def get_next_attack(self, name):
         #pulls the constructor, not the module
         if name not in self.ability_constructors:
+            expiration = self.get_aura_expiration(name)
+            if expiration is not None:
+                return expiration
             raise InputNotModeledException(_('Can\'t locate action: {action}').format(action=str(name)))
         return self.ability_constructors[name]
     
-    def can_cast_ability(self, name):
-        if abilities_list._cost < self.state_values['current_power'] and self.state_values['cooldown'][name] < self.time:
-            return True
-        return False
+    def can_cast_ability(self, name, time):
+        return self.get_ready_time(name, self.state, time) <= time
+
+    def get_power_regen(self, state):
+        # energy per second
+        haste = self.stats.get_haste_multiplier_from_rating(rating=state.current_stats['haste'])
+        return state.base_power_regen * haste * state.stat_multipliers['haste']
+
+    def update_resources(self, state, time):
+        # Energy regenerates continuously: current_power is the energy at
+        # power_time, and gets brought up to date before every decision.
+        if time > state.power_time:
+            regen = self.get_power_regen(state)
+            state.current_power = min(state.max_power, state.current_power + regen * (time - state.power_time))
+            state.power_time = time
+
+    def get_power_time(self, state, power):
+        # The time at which the energy reaches power, None if it never does.
+        if power <= state.current_power:
+            return state.power_time
+        if power > state.max_power:
+            return None
+        regen = self.get_power_regen(state)
+        time = state.power_time + (power - state.current_power) / regen
+        # rounding can leave update_resources just short of power at time
+        while state.current_power + regen * (time - state.power_time) < power:
+            time += time * 2 ** -52
+        return time
+
+    def get_ready_time(self, name, state, time):
+        ready_time = super(RogueDarkmantleCalculator, self).get_ready_time(name, state, time)
+        power_time = self.get_power_time(state, self.get_next_attack(name)._cost)
+        if power_time is None:
+            return float('inf')
+        return max(ready_time, power_time)
+
+    def get_crossing_times(self, variable, value, state, time):
+        # energy only goes up between decisions
+        if variable in ('energy', 'energy.deficit', 'energy.time_to_max') and value is not None:
+            if variable == 'energy.deficit':
+                value = state.max_power - value
+            elif variable == 'energy.time_to_max':
+                value = state.max_power - value * self.get_power_regen(state)
+            power_time = self.get_power_time(state, value)
+            if power_time is None:
+                return ()
+            return (power_time,)
+        return super(RogueDarkmantleCalculator, self).get_crossing_times(variable, value, state, time)
+
+    def get_apl_variable(self, name):
+        if name in self.apl_resources:
+            field = self.apl_resources[name]
+            return lambda state, time: getattr(state, field)
+        if name == 'energy.deficit':
+            return lambda state, time: state.max_power - state.current_power
+        if name == 'energy.regen':
+            return lambda state, time: self.get_power_regen(state)
+        if name == 'energy.time_to_max':
+            return lambda state, time: max(state.max_power - state.current_power, 0) / self.get_power_regen(state)
+        if name == 'combo_points.deficit':
+            return lambda state, time: state.max_second_power - state.current_second_power
+        return super(RogueDarkmantleCalculator, self).get_apl_variable(name)
     
     def _get_values_for_class(self):
         #override global states if necessary
@@ -72,6 +170,7 @@ class RogueDarkmantleCalculator(DarkmantleCalculator):
             class_table['anticipation_max'] = 5
         if self.settings.is_combat_rogue():
             class_table['bg_counter'] = 0
+            class_table['cooldowns'] = {'killing_spree': 0, 'adrenaline_rush': 0}
         
         return class_table
     
@@ -98,6 +197,17 @@ class RogueDarkmantleCalculator(DarkmantleCalculator):
         else:
             raise InputNotModeledException(_('You must specify a spec.'))
     
+    def get_timeline(self):
+        # The opening events of the fight, or None for the specs that aren't
+        # simulated yet.
+        if self.settings.is_combat_rogue():
+            return self.combat_timeline()
+        return None
+
+    def get_lockstep_key(self):
+        key = super(RogueDarkmantleCalculator, self).get_lockstep_key()
+        return key + (self.stats.mh.speed, self.stats.oh.speed)
+
     def assassination_dps_estimate(self):
         return sum(self.assassination_dps_breakdown().values())
     def assassination_dps_breakdown(self):
@@ -109,26 +219,21 @@ class RogueDarkmantleCalculator(DarkmantleCalculator):
     def combat_dps_estimate(self):
         return sum(self.combat_dps_breakdown().values())
     def combat_dps_breakdown(self):
-        print 'Calculating Combat Breakdown...'
+        if self.tracer.level >= tracing.SUMMARY:
+            self.tracer.record(tracing.SUMMARY, 0, 'start', resources=self.get_resources(),
+                               auras=tuple(sorted(self.state.auras.items())), message='calculating combat breakdown')
         breakdown = {}
-        event_queue = []
+        return self.run_timeline(self.get_timeline(), breakdown) #timer always starts at 0, prefight has no bearing
+    def combat_timeline(self):
         #determine pre-fight sequence, establish baseline event_queue and auras
         #read priority list, determine first action
         #load event_state object with event_queue
-        event_queue = [(0.0, 'mh_autoattack'), (0.01, 'oh_autoattack')] #temporary for development purposes
         #self.combat_priority_list() #should determine opener, as well as handle normal rotational decisions
-        root_event = mh_attack.MHAttack(self, breakdown, 0, event_queue, 0, self.state_values) #timer always starts at 0, prefight has no bearing
-        root_event.calculate_breakdown()
-        return breakdown
-    def combat_priority_list(self, cost):
-        action = 'wait'
-        if self.state_values['current_energy'] > cost and self.state_values['combo_points'] < self.state_values['max_second_power']:
-            action = 'sinister_strike'
-        if self.state_values['current_energy'] > cost and self.state_values['combo_points'] == self.state_values['max_second_power']:
-            action = 'eviscerate'
-        if self.state_values:
-            return
-        return action
+        return timeline.Timeline([(0.0, 'mh_autoattack'), (0.0, 'priority_queue'), (0.01, 'oh_autoattack')]) #temporary for development purposes
+    def combat_priority_list(self, time):
+        # The action to use at time, or 'wait' when none can be used.
+        self.update_resources(self.state, time)
+        return self.get_priority_list().get_action(self.state, time) or 'wait'
     
     def subtlety_dps_estimate(self):
         return sum(self.subtlety_dps_breakdown().values())
@@ -139,24 +244,24 @@ class RogueDarkmantleCalculator(DarkmantleCalculator):
         return {'none':1.}
     
     def reset_bandits_guile(self):
-        self.state_values['bg_counter'] = 0
-        self.state_values['damage_multiplier'] *= 1.0 / 1.5 #BG30 is now 50%
+        self.state.bg_counter = 0
+        self.state.damage_multiplier *= 1.0 / 1.5 #BG30 is now 50%
     
     def set_bandits_guile_level(self):
-        c = self.state_values['bg_counter']
-        level = math.min(c // 4, 3) #BG30/50 is highest level
+        c = self.state.bg_counter
+        level = min(c // 4, 3) #BG30/50 is highest level
         if level == 3:
-            self.state_values['damage_multiplier'] *= 1.5 / 1.2 #would be 1.3/1.2 if under level 100
+            self.state.damage_multiplier *= 1.5 / 1.2 #would be 1.3/1.2 if under level 100
         else:
-            self.state_values['damage_multiplier'] *= (1 + .1 * level) / (1 + .1 * (level-1))
+            self.state.damage_multiplier *= (1 + .1 * level) / (1 + .1 * (level-1))
             
     def restless_blades_impact(self, cp):
-        self.state_values['cooldown']['killing_spree'] -= 2 * cp
-        self.state_values['cooldown']['adrenaline_rush'] -= 2 * cp
+        self.state.cooldowns['killing_spree'] -= 2 * cp
+        self.state.cooldowns['adrenaline_rush'] -= 2 * cp
     
     def set_sanguinary_veins(self, enabled=True):
         if enabled:
-            self.state_values['damage_multiplier'] *= 1.2
+            self.state.damage_multiplier *= 1.2
         else:
-            self.state_values['damage_multiplier'] *= 1.0/1.2
+            self.state.damage_multiplier *= 1.0/1.2
     
\ No newline at end of file
@@ -17,8 +17,7 @@ class InstantPoison(GenericAttack):
     
     def calculate_damage(self):
         # non-normalized weapon strike => (mh_weapon_damage + ap / 3.5 * weapon_speed) * weapon_damage_percentage
-        print 'Instant Poison: ', self.state_values['effective_ap'] * .20
-        return self.state_values['effective_ap'] * .20 #???
+        return self.state.effective_ap * .20 #???
     
     def setup_queues(self, timeline, buffs):
         return #nothing else to trigger for now
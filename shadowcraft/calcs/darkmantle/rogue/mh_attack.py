@@ -12,8 +12,7 @@ class MHAttack(GenericAttack):
     
     def calculate_damage(self):
         # non-normalized weapon strike => (mh_weapon_damage + ap / 3.5 * weapon_speed) * weapon_damage_percentage
-        print 'MH Attack: ', self.engine.stats.mh.speed * (self.engine.stats.mh.weapon_dps + self.state_values['effective_ap'] / 3.5)
-        return self.engine.stats.mh.speed * (self.engine.stats.mh.weapon_dps + self.state_values['effective_ap'] / 3.5)
+        return self.engine.stats.mh.speed * (self.engine.stats.mh.weapon_dps + self.state.effective_ap / 3.5)
     
     def setup_queues(self, timeline, buffs):
-        timeline.append((self.time + self.engine.stats.mh.speed, 'mh_autoattack'))
+        self.queue_swing(timeline, self.engine.stats.mh.speed)
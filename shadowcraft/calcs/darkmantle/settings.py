@@ -1,4 +1,5 @@
 from shadowcraft.core import exceptions
+from shadowcraft.objects.priority_list import PriorityList
 
 class Settings(object):
 
@@ -31,6 +32,9 @@ class Cycle(object):
     # 'combat', or 'subtlety' - this is how the damage calculator makes sure
     # you have an appropriate cycle object to go with your talent trees, etc.
     _cycle_type = ''
+    # The PriorityList the rotation follows, None for the specs that don't
+    # simulate one yet.
+    priority_list = None
 
 
 class AssassinationCycle(Cycle):
@@ -42,9 +46,15 @@ class AssassinationCycle(Cycle):
 
 class CombatCycle(Cycle):
     _cycle_type = 'combat'
-
-    def __init__(self):
-        return
+    default_priority_list = (
+        'eviscerate,if=combo_points=combo_points.max',
+        'sinister_strike,if=combo_points<combo_points.max',
+    )
+
+    def __init__(self, priority_list=None):
+        if priority_list is None:
+            priority_list = PriorityList(*self.default_priority_list)
+        self.priority_list = priority_list
         
 class SubtletyCycle(Cycle):
     _cycle_type = 'subtlety'
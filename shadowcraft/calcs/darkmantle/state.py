@@ -0,0 +1,82 @@
+# The mutable state of a darkmantle simulation.
+#
+# A SimulationState has a fixed set of fields, in slots, which the events
+# read and update as plain attributes. Setting a field that doesn't exist
+# raises AttributeError, so a misspelled name fails at once instead of adding
+# a new key. Class specific engines extend the fields by subclassing and
+# adding to __slots__; fields lists them all, in order.
+#
+# snapshot() returns the values of the fields, with the dicts copied, and
+# restore() brings a state back to a snapshot, copying the dicts again so
+# that the snapshot can be restored any number of times: once per iteration
+# of a Monte Carlo run, or once per branch of a search.
+
+
+class SimulationState(object):
+    __slots__ = (
+        'damage_multiplier',
+        'gcd_size',
+        'gcd_end',              # the time the global cooldown is over
+        'current_power',
+        'power_time',           # the time current_power is for, see update_resources
+        'max_power',
+        'base_power_regen',
+        'current_second_power',
+        'max_second_power',
+        'effective_ap',
+        'current_stats',        # by stat name
+        'stat_multipliers',     # by stat name
+        'cooldowns',            # the time each cooldown is ready again, by name
+        'auras',                # the expiration time of each active aura, by name
+        'aura_stacks',          # the stacks of each active aura, by name
+        'swing_times',          # the time of the pending swing of each autoattack, by event name
+        'wake_up_time',         # the time of the pending priority list wake-up, or None
+        'last_proc_times',      # by proc slot
+    )
+    fields = __slots__
+
+    def __init__(self):
+        self.damage_multiplier = 1.
+        self.gcd_size = 1.
+        self.gcd_end = 0
+        self.current_power = 0
+        self.power_time = 0
+        self.max_power = 0
+        self.base_power_regen = 0
+        self.current_second_power = 0
+        self.max_second_power = 0
+        self.effective_ap = 0
+        self.current_stats = {}
+        self.stat_multipliers = {}
+        self.cooldowns = {}
+        self.auras = {}
+        self.aura_stacks = {}
+        self.swing_times = {}
+        self.wake_up_time = None
+        self.last_proc_times = {}
+
+    def snapshot(self):
+        values = []
+        for name in self.fields:
+            value = getattr(self, name)
+            if type(value) is dict:
+                value = dict(value)
+            values.append(value)
+        return tuple(values)
+
+    def restore(self, snapshot):
+        for name, value in zip(self.fields, snapshot):
+            if type(value) is dict:
+                value = dict(value)
+            setattr(self, name, value)
+
+    def copy(self):
+        state = object.__new__(type(self))
+        state.restore(self.snapshot())
+        return state
+
+    def __getstate__(self):
+        return self.snapshot()
+
+    def __setstate__(self, snapshot):
+        self.restore(snapshot)
@@ -0,0 +1,120 @@
+import heapq
+
+# The pending events of a darkmantle simulation, as a binary heap.
+#
+# Events go in as (time, name) tuples through append, which is all that
+# GenericEvent.setup_queues implementations need, and come out of pop in time
+# order. Events at the same time come out in the order they were added: the
+# heap entries are (time, sequence number, name) triples, so ties never fall
+# through to comparing names.
+#
+# An event is its own handle: cancel((time, name)) drops a pending event and
+# reschedule((time, name), new_time) moves it, for swing timers that haste
+# speeds up or slows down mid-swing. Cancelling is lazy, the entry is only
+# counted as cancelled and skipped when it comes up, so a reschedule costs a
+# single heap push. Two pending events with the same time and name can't be
+# told apart, and either one can go. The heap is rebuilt without the
+# cancelled entries once they make up more than half of it.
+
+
+class Timeline(object):
+
+    def __init__(self, events=()):
+        self.queue = []
+        self.counter = 0
+        self.cancelled = {}
+        self.cancelled_count = 0
+        for event in events:
+            self.append(event)
+
+    def append(self, event):
+        # Queues event, and returns it as its handle.
+        time, name = event
+        heapq.heappush(self.queue, (time, self.counter, name))
+        self.counter += 1
+        return event
+
+    def pop(self):
+        # The next event, as a (time, name) tuple.
+        while True:
+            time, counter, name = heapq.heappop(self.queue)
+            if self.cancelled_count and self.is_cancelled((time, name), True):
+                continue
+            return time, name
+
+    def peek(self):
+        if self.cancelled_count:
+            self.drop_cancelled()
+        time, counter, name = self.queue[0]
+        return time, name
+
+    def cancel(self, event):
+        # Drops event, which must be pending.
+        self.cancelled[event] = self.cancelled.get(event, 0) + 1
+        self.cancelled_count += 1
+        if self.cancelled_count * 2 > len(self.queue):
+            self.compact()
+
+    def reschedule(self, event, time):
+        # Moves event, which must be pending, to time; returns its new handle.
+        if event[0] == time:
+            return event
+        self.cancel(event)
+        return self.append((time, event[1]))
+
+    def is_cancelled(self, event, uncount=False):
+        # Whether a pending copy of event is cancelled; uncount, when the
+        # entry for it has left the heap.
+        count = self.cancelled.get(event)
+        if not count:
+            return False
+        if uncount:
+            if count == 1:
+                del self.cancelled[event]
+            else:
+                self.cancelled[event] = count - 1
+            self.cancelled_count -= 1
+        return True
+
+    def drop_cancelled(self):
+        # Pops the cancelled entries off the top of the heap.
+        while self.queue:
+            time, counter, name = self.queue[0]
+            if not self.is_cancelled((time, name), True):
+                return
+            heapq.heappop(self.queue)
+
+    def compact(self):
+        # Rebuilds the heap without the cancelled entries, dropping the first
+        # of equal events as pop does; a sorted list is a heap.
+        cancelled = self.cancelled
+        queue = []
+        for entry in sorted(self.queue):
+            event = (entry[0], entry[2])
+            if cancelled.get(event):
+                cancelled[event] -= 1
+            else:
+                queue.append(entry)
+        self.queue = queue
+        self.cancelled = {}
+        self.cancelled_count = 0
+
+    def copy(self):
+        events = Timeline()
+        events.queue = list(self.queue)
+        events.counter = self.counter
+        events.cancelled = dict(self.cancelled)
+        events.cancelled_count = self.cancelled_count
+        return events
+
+    def __len__(self):
+        return len(self.queue) - self.cancelled_count
+
+    def __iter__(self):
+        # The pending events in the order pop returns them.
+        cancelled = dict(self.cancelled)
+        for time, counter, name in sorted(self.queue):
+            if cancelled.get((time, name)):
+                cancelled[(time, name)] -= 1
+                continue
+            yield time, name
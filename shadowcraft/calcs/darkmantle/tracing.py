@@ -0,0 +1,96 @@
+import collections
+import sys
+
+# Tracing of darkmantle simulations.
+#
+# A DarkmantleCalculator traces through its tracer attribute, null_tracer by
+# default. Callers check the tracer level before building a record, so a
+# disabled tracer costs an attribute lookup and a comparison per event and
+# nothing gets formatted:
+#
+#   tracer = self.engine.tracer
+#   if tracer.level >= tracing.EVENTS:
+#       tracer.record(tracing.EVENTS, time, name, damage=damage)
+#
+# Levels, each including the ones before it:
+#   SUMMARY     start and end of the fight
+#   EVENTS      every damage event and aura expiration
+#
+# Records go to the tracer's sinks, which are objects with a write(record)
+# method: RingBuffer keeps the last records in memory, StreamSink prints them.
+
+OFF = 0
+SUMMARY = 1
+EVENTS = 2
+
+level_names = {SUMMARY: 'summary', EVENTS: 'events'}
+
+# time is the fight time in seconds; resources and auras are copies of the
+# engine state at the time of the record, or None when not relevant: a dict
+# of the resources, and the (name, expiration time) pairs of the auras.
+TraceRecord = collections.namedtuple('TraceRecord', 'level time name damage resources auras message')
+
+
+class Tracer(object):
+
+    def __init__(self, level=EVENTS, sinks=None, capacity=1000):
+        # Without sinks, the records go to a RingBuffer of capacity records,
+        # available as self.buffer.
+        self.level = level
+        if sinks is None:
+            self.buffer = RingBuffer(capacity)
+            sinks = [self.buffer]
+        self.sinks = list(sinks)
+
+    def record(self, level, time, name, damage=None, resources=None, auras=None, message=None):
+        if level > self.level:
+            return
+        record = TraceRecord(level, time, name, damage, resources, auras, message)
+        for sink in self.sinks:
+            sink.write(record)
+
+null_tracer = Tracer(OFF, [])
+
+
+class RingBuffer(object):
+    # The last capacity records, oldest first.
+
+    def __init__(self, capacity=1000):
+        self.records = collections.deque(maxlen=capacity)
+
+    def write(self, record):
+        self.records.append(record)
+
+    def get_records(self, level=None):
+        return [record for record in self.records if level is None or record.level <= level]
+
+    def clear(self):
+        self.records.clear()
+
+    def __len__(self):
+        return len(self.records)
+
+
+class StreamSink(object):
+    # Writes one line per record to stream, sys.stdout by default (looked up
+    # on every write, so that it follows redirections).
+
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def write(self, record):
+        stream = self.stream or sys.stdout
+        stream.write(format_record(record) + '\n')
+
+
+def format_record(record):
+    parts = ['{0:9.3f}'.format(record.time), record.name]
+    if record.damage is not None:
+        parts.append('damage={0:.1f}'.format(record.damage))
+    if record.resources:
+        parts.extend('{0}={1}'.format(name, value) for name, value in sorted(record.resources.items()))
+    if record.auras:
+        parts.append('auras={0}'.format(','.join(str(aura[0]) for aura in record.auras)))
+    if record.message:
+        parts.append(record.message)
+    return ' '.join(parts)
@@ -0,0 +1,146 @@
+# Memoization of dps results across calls and calculators.
+#
+# Results are keyed by a fingerprint of everything a calculator reads as
+# input: its class and levels, stats, weapons, equipped procs, gear buffs,
+# buffs, talents, glyphs, race and settings. Two calculators built from the
+# same inputs get the same fingerprint, so a cache can be shared between them;
+# anything derived from the inputs (the converged aps, proc uptimes and so on)
+# is left out on purpose.
+
+
+def get_fingerprint(calculator):
+    # A sha1 hex digest of the calculator inputs. Numbers are hashed as the
+    # repr of their float value, which round-trips: any input change gets a
+    # new fingerprint, but 3650 and 3650. (what adding 1. to a stat and taking
+    # it off again leaves) get the same one.
+    stats = calculator.stats
+    fingerprint = (
+        type(calculator).__module__,
+        type(calculator).__name__,
+        calculator.level,
+        calculator.target_level,
+        calculator.char_class,
+        _get_stats_key(stats),
+        _get_weapon_key(stats.mh),
+        _get_weapon_key(stats.oh),
+        _get_flags_key(stats.procs, stats.procs.allowed_procs, lambda proc: _get_number(proc.item_level)),
+        _get_flags_key(stats.gear_buffs, stats.gear_buffs.allowed_buffs),
+        _get_flags_key(calculator.buffs, calculator.buffs.allowed_buffs),
+        calculator.talents.game_class,
+        _get_flags_key(calculator.talents, calculator.talents.allowed_talents),
+        _get_flags_key(calculator.glyphs, calculator.glyphs.allowed_glyphs),
+        calculator.race.race_name,
+        _get_canonical(calculator.settings),
+    )
+    # hashlib is only imported here, as most runs never use a cache and it
+    # is slow to import.
+    import hashlib
+    return hashlib.sha1(repr(fingerprint)).hexdigest()
+
+
+def _get_stats_key(stats):
+    key = []
+    for name, value in sorted(stats.__dict__.items()):
+        if isinstance(value, (int, long, float, basestring)) or value is None:
+            key.append((name, _get_number(value)))
+    return tuple(key)
+
+
+def _get_weapon_key(weapon):
+    enchants = tuple(sorted(name for name in weapon.allowed_melee_enchants if weapon.__dict__.get(name)))
+    return (_get_number(weapon.speed), _get_number(weapon.weapon_dps), weapon.type, enchants)
+
+
+def _get_flags_key(target, allowed_names, get_detail=None):
+    # The names, and optionally some detail, of every flag set on target.
+    key = []
+    for name in sorted(allowed_names):
+        value = getattr(target, name)
+        if value:
+            if get_detail is None:
+                key.append(name)
+            else:
+                key.append((name, get_detail(value)))
+    return tuple(key)
+
+
+def _get_canonical(value):
+    if isinstance(value, dict):
+        return tuple(sorted((key, _get_canonical(item)) for key, item in value.items()))
+    elif isinstance(value, (list, tuple)):
+        return tuple(_get_canonical(item) for item in value)
+    elif isinstance(value, (set, frozenset)):
+        return tuple(sorted(value))
+    elif hasattr(value, '__dict__'):
+        return (type(value).__name__, _get_canonical(value.__dict__))
+    return _get_number(value)
+
+
+def _get_number(value):
+    # Numbers as floats, bools and anything else as they are.
+    if isinstance(value, (int, long, float)) and not isinstance(value, bool):
+        return float(value)
+    return value
+
+
+class DpsCache(object):
+    # A least recently used cache of dps results, with hit and miss counters.
+    # Entries are kept in a circular doubly linked list, most recently used
+    # first, so lookups, insertions and evictions are all constant time.
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self.clear()
+
+    def clear(self):
+        self.hits = 0
+        self.misses = 0
+        self.entries = {}
+        # Each link is [previous, next, key, value].
+        self.root = []
+        self.root[:] = [self.root, self.root, None, None]
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key, compute):
+        # Returns the value cached for key, calling compute to get it on a
+        # miss.
+        link = self.entries.get(key)
+        if link is not None:
+            self.hits += 1
+            self._unlink(link)
+            self._link_first(link)
+            return link[3]
+        self.misses += 1
+        value = compute()
+        self.put(key, value)
+        return value
+
+    def put(self, key, value):
+        if key in self.entries:
+            self._unlink(self.entries.pop(key))
+        if self.max_size <= 0:
+            return
+        if len(self.entries) >= self.max_size:
+            oldest = self.root[0]
+            self._unlink(oldest)
+            del self.entries[oldest[2]]
+        link = [None, None, key, value]
+        self._link_first(link)
+        self.entries[key] = link
+
+    def _unlink(self, link):
+        previous, next = link[0], link[1]
+        previous[1] = next
+        next[0] = previous
+
+    def _link_first(self, link):
+        first = self.root[1]
+        link[0] = self.root
+        link[1] = first
+        first[0] = link
+        self.root[1] = link
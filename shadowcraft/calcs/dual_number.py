@@ -0,0 +1,142 @@
+import math
+
+# Forward-mode automatic differentiation. A DualNumber carries a value along
+# with its partial derivatives with respect to a fixed, ordered set of inputs;
+# arithmetic on it applies the chain rule, so running a model on dual inputs
+# yields the output and its full gradient in a single pass.
+#
+# Comparisons and truth tests only look at the value: branches in the model
+# are taken exactly as they would be for plain floats, and the derivative is
+# that of the branch taken. Anything that converts to float (round, math.floor,
+# int, ...) drops the derivatives, which is correct for step functions and
+# wrong for everything else, so keep those out of stat-dependent code paths.
+
+
+class DualNumber(object):
+    __slots__ = ('value', 'derivatives')
+
+    def __init__(self, value, derivatives):
+        self.value = value
+        self.derivatives = derivatives
+
+    @classmethod
+    def variable(cls, value, index, size):
+        # The index-th of size independent inputs, at the given value.
+        derivatives = [0.] * size
+        derivatives[index] = 1.
+        return cls(value, tuple(derivatives))
+
+    def __repr__(self):
+        return 'DualNumber({value!r}, {derivatives!r})'.format(value=self.value, derivatives=self.derivatives)
+
+    def __float__(self):
+        return float(self.value)
+
+    def __int__(self):
+        return int(self.value)
+
+    def __nonzero__(self):
+        return bool(self.value)
+
+    def __hash__(self):
+        return hash(self.value)
+
+    def __eq__(self, other):
+        return self.value == value_of(other)
+
+    def __ne__(self, other):
+        return self.value != value_of(other)
+
+    def __lt__(self, other):
+        return self.value < value_of(other)
+
+    def __le__(self, other):
+        return self.value <= value_of(other)
+
+    def __gt__(self, other):
+        return self.value > value_of(other)
+
+    def __ge__(self, other):
+        return self.value >= value_of(other)
+
+    def __neg__(self):
+        return DualNumber(-self.value, tuple([-d for d in self.derivatives]))
+
+    def __pos__(self):
+        return self
+
+    def __abs__(self):
+        if self.value < 0:
+            return -self
+        return self
+
+    def __add__(self, other):
+        if isinstance(other, DualNumber):
+            return DualNumber(self.value + other.value, tuple([a + b for a, b in zip(self.derivatives, other.derivatives)]))
+        return DualNumber(self.value + other, self.derivatives)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        if isinstance(other, DualNumber):
+            return DualNumber(self.value - other.value, tuple([a - b for a, b in zip(self.derivatives, other.derivatives)]))
+        return DualNumber(self.value - other, self.derivatives)
+
+    def __rsub__(self, other):
+        return DualNumber(other - self.value, tuple([-d for d in self.derivatives]))
+
+    def __mul__(self, other):
+        if isinstance(other, DualNumber):
+            return DualNumber(self.value * other.value,
+                              tuple([a * other.value + b * self.value for a, b in zip(self.derivatives, other.derivatives)]))
+        return DualNumber(self.value * other, tuple([d * other for d in self.derivatives]))
+
+    __rmul__ = __mul__
+
+    def __div__(self, other):
+        if isinstance(other, DualNumber):
+            value = self.value / other.value
+            return DualNumber(value, tuple([(a - value * b) / other.value for a, b in zip(self.derivatives, other.derivatives)]))
+        return DualNumber(self.value / other, tuple([d / other for d in self.derivatives]))
+
+    __truediv__ = __div__
+
+    def __rdiv__(self, other):
+        value = other / self.value
+        return DualNumber(value, tuple([-value * d / self.value for d in self.derivatives]))
+
+    __rtruediv__ = __rdiv__
+
+    def __pow__(self, other):
+        if isinstance(other, DualNumber):
+            value = self.value ** other.value
+            if self.value == 0:
+                return DualNumber(value, tuple([0.] * len(self.derivatives)))
+            log_value = math.log(self.value)
+            return DualNumber(value, tuple([value * (other.value * a / self.value + log_value * b)
+                                            for a, b in zip(self.derivatives, other.derivatives)]))
+        if other == 0:
+            return DualNumber(self.value ** other, tuple([0.] * len(self.derivatives)))
+        factor = other * self.value ** (other - 1)
+        return DualNumber(self.value ** other, tuple([factor * d for d in self.derivatives]))
+
+    def __rpow__(self, other):
+        value = other ** self.value
+        if other == 0:
+            return DualNumber(value, tuple([0.] * len(self.derivatives)))
+        factor = value * math.log(other)
+        return DualNumber(value, tuple([factor * d for d in self.derivatives]))
+
+
+def value_of(number):
+    # The plain value of a DualNumber or of a regular number.
+    if isinstance(number, DualNumber):
+        return number.value
+    return number
+
+
+def derivatives_of(number, size):
+    # The derivatives of number; regular numbers are constants.
+    if isinstance(number, DualNumber):
+        return number.derivatives
+    return (0.,) * size
@@ -0,0 +1,167 @@
+import gettext
+import __builtin__
+
+__builtin__._ = gettext.gettext
+
+from shadowcraft.core import exceptions
+
+# Support for running the dps evaluations behind ep and rankings in parallel.
+#
+# Every evaluation is described by a list of changes applied on top of the
+# calculator as it stands when the evaluations are submitted:
+#   ('stat', stat, delta)                adds delta to stats.<stat>
+#   ('talent', talent)                   toggles the talent
+#   ('glyph', glyph)                     toggles the glyph
+#   ('gear_buff', buff)                  toggles the gear buff
+#   ('set_proc', proc, item_level)       equips the proc; item_level None keeps
+#                                        the default one
+#   ('del_proc', proc)                   unequips the proc
+#   ('weapon', hand, attribute, value)   sets stats.<hand>.<attribute>
+#   ('enchant', hand, enchant)           enchants the weapon; None removes it
+#
+# Without an executor the changes are applied to the calculator in place and
+# reverted after each evaluation. With one, the calculator is pickled once and
+# each evaluation runs on its own unpickled copy through executor.map, so any
+# object with a map(function, iterable) method that preserves ordering works:
+# multiprocessing.Pool or concurrent.futures.ProcessPoolExecutor for instance.
+# Results always come back in submission order, so the values are the same
+# regardless of the executor or the number of workers. For calculators that
+# warm start (see DamageCalculator.get_warm_start) a leading job without
+# changes is taken as the baseline: it runs first, in process, and every
+# other evaluation starts from the state it converged to.
+
+_missing = object()
+
+
+def get_dps_for_changes(calculator, jobs, executor=None, catch=()):
+    # Returns the dps for each list of changes in jobs. Exceptions of the
+    # classes in catch are returned in place of the dps instead of raised.
+    dps_values = []
+    warm_start = calculator.get_warm_start()
+    if warm_start is not None and jobs and not jobs[0]:
+        # Run the baseline first, so that its converged state seeds all the
+        # other evaluations.
+        dps_values.append(_evaluate(calculator, jobs[0], catch))
+        jobs = jobs[1:]
+        warm_start = calculator.get_warm_start()
+
+    if executor is None:
+        for changes in jobs:
+            dps_values.append(_evaluate(calculator, changes, catch))
+            if warm_start is not None:
+                # Every evaluation starts from the same state, as they do
+                # on an executor.
+                calculator.set_warm_start(dict(warm_start))
+        return dps_values
+
+    # cPickle is only imported when there is an executor, as it is slow to
+    # import.
+    import cPickle
+    snapshot = cPickle.dumps(calculator, cPickle.HIGHEST_PROTOCOL)
+    dps_values.extend(executor.map(_evaluate_snapshot, [(snapshot, changes, catch) for changes in jobs]))
+    return dps_values
+
+
+def get_dps_for_stat_deltas(calculator, deltas_list, executor=None):
+    # Same as calculator.get_dps_for_stat_deltas, with each {stat: delta}
+    # dict evaluated on its own copy of the calculator when there is an
+    # executor. A leading empty dict seeds the warm start of the others, as
+    # in get_dps_for_changes.
+    if executor is None:
+        return calculator.get_dps_for_stat_deltas(deltas_list)
+    dps_values = []
+    if calculator.get_warm_start() is not None and deltas_list and not deltas_list[0]:
+        dps_values.extend(calculator.get_dps_for_stat_deltas(deltas_list[:1]))
+        deltas_list = deltas_list[1:]
+
+    import cPickle
+    snapshot = cPickle.dumps(calculator, cPickle.HIGHEST_PROTOCOL)
+    dps_values.extend(executor.map(_evaluate_stat_deltas_snapshot, [(snapshot, deltas) for deltas in deltas_list]))
+    return dps_values
+
+
+def _evaluate_stat_deltas_snapshot(args):
+    import cPickle
+    snapshot, deltas = args
+    return cPickle.loads(snapshot).get_dps_for_stat_deltas([deltas])[0]
+
+
+def _evaluate_snapshot(args):
+    # Runs in the worker; module level so it can be pickled.
+    import cPickle
+    snapshot, changes, catch = args
+    return _evaluate(cPickle.loads(snapshot), changes, catch)
+
+
+def _evaluate(calculator, changes, catch):
+    undo_list = apply_changes(calculator, changes)
+    try:
+        return calculator.get_dps()
+    except catch as e:
+        return e
+    finally:
+        revert_changes(calculator, undo_list)
+
+
+def apply_changes(calculator, changes):
+    # Applies changes to calculator and returns what revert_changes needs to
+    # undo them.
+    undo_list = []
+    try:
+        for change in changes:
+            undo_list.append(_apply_change(calculator, change))
+    except:
+        revert_changes(calculator, undo_list)
+        raise
+    return undo_list
+
+
+def revert_changes(calculator, undo_list):
+    for undo in reversed(undo_list):
+        undo()
+
+
+def _apply_change(calculator, change):
+    kind = change[0]
+    if kind == 'stat':
+        stat, delta = change[1:]
+        setattr(calculator.stats, stat, getattr(calculator.stats, stat) + delta)
+        return lambda: setattr(calculator.stats, stat, getattr(calculator.stats, stat) - delta)
+    elif kind in ('talent', 'glyph', 'gear_buff'):
+        target = {'talent': calculator.talents, 'glyph': calculator.glyphs, 'gear_buff': calculator.stats.gear_buffs}[kind]
+        name = change[1]
+        toggle = lambda: setattr(target, name, not getattr(target, name))
+        toggle()
+        return toggle
+    elif kind in ('set_proc', 'del_proc'):
+        procs_list = calculator.stats.procs
+        name = change[1]
+        undo = _get_attribute_restorer(procs_list, name)
+        if kind == 'set_proc':
+            procs_list.set_proc(name, change[2])
+        elif name in procs_list.__dict__:
+            delattr(procs_list, name)
+        return undo
+    elif kind == 'weapon':
+        hand, attribute, value = change[1:]
+        weapon = getattr(calculator.stats, hand)
+        undo = _get_attribute_restorer(weapon, attribute)
+        setattr(weapon, attribute, value)
+        return undo
+    elif kind == 'enchant':
+        hand, enchant = change[1:]
+        weapon = getattr(calculator.stats, hand)
+        undo_list = [_get_attribute_restorer(weapon, name) for name in weapon.allowed_melee_enchants]
+        weapon.set_enchant(enchant)
+        return lambda: revert_changes(calculator, undo_list)
+    raise exceptions.InvalidInputException(_('Unknown change {change}').format(change=kind))
+
+
+def _get_attribute_restorer(target, name):
+    value = target.__dict__.get(name, _missing)
+    def restore():
+        if value is not _missing:
+            setattr(target, name, value)
+        elif name in target.__dict__:
+            delattr(target, name)
+    return restore
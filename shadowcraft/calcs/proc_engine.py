@@ -0,0 +1,78 @@
+import math
+
+# Uptimes and frequencies of real ppm procs, for one proc at a time or for
+# all the equipped ones in a single pass.
+#
+# RppmEngine keeps the rates, durations, icds and max stacks of a list of
+# procs in parallel arrays; get_uptimes and get_frequencies compute the values
+# of every proc from one haste multiplier, the one from haste rating and the
+# haste buffs that DamageCalculator.get_rppm_haste_multiplier returns. The
+# arrays are taken from the procs when the engine is built, so build a new one
+# after changing a proc. The values are computed with plain arithmetic, so the
+# haste multiplier can be a dual_number.DualNumber.
+# http://iam.yellingontheinternet.com/2013/04/12/theorycraft-201-advanced-rppm/
+
+# Increases the proc rate due to bad luck prevention. It /should/ be constant
+# among all rppm proc styles.
+bad_luck_factor = 1.1307
+
+
+def get_haste_factor(proc, haste_multiplier):
+    haste = 1.
+    if proc.haste_scales:
+        haste *= haste_multiplier
+    if proc.att_spd_scales:
+        haste *= 1.4
+    return haste
+
+
+def get_rppm_uptime(haste, rate, duration, icd, max_stacks):
+    if not icd:
+        if max_stacks <= 1:
+            return bad_luck_factor * (1 - math.e ** (-1 * haste * rate * duration / 60))
+        lambd = haste * rate * duration / 60
+        e_lambda = math.e ** lambd
+        e_minus_lambda = math.e ** (-1 * lambd)
+        return bad_luck_factor * (e_lambda - 1) * (1 - ((1 - e_minus_lambda) ** max_stacks))
+    mean_proc_time = 60. / (haste * rate) + icd - min(icd, 10)
+    return bad_luck_factor * duration / mean_proc_time
+
+
+def get_rppm_frequency(haste, rate, icd, max_stacks):
+    # Procs per second. With an icd and stacks, the damage is assumed to come
+    # at max stacks only, e.g. legendary_capacitive_meta.
+    #http://us.battle.net/wow/en/forum/topic/8197741003?page=4#79
+    if not icd:
+        return haste * bad_luck_factor * rate / 60
+    mean_proc_time = 60. / (haste * rate) + icd - min(icd, 10)
+    if max_stacks > 1:
+        mean_proc_time *= max_stacks
+    return bad_luck_factor / mean_proc_time
+
+
+class RppmEngine(object):
+
+    def __init__(self, procs):
+        self.procs = tuple(procs)
+        self.rates = [proc.get_rppm_proc_rate() for proc in self.procs]
+        self.durations = [proc.duration for proc in self.procs]
+        self.icds = [proc.icd for proc in self.procs]
+        self.max_stacks = [proc.max_stacks for proc in self.procs]
+
+    def __len__(self):
+        return len(self.procs)
+
+    def get_haste_factors(self, haste_multiplier):
+        return [get_haste_factor(proc, haste_multiplier) for proc in self.procs]
+
+    def get_uptimes(self, haste_multiplier):
+        haste_factors = self.get_haste_factors(haste_multiplier)
+        return map(get_rppm_uptime, haste_factors, self.rates, self.durations, self.icds, self.max_stacks)
+
+    def get_frequencies(self, haste_multiplier):
+        haste_factors = self.get_haste_factors(haste_multiplier)
+        return map(get_rppm_frequency, haste_factors, self.rates, self.icds, self.max_stacks)
+
+    def set_uptimes(self, haste_multiplier):
+        for proc, uptime in zip(self.procs, self.get_uptimes(haste_multiplier)):
+            proc.uptime = uptime
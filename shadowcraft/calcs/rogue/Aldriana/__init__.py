@@ -7,10 +7,14 @@ from copy import copy
 
 __builtin__._ = gettext.gettext
 
+from shadowcraft.calcs import convergence
+from shadowcraft.calcs import dual_number
+from shadowcraft.calcs import proc_engine
+from shadowcraft.calcs import timing_recorder
 from shadowcraft.calcs.rogue import RogueDamageCalculator
+from shadowcraft.calcs.rogue import combo_point_chain
 from shadowcraft.core import exceptions
 from shadowcraft.objects import procs
-from shadowcraft.objects import proc_data
 
 
 class InputNotModeledException(exceptions.InvalidInputException):
@@ -24,34 +28,148 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
     # on talent tree.
     ###########################################################################
 
+    @timing_recorder.timed
     def get_dps(self):
         super(AldrianasRogueDamageCalculator, self).get_dps()
+        return self.get_cached('dps', self.compute_dps)
+
+    def compute_dps(self):
+        self.init_spec()
+        return self.get_spec_dps()
+
+    @timing_recorder.timed
+    def get_dps_breakdown(self):
+        # Callers are free to modify the breakdown they get, so hand out
+        # copies of the cached one.
+        return dict(self.get_cached('dps_breakdown', lambda: dict(self.compute_dps_breakdown())))
+
+    def compute_dps_breakdown(self):
+        self.init_spec()
         if self.settings.is_assassination_rogue():
-            self.init_assassination()
-            return self.assassination_dps_estimate()
+            return self.assassination_dps_breakdown()
         elif self.settings.is_combat_rogue():
-            return self.combat_dps_estimate()
-        elif self.settings.is_subtlety_rogue():
-            return self.subtlety_dps_estimate()
+            return self.combat_dps_breakdown()
         else:
-            raise InputNotModeledException(_('You must specify a spec.'))
+            return self.subtlety_dps_breakdown()
 
-    def get_dps_breakdown(self):
+    def init_spec(self):
+        # Runs the init function of the spec we're modeling; everything past
+        # this point only depends on base_stats and the state set up here.
         if self.settings.is_assassination_rogue():
             self.init_assassination()
-            return self.assassination_dps_breakdown()
         elif self.settings.is_combat_rogue():
-            return self.combat_dps_breakdown()
+            self.init_combat()
         elif self.settings.is_subtlety_rogue():
-            return self.subtlety_dps_breakdown()
+            self.init_subtlety()
         else:
             raise InputNotModeledException(_('You must specify a spec.'))
 
+    def get_spec_dps(self):
+        # Expects init_spec to have been called.
+        if self.settings.is_assassination_rogue():
+            return self.assassination_dps_estimate()
+        elif self.settings.is_combat_rogue():
+            return self.combat_dps_estimate()
+        else:
+            return self.subtlety_dps_estimate()
+
+    @timing_recorder.timed
+    def get_dps_for_stat_deltas(self, deltas_list):
+        # Gear stats only enter the model through base_stats, so the spec
+        # setup and the proc setup of determine_stats run once and each
+        # perturbation just offsets base_stats and reruns the estimate. The
+        # estimate mutates some of the state set up by init_spec
+        # (stat_multipliers, convergence caches, ...), hence the snapshot we
+        # restore before every run. Stats that don't live in base_stats take
+        # the regular path. With warm starts, a leading empty dict is run
+        # first and seeds the other runs, as in parallel.get_dps_for_changes.
+        self.init_spec()
+        snapshot = self.get_state_snapshot()
+        dps_values = []
+        try:
+            self.proc_setup = self.get_proc_setup()
+            for deltas in deltas_list:
+                self.restore_state_snapshot(snapshot)
+                if [stat for stat in deltas if stat not in self.base_stats]:
+                    self.proc_setup = None
+                    dps_values.extend(super(AldrianasRogueDamageCalculator, self).get_dps_for_stat_deltas([deltas]))
+                    self.proc_setup = self.get_proc_setup()
+                    continue
+                for stat in deltas:
+                    self.base_stats[stat] += deltas[stat]
+                dps_values.append(self.get_spec_dps())
+                if self.settings.warm_start and not deltas and len(dps_values) == 1:
+                    snapshot['warm_start_states'] = self.warm_start_states
+        finally:
+            self.proc_setup = None
+        self.restore_state_snapshot(snapshot)
+        return dps_values
+
+    @timing_recorder.timed
+    def get_dps_gradient(self, gradient_stats=None):
+        # Seeds base_stats with dual numbers and runs the estimate once: the
+        # dps comes out together with its exact derivatives with respect to
+        # every stat in gradient_stats.
+        if gradient_stats is None:
+            gradient_stats = self.default_ep_stats
+        self.init_spec()
+        for stat in gradient_stats:
+            if stat not in self.base_stats:
+                raise InputNotModeledException(_('Can\'t compute the dps gradient for {stat}').format(stat=stat))
+        snapshot = self.get_state_snapshot()
+        for index, stat in enumerate(gradient_stats):
+            self.base_stats[stat] = dual_number.DualNumber.variable(self.base_stats[stat], index, len(gradient_stats))
+        try:
+            dps = self.get_spec_dps()
+        finally:
+            self.restore_state_snapshot(snapshot)
+        return dual_number.value_of(dps), dict(zip(gradient_stats, dual_number.derivatives_of(dps, len(gradient_stats))))
+
+    # The attributes init_spec sets up and the estimates change or create.
+    # Restoring a snapshot drops the ones that didn't exist when it was taken.
+    state_snapshot_fields = (
+        'ability_cds', 'ar_duration', 'attack_speed_increase', 'bandits_guile_multiplier', 'base_energy_regen',
+        'base_intellect', 'base_speed_multiplier', 'base_stats', 'base_strength', 'bonus_energy_regen',
+        'combat_cd_delay', 'current_variables', 'damage_modifier_cache', 'dfa_cost', 'dw_mh_hit_chance',
+        'dw_miss_penalty', 'dw_oh_hit_chance', 'emp_envenom_percentage', 'envenom_crit_modifier', 'extra_cp_chance',
+        'major_cd_delay', 'max_bandits_guile_buff', 'max_energy', 'mos_multiplier', 'readiness_spec_conversion',
+        'relentless_strikes_energy_return_per_cp', 'revealing_strike_multiplier', 'rvs_duration', 'sc_trigger_rate',
+        'spec_convergence_attributes', 'spec_convergence_stats', 'spec_needs_converge', 'stat_multipliers',
+        'swing_reset_spacing', 'tmp_ks_cd', 'tmp_phase_length', 'total_openers_per_second', 'true_haste_mod',
+        'vanish_cd_modifier', 'vanish_rate', 'vendetta_duration', 'vendetta_mult', 'vendetta_multiplier',
+        'vendetta_uptime', 'warm_start_states')
+
+    def get_state_snapshot(self):
+        snapshot = {}
+        for name in self.state_snapshot_fields:
+            if name in self.__dict__:
+                value = self.__dict__[name]
+                if isinstance(value, (dict, list)):
+                    value = copy(value)
+                snapshot[name] = value
+        return snapshot
+
+    def restore_state_snapshot(self, snapshot):
+        for name in self.state_snapshot_fields:
+            if name in snapshot:
+                value = snapshot[name]
+                if isinstance(value, (dict, list)):
+                    value = copy(value)
+                self.__dict__[name] = value
+            elif name in self.__dict__:
+                del self.__dict__[name]
+
     ###########################################################################
     # General object manipulation functions that we'll use multiple places.
     ###########################################################################
 
     PRECISION_REQUIRED = 10 ** -7
+    # The converged state of the last determine_stats run for each attack
+    # counts function, when settings.warm_start is on.
+    warm_start_states = None
+    # The shared get_proc_setup of get_dps_for_stat_deltas while it runs.
+    proc_setup = None
+    proc_setup_stats = ('str', 'agi', 'ap', 'crit', 'haste', 'mastery', 'readiness', 'multistrike', 'versatility')
 
     def are_close_enough(self, old_dist, new_dist, precision=PRECISION_REQUIRED):
         for item in new_dist:
@@ -71,16 +189,16 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
     # setups that we are really modeling.
     ###########################################################################
 
-    def get_glyphs_ranking(self, list=None):
+    def get_glyphs_ranking(self, list=None, executor=None):
         if list is None:
             list = [
                 'vendetta',
                 'energy',
                 'disappearance',
             ]
-        return super(AldrianasRogueDamageCalculator, self).get_glyphs_ranking(list)
+        return super(AldrianasRogueDamageCalculator, self).get_glyphs_ranking(list, executor)
 
-    def get_talents_ranking(self, list=None):
+    def get_talents_ranking(self, list=None, executor=None):
         if list is None:
             list = [
                 'nightstalker',
@@ -93,7 +211,7 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
                 'death_from_above',
                 'shadow_reflection',
             ]
-        return super(AldrianasRogueDamageCalculator, self).get_talents_ranking(list)
+        return super(AldrianasRogueDamageCalculator, self).get_talents_ranking(list, executor)
 
     def get_oh_weapon_modifier(self, setups=None):
         if setups is None:
@@ -124,59 +242,15 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
         # Just average-casing for now.  Should fix that at some point.
         return 1 + .3 * self.heroism_uptime_per_fight()
 
+    @timing_recorder.timed
     def get_cp_distribution_for_cycle(self, cp_distribution_per_move, target_cp_quantity):
-        avg_cp_per_cpg = sum([key * cp_distribution_per_move[key] for key in cp_distribution_per_move])
-        
-        time_spent_at_cp = [0, 0, 0, 0, 0, 0]
-        cur_min_cp = 0
-        cur_dist = {(0, 0): 1}
-        while cur_min_cp < target_cp_quantity:
-            cur_min_cp += 1
-
-            new_dist = {}
-            for (cps, moves), prob in cur_dist.items():
-                if cps >= cur_min_cp:
-                    if (cps, moves) in new_dist:
-                        new_dist[(cps, moves)] += prob
-                    else:
-                        new_dist[(cps, moves)] = prob
-                else:
-                    for (move_cp, move_prob) in cp_distribution_per_move.items():
-                        total_cps = cps + move_cp
-                        if total_cps > 5:
-                            total_cps = 5
-                        dist_entry = (total_cps, moves + 1)
-                        time_spent_at_cp[total_cps] += move_prob * prob
-                        if dist_entry in new_dist:
-                            new_dist[dist_entry] += move_prob * prob
-                        else:
-                            new_dist[dist_entry] = move_prob * prob
-            cur_dist = new_dist
-
-        for (cps, moves), prob in cur_dist.items():
-            time_spent_at_cp[cps] += prob
-
-        total_weight = sum(time_spent_at_cp)
-        for i in xrange(6):
-            time_spent_at_cp[i] /= total_weight
-
-        return cur_dist, time_spent_at_cp, avg_cp_per_cpg
+        chain = combo_point_chain.get_chain(cp_distribution_per_move, target_cp=target_cp_quantity)
+        return dict(chain.finisher_distribution), list(chain.time_at_cp), chain.avg_cp_per_move
 
     def get_cp_per_cpg(self, base_cp_per_cpg=1, *probs):
         # Computes the combined probabilites of getting an additional cp from
         # each of the items in probs.
-        cp_per_cpg = {base_cp_per_cpg: 1}
-        for prob in probs:
-            if prob == 0:
-                continue
-            new_cp_per_cpg = {}
-            for cp in cp_per_cpg:
-                new_cp_per_cpg.setdefault(cp, 0)
-                new_cp_per_cpg.setdefault(cp + 1, 0)
-                new_cp_per_cpg[cp] += cp_per_cpg[cp] * (1 - prob)
-                new_cp_per_cpg[cp + 1] += cp_per_cpg[cp] * prob
-            cp_per_cpg = new_cp_per_cpg
-        return cp_per_cpg
+        return combo_point_chain.get_cp_per_move(base_cp_per_cpg, *probs)
 
     def get_crit_rates(self, stats):
         base_melee_crit_rate = self.crit_rate(crit=stats['crit'])
@@ -220,6 +294,7 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
 
         return crit_rates
 
+    @timing_recorder.timed
     def set_constants(self):
         # General setup that we'll use in all 3 cycles.
         self.load_from_advanced_parameters()
@@ -514,24 +589,13 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
             stack_time_lost = missing_stacks * time_for_one_stack
             proc.uptime = proc.max_stacks - stack_time_lost / self.settings.duration
 
-    def update_with_damaging_proc(self, proc, attacks_per_second, crit_rates):
-        if proc.is_real_ppm():
-            #http://us.battle.net/wow/en/forum/topic/8197741003?page=4#79
-            haste = 1.
-            if proc.haste_scales:
-                haste *= self.true_haste_mod * self.stats.get_haste_multiplier_from_rating(self.base_stats['haste'])
-            if proc.att_spd_scales:
-                haste *= 1.4
-            #The 1.1307 is a value that increases the proc rate due to bad luck prevention. It /should/ be constant among all rppm proc styles
-            if not proc.icd:
-                frequency = haste * 1.1307 * proc.get_rppm_proc_rate() / 60
-            else:
-                mean_proc_time = 60. / (haste * proc.get_rppm_proc_rate()) + proc.icd - min(proc.icd, 10)
-                if proc.max_stacks > 1: # just correct if you only do damage on max_stacks, e.g. legendary_capacitive_meta
-                    mean_proc_time *= proc.max_stacks
-                frequency = 1.1307 / mean_proc_time
-        else:
-            if proc.icd:
+    def update_with_damaging_proc(self, proc, attacks_per_second, crit_rates, frequency=None):
+        # frequency, if given, is the one of a real ppm proc from a proc_engine.RppmEngine
+        if frequency is None:
+            if proc.is_real_ppm():
+                haste = proc_engine.get_haste_factor(proc, self.get_rppm_haste_multiplier())
+                frequency = proc_engine.get_rppm_frequency(haste, proc.get_rppm_proc_rate(), proc.icd, proc.max_stacks)
+            elif proc.icd:
                 frequency = 1. / (proc.icd + 0.5 / self.get_procs_per_second(proc, attacks_per_second, crit_rates))
             else:
                 frequency = self.get_procs_per_second(proc, attacks_per_second, crit_rates)
@@ -555,7 +619,7 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
     def get_poison_counts(self, attacks_per_second, current_stats):
         # Builds a phony 'poison' proc object to count triggers through the proc
         # methods.
-        poison = procs.Proc(**proc_data.allowed_procs['rogue_poison'])
+        poison = procs.templates['rogue_poison']()
         mh_hits_per_second = self.get_mh_procs_per_second(poison, attacks_per_second, None)
         oh_hits_per_second = self.get_oh_procs_per_second(poison, attacks_per_second, None)
         total_hits_per_second = mh_hits_per_second + oh_hits_per_second
@@ -590,27 +654,21 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
         elif self.settings.dmg_poison == 'wp':
             attacks_per_second['wound_poison'] = total_hits_per_second * avg_poison_proc_rate
 
-    def determine_stats(self, attack_counts_function):
-        current_stats = {
-            'str': self.base_strength,
-            'agi': self.base_stats['agi'] * self.stat_multipliers['agi'],
-            'ap': self.base_stats['ap'] * self.stat_multipliers['ap'],
-            'crit': self.base_stats['crit'] * self.stat_multipliers['crit'],
-            'haste': self.base_stats['haste'] * self.stat_multipliers['haste'],
-            'mastery': self.base_stats['mastery'] * self.stat_multipliers['mastery'],
-            'readiness': self.base_stats['readiness'] * self.stat_multipliers['readiness'],
-            'multistrike': self.base_stats['multistrike'] * self.stat_multipliers['multistrike'],
-            'versatility': self.base_stats['versatility'] * self.stat_multipliers['versatility'],
+    def get_proc_setup(self):
+        # The procs of determine_stats sorted into the groups it handles them
+        # in. None of it depends on stats, so get_dps_for_stat_deltas shares it
+        # between evaluations through proc_setup, along with the real ppm
+        # values of the last haste multiplier.
+        setup = {
+            'rppm_stat_mods': [],
+            'rppm_stat': [],
+            'icd': [],
+            'no_icd': [],
+            'damage': [],
+            'weapon_damage': [],
+            'shattered_hand_dot': None,
         }
-        self.current_variables = {}
-        
-        #arrys to store different types of procs
-        active_procs_rppm_stat_mods = []
         active_procs_rppm = []
-        active_procs_icd = []
-        active_procs_no_icd = []
-        damage_procs = []
-        weapon_damage_procs = []
 
         if self.buffs.felmouth_food():
             self.stats.procs.set_proc('felmouth_frenzy')
@@ -625,46 +683,67 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
                 getattr(self.stats.procs, 'mark_of_the_shattered_hand_dot').proc_rate = 5
             else:
                 getattr(self.stats.procs, 'mark_of_the_shattered_hand_dot').proc_rate = 2.5
-            self.set_rppm_uptime(getattr(self.stats.procs, 'mark_of_the_shattered_hand_dot'))
+            setup['shattered_hand_dot'] = getattr(self.stats.procs, 'mark_of_the_shattered_hand_dot')
         if not shatt_hand:
             self.stats.procs.del_proc('mark_of_the_shattered_hand_dot')
         
         #sort the procs into groups
-        for proc in self.stats.procs.get_all_procs_for_stat():
-            if (proc.stat == 'stats'):
-                if proc.is_real_ppm():
-                    active_procs_rppm.append(proc)
-                else:
-                    if proc.icd:
-                        active_procs_icd.append(proc)
-                    else:
-                        active_procs_no_icd.append(proc)
-            elif proc.stat == 'stats_modifier':
-                active_procs_rppm_stat_mods.append(proc)
-            elif proc.stat in ('spell_damage', 'physical_damage', 'physical_dot'):
-                damage_procs.append(proc)
-            elif proc.stat == 'extra_weapon_damage':
-                weapon_damage_procs.append(proc)
+        proc_groups = self.stats.procs.get_proc_groups()
+        active_procs_rppm.extend(proc_groups['stats_rppm'])
+        for proc in proc_groups['stats']:
+            if proc.icd:
+                setup['icd'].append(proc)
+            else:
+                setup['no_icd'].append(proc)
+        setup['rppm_stat_mods'].extend(proc_groups['stats_modifier'])
+        setup['damage'].extend(proc_groups['damage'])
+        setup['weapon_damage'].extend(proc_groups['extra_weapon_damage'])
         
         #calculate weapon procs
-        weapon_enchants = set([])
         for hand, enchant in [(x, y) for x in ('mh', 'oh') for y in ('dancing_steel', 'mark_of_the_frostwolf',
                                                                      'mark_of_the_shattered_hand', 'mark_of_the_thunderlord',
                                                                      'mark_of_the_bleeding_hollow', 'mark_of_warsong')]:
             proc = getattr(getattr(self.stats, hand), enchant)
             if proc:
                 setattr(proc, '_'.join((hand, 'only')), True)
-                if (proc.stat in current_stats or proc.stat == 'stats'):
+                if (proc.stat in self.proc_setup_stats or proc.stat == 'stats'):
                     if proc.is_real_ppm():
                         active_procs_rppm.append(proc)
                     else:
                         if proc.icd:
-                            active_procs_icd.append(proc)
+                            setup['icd'].append(proc)
                         else:
-                            active_procs_no_icd.append(proc)
+                            setup['no_icd'].append(proc)
                 elif enchant in ('mark_of_the_shattered_hand', ):
-                    damage_procs.append(proc)
-        
+                    setup['damage'].append(proc)
+
+        setup['rppm_stat'] = [proc for proc in active_procs_rppm if proc.stat == 'stats']
+        return setup
+
+    @timing_recorder.timed
+    def determine_stats(self, attack_counts_function):
+        current_stats = {
+            'str': self.base_strength,
+            'agi': self.base_stats['agi'] * self.stat_multipliers['agi'],
+            'ap': self.base_stats['ap'] * self.stat_multipliers['ap'],
+            'crit': self.base_stats['crit'] * self.stat_multipliers['crit'],
+            'haste': self.base_stats['haste'] * self.stat_multipliers['haste'],
+            'mastery': self.base_stats['mastery'] * self.stat_multipliers['mastery'],
+            'readiness': self.base_stats['readiness'] * self.stat_multipliers['readiness'],
+            'multistrike': self.base_stats['multistrike'] * self.stat_multipliers['multistrike'],
+            'versatility': self.base_stats['versatility'] * self.stat_multipliers['versatility'],
+        }
+        self.current_variables = {}
+
+        setup = self.proc_setup
+        if setup is None:
+            setup = self.get_proc_setup()
+        active_procs_rppm_stat_mods = setup['rppm_stat_mods']
+        active_procs_icd = setup['icd']
+        active_procs_no_icd = setup['no_icd']
+        damage_procs = list(setup['damage'])
+        weapon_damage_procs = setup['weapon_damage']
+
         static_proc_stats = {
             'str': 0,
             'agi': 0,
@@ -677,66 +756,108 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
             'versatility': 0,
         }
         
+        #the real ppm uptimes and frequencies only depend on haste, so they are all computed in one pass
+        rppm_haste_multiplier = self.get_rppm_haste_multiplier()
+        if 'rppm_frequencies' not in setup or setup['rppm_haste_multiplier'] != rppm_haste_multiplier:
+            if setup['shattered_hand_dot'] is not None:
+                self.set_rppm_uptime(setup['shattered_hand_dot'])
+            proc_engine.RppmEngine(active_procs_rppm_stat_mods + setup['rppm_stat']).set_uptimes(rppm_haste_multiplier)
+            rppm_damage_procs = [proc for proc in damage_procs if proc.is_real_ppm()]
+            rppm_frequencies = proc_engine.RppmEngine(rppm_damage_procs).get_frequencies(rppm_haste_multiplier)
+            setup['rppm_frequencies'] = dict(zip(rppm_damage_procs, rppm_frequencies))
+            setup['rppm_haste_multiplier'] = rppm_haste_multiplier
+        rppm_frequencies = setup['rppm_frequencies']
+
         for proc in active_procs_rppm_stat_mods:
-            self.set_rppm_uptime(proc)
             for e in proc.value:
                 self.stat_multipliers[e] *= 1 + proc.uptime * proc.value[e]
                 current_stats[e] *= 1 + proc.uptime * proc.value[e]
 
-        for proc in active_procs_rppm:
-            if proc.stat == 'stats':
-                self.set_rppm_uptime(proc)
-                for e in proc.value:
-                    static_proc_stats[ e ] += proc.uptime * proc.value[e] * self.stat_multipliers[e]
+        for proc in setup['rppm_stat']:
+            for e in proc.value:
+                static_proc_stats[ e ] += proc.uptime * proc.value[e] * self.stat_multipliers[e]
         
         for k in static_proc_stats:
             current_stats[k] +=  static_proc_stats[ k ]
         
-        attacks_per_second, crit_rates, additional_info = attack_counts_function(current_stats)
-        recalculate_crit = False
-        
         #check need to converge
         need_converge = False
         convergence_stats = False
         if len(active_procs_no_icd) > 0:
             need_converge = True
+
+        #with warm starts, converging loops start from where the last one for this attack counts function ended
+        warm_start = None
+        if self.settings.warm_start and self.warm_start_states is not None:
+            if self.spec_needs_converge or [e for proc in active_procs_no_icd for e in proc.value if e in self.spec_convergence_stats]:
+                warm_start = self.warm_start_states.get(attack_counts_function.__name__)
+        if warm_start is None:
+            attacks_per_second, crit_rates, additional_info = attack_counts_function(current_stats)
+            recalculate_crit = False
+        else:
+            attacks_per_second, crit_rates, spec_state = warm_start
+            for name in self.spec_convergence_attributes:
+                setattr(self, name, spec_state[name])
+            #the seeded crit rates are only good for the first uptimes
+            recalculate_crit = True
+        #guess is what the uptimes are computed from; with plain convergence it's the last attacks_per_second
+        #spec_convergence_attributes are the values the attack counts carry over from one iteration to the next
+        strategy = convergence.get_strategy(self.settings.convergence)
+        guess = attacks_per_second
+        iterations = 0
         while (need_converge or self.spec_needs_converge):
-            current_stats = {
-                'str': self.base_strength,
-                'agi': self.base_stats['agi'] * self.stat_multipliers['agi'],
-                'ap': self.base_stats['ap'] * self.stat_multipliers['ap'],
-                'crit': self.base_stats['crit'] * self.stat_multipliers['crit'],
-                'haste': self.base_stats['haste'] * self.stat_multipliers['haste'],
-                'mastery': self.base_stats['mastery'] * self.stat_multipliers['mastery'],
-                'readiness': self.base_stats['readiness'] * self.stat_multipliers['readiness'],
-                'multistrike': self.base_stats['multistrike'] * self.stat_multipliers['multistrike'],
-                'versatility': self.base_stats['versatility'] * self.stat_multipliers['versatility'],
-            }
-            for k in static_proc_stats:
-                current_stats[k] +=  static_proc_stats[k]
+            with self.timer('determine_stats_iteration'):
+                current_stats = {
+                    'str': self.base_strength,
+                    'agi': self.base_stats['agi'] * self.stat_multipliers['agi'],
+                    'ap': self.base_stats['ap'] * self.stat_multipliers['ap'],
+                    'crit': self.base_stats['crit'] * self.stat_multipliers['crit'],
+                    'haste': self.base_stats['haste'] * self.stat_multipliers['haste'],
+                    'mastery': self.base_stats['mastery'] * self.stat_multipliers['mastery'],
+                    'readiness': self.base_stats['readiness'] * self.stat_multipliers['readiness'],
+                    'multistrike': self.base_stats['multistrike'] * self.stat_multipliers['multistrike'],
+                    'versatility': self.base_stats['versatility'] * self.stat_multipliers['versatility'],
+                }
+                for k in static_proc_stats:
+                    current_stats[k] +=  static_proc_stats[k]
                 
-            for proc in active_procs_no_icd:
-                self.set_uptime(proc, attacks_per_second, crit_rates)
-                for e in proc.value:
-                    if e in self.spec_convergence_stats:
-                        convergence_stats = True
-                    if e == 'crit':
-                        recalculate_crit = True
-                    current_stats[ e ] += proc.uptime * proc.value[e] * self.stat_multipliers[e]
+                for proc in active_procs_no_icd:
+                    self.set_uptime(proc, guess, crit_rates)
+                    for e in proc.value:
+                        if e in self.spec_convergence_stats:
+                            convergence_stats = True
+                        if e == 'crit':
+                            recalculate_crit = True
+                        current_stats[ e ] += proc.uptime * proc.value[e] * self.stat_multipliers[e]
             
-            #only have to converge with specific procs
-            #check if... assassination:crit/haste, combat:mastery/haste, sub:haste/mastery
-            if not convergence_stats and not self.spec_needs_converge:
-                break
+                #only have to converge with specific procs
+                #check if... assassination:crit/haste, combat:mastery/haste, sub:haste/mastery
+                if not convergence_stats and not self.spec_needs_converge:
+                    break
             
-            old_attacks_per_second = attacks_per_second
-            if recalculate_crit:
-                crit_rates = None
-                recalculate_crit = False
-            attacks_per_second, crit_rates, additional_info = attack_counts_function(current_stats, crit_rates=crit_rates)
+                if recalculate_crit:
+                    crit_rates = None
+                    recalculate_crit = False
+                guess_state = self.get_convergence_state(guess)
+                attacks_per_second, crit_rates, additional_info = attack_counts_function(current_stats, crit_rates=crit_rates)
+                result_state = self.get_convergence_state(attacks_per_second)
             
-            if self.are_close_enough(old_attacks_per_second, attacks_per_second):
-                break
+                if self.are_close_enough(guess, attacks_per_second, self.settings.convergence_tolerance) and \
+                   self.are_close_enough(guess_state['spec'], result_state['spec'], self.settings.convergence_tolerance):
+                    break
+                iterations += 1
+                if iterations >= self.settings.max_convergence_iterations:
+                    break
+                next_state = strategy.next_guess(guess_state, result_state)
+                guess = next_state['attacks_per_second']
+                for name in self.spec_convergence_attributes:
+                    setattr(self, name, next_state['spec'][name])
+
+        if self.settings.warm_start:
+            if self.warm_start_states is None:
+                self.warm_start_states = {}
+            spec_state = self.get_convergence_state(attacks_per_second)['spec']
+            self.warm_start_states[attack_counts_function.__name__] = (attacks_per_second, crit_rates, spec_state)
             
         for proc in active_procs_icd:
             self.set_uptime(proc, attacks_per_second, crit_rates)
@@ -790,12 +911,26 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
         self.setup_unique_procs(current_stats, current_stats['agi']+current_stats['ap'])
         
         for proc in damage_procs:
-            self.update_with_damaging_proc(proc, attacks_per_second, crit_rates)
+            self.update_with_damaging_proc(proc, attacks_per_second, crit_rates, rppm_frequencies.get(proc))
         
         for proc in weapon_damage_procs:
             self.set_uptime(proc, attacks_per_second, crit_rates)
         return current_stats, attacks_per_second, crit_rates, damage_procs, additional_info
     
+    def get_warm_start(self):
+        if not self.settings.warm_start:
+            return None
+        return dict(self.warm_start_states or {})
+
+    def set_warm_start(self, warm_start):
+        self.warm_start_states = warm_start
+
+    def get_convergence_state(self, attacks_per_second):
+        spec_state = {}
+        for name in self.spec_convergence_attributes:
+            spec_state[name] = getattr(self, name)
+        return {'attacks_per_second': attacks_per_second, 'spec': spec_state}
+
     def compute_damage_from_aps(self, current_stats, attacks_per_second, crit_rates, damage_procs, additional_info):
         # this method exists solely to let us use cached values you would get from determine stats
         # really only useful for combat calculations (restless blades calculations)
@@ -812,6 +947,7 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
     # Assassination DPS functions
     ###########################################################################
 
+    @timing_recorder.timed
     def init_assassination(self):
         # Call this before calling any of the assassination_dps functions
         # directly.  If you're just calling get_dps, you can ignore this as it
@@ -827,6 +963,7 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
         #set readiness coefficient
         self.readiness_spec_conversion = self.assassination_readiness_conversion
         self.spec_convergence_stats = ['haste', 'crit', 'readiness']
+        self.spec_convergence_attributes = ['envenom_crit_modifier']
         
         # Assassasins's Resolve
         self.damage_modifier_cache = 1.17
@@ -968,57 +1105,70 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
         self.update_assassination_breakdown_with_modifiers(damage_breakdown, current_stats)
         return damage_breakdown
     
+    @timing_recorder.timed
     def assassination_cp_distribution_for_finisher(self, current_cp, crit_rates, ability_count, size_breakdown, cp_limit=4, blindside_proc=0, execute=False):
-        current_sizes = copy(size_breakdown)
-        if (current_cp >= cp_limit and not blindside_proc and not execute) or current_cp >= 5:
-            final_cp = min(current_cp, 5)
-            current_sizes[final_cp] += 1
-            return final_cp, blindside_proc, ability_count, current_sizes
-        avg_count = {'mutilate':0, 'dispatch':0}
-        avg_breakdown = [0,0,0,0,0,0]
-        new_count = copy(ability_count)
-        
-        if blindside_proc or execute:
-            new_count['dispatch'] += 1
-            
-            n_chance = 1 - crit_rates['dispatch']
-            c_chance = crit_rates['dispatch']
-            if self.stats.gear_buffs.rogue_t18_4pc:
-                n_value, n_proc, n_count, n_breakdown = self.assassination_cp_distribution_for_finisher(current_cp+3, crit_rates, new_count, current_sizes, cp_limit=cp_limit, execute=execute)
-                c_value, c_proc, c_count, c_breakdown = self.assassination_cp_distribution_for_finisher(current_cp+4, crit_rates, new_count, current_sizes, cp_limit=cp_limit, execute=execute)
+        # Averages over every way of building from current_cp up to a finisher: its size, the chance of having
+        # a blindside proc left afterwards, the Mutilate and Dispatch casts on top of ability_count and the
+        # finisher size breakdown on top of size_breakdown.
+        # Building combo points is a Markov chain over (cp, blindside, execute) states that only ever moves up
+        # in cp, so each state is solved once, from the states it can move to, and memoized.
+        bs_proc_rate = .3
+        mutilate_normal_chance = (1 - crit_rates['mutilate']) ** 2
+        mutilate_outcomes = (
+            (mutilate_normal_chance * (1 - bs_proc_rate), 2, 0),
+            (mutilate_normal_chance * bs_proc_rate, 2, 1.),
+            ((1 - mutilate_normal_chance) * (1 - bs_proc_rate), 3, 0),
+            ((1 - mutilate_normal_chance) * bs_proc_rate, 3, 1.),
+        )
+        dispatch_cps = 1
+        if self.stats.gear_buffs.rogue_t18_4pc:
+            dispatch_cps = 3
+        dispatch_outcomes = (
+            (1 - crit_rates['dispatch'], dispatch_cps, 0),
+            (crit_rates['dispatch'], dispatch_cps + 1, 0),
+        )
+        states = {}
+
+        # Returns (finisher size, blindside afterwards, mutilates, dispatches, size breakdown) from a state.
+        def get_state(cp, blindside, execute):
+            state = states.get((cp, blindside, execute))
+            if state is not None:
+                return state
+            if (cp >= cp_limit and not blindside and not execute) or cp >= 5:
+                final_cp = min(cp, 5)
+                breakdown = [0, 0, 0, 0, 0, 0]
+                breakdown[final_cp] = 1
+                state = (final_cp, blindside, 0, 0, breakdown)
             else:
-                n_value, n_proc, n_count, n_breakdown = self.assassination_cp_distribution_for_finisher(current_cp+1, crit_rates, new_count, current_sizes, cp_limit=cp_limit, execute=execute)
-                c_value, c_proc, c_count, c_breakdown = self.assassination_cp_distribution_for_finisher(current_cp+2, crit_rates, new_count, current_sizes, cp_limit=cp_limit, execute=execute)
-            
-            avg_cp = n_chance*n_value + c_chance*c_value
-            avg_bs_afterwards = n_chance*n_proc + c_chance*c_proc
-            for key in new_count:
-                avg_count[key] = n_chance*n_count[key] + c_chance*c_count[key]
-            for i in xrange(1, 6):
-                avg_breakdown[i] = n_chance*n_breakdown[i] + c_chance*c_breakdown[i]
-            return avg_cp, avg_bs_afterwards, avg_count, avg_breakdown
-        else:
-            bs_proc_rate = .3
-            new_count['mutilate'] += 1
-            
-            n_chance = ((1 - crit_rates['mutilate']) ** 2)  * (1-bs_proc_rate)
-            n_value, n_proc, n_count, n_breakdown = self.assassination_cp_distribution_for_finisher(current_cp+2, crit_rates, new_count, current_sizes, cp_limit=cp_limit)
-            n_bs_chance = ((1 - crit_rates['mutilate']) ** 2)  * bs_proc_rate
-            n_bs_value, n_bs_proc, n_bs_count, n_bs_breakdown = self.assassination_cp_distribution_for_finisher(current_cp+2, crit_rates, new_count, current_sizes, cp_limit=cp_limit, blindside_proc=1.)
-            
-            c_chance = (1 - (1 - crit_rates['mutilate']) ** 2)  * (1-bs_proc_rate)
-            c_value, c_proc, c_count, c_breakdown = self.assassination_cp_distribution_for_finisher(current_cp+3, crit_rates, new_count, current_sizes, cp_limit=cp_limit)
-            c_bs_chance = (1 - (1 - crit_rates['mutilate']) ** 2)  * bs_proc_rate
-            c_bs_value, c_bs_proc, c_bs_count, c_bs_breakdown = self.assassination_cp_distribution_for_finisher(current_cp+3, crit_rates, new_count, current_sizes, cp_limit=cp_limit, blindside_proc=1.)
-            
-            avg_cp = n_chance*n_value + n_bs_chance*n_bs_value + c_chance*c_value + c_bs_chance*c_bs_value
-            avg_bs_afterwards = n_chance*n_proc + n_bs_chance*n_bs_proc + c_chance*c_proc + c_bs_chance*c_bs_proc
-            for key in new_count:
-                avg_count[key] = n_chance*n_count[key] + n_bs_chance*n_bs_count[key] + c_chance*c_count[key] + c_bs_chance*c_bs_count[key]
-            for i in xrange(1, 6):
-                avg_breakdown[i] = n_chance*n_breakdown[i] + n_bs_chance*n_bs_breakdown[i] + c_chance*c_breakdown[i] + c_bs_chance*c_bs_breakdown[i]
-            return avg_cp, avg_bs_afterwards, avg_count, avg_breakdown
+                if blindside or execute:
+                    outcomes = dispatch_outcomes
+                    avg_mutilates, avg_dispatches = 0, 1
+                    next_execute = execute
+                else:
+                    outcomes = mutilate_outcomes
+                    avg_mutilates, avg_dispatches = 1, 0
+                    next_execute = False
+                avg_cp = 0
+                avg_bs_afterwards = 0
+                avg_breakdown = [0, 0, 0, 0, 0, 0]
+                for chance, cp_gain, next_blindside in outcomes:
+                    next_state = get_state(cp + cp_gain, next_blindside, next_execute)
+                    avg_cp += chance * next_state[0]
+                    avg_bs_afterwards += chance * next_state[1]
+                    avg_mutilates += chance * next_state[2]
+                    avg_dispatches += chance * next_state[3]
+                    for i in xrange(1, 6):
+                        avg_breakdown[i] += chance * next_state[4][i]
+                state = (avg_cp, avg_bs_afterwards, avg_mutilates, avg_dispatches, avg_breakdown)
+            states[(cp, blindside, execute)] = state
+            return state
+
+        avg_cp, avg_bs_afterwards, avg_mutilates, avg_dispatches, breakdown = get_state(current_cp, blindside_proc, execute)
+        avg_count = {'mutilate': ability_count['mutilate'] + avg_mutilates, 'dispatch': ability_count['dispatch'] + avg_dispatches}
+        avg_breakdown = [size + extra for size, extra in zip(size_breakdown, breakdown)]
+        return avg_cp, avg_bs_afterwards, avg_count, avg_breakdown
     
+    @timing_recorder.timed
     def assassination_attack_counts(self, current_stats, cpg, finisher_size, crit_rates=None):
         attacks_per_second = {}
         additional_info = {}
@@ -1273,16 +1423,17 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
     # Combat DPS functions
     ###########################################################################
 
-    def combat_dps_estimate(self):
-        return sum(self.combat_dps_breakdown().values())
-
-    def combat_dps_breakdown(self):
+    @timing_recorder.timed
+    def init_combat(self):
+        # Call this before calling any of the combat_dps functions directly;
+        # see init_assassination.
         if not self.settings.is_combat_rogue():
             raise InputNotModeledException(_('You must specify a combat cycle to match your combat spec.'))
         
         #set readiness coefficient
         self.readiness_spec_conversion = self.combat_readiness_conversion
         self.spec_convergence_stats = ['haste', 'mastery', 'readiness']
+        self.spec_convergence_attributes = []
         
         #spec specific glyph behaviour
         if self.glyphs.disappearance:
@@ -1333,7 +1484,11 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
         
         if self.talents.death_from_above:
             self.spec_needs_converge = True
-        
+
+    def combat_dps_estimate(self):
+        return sum(self.combat_dps_breakdown().values())
+
+    def combat_dps_breakdown(self):
         cds = {'ar':self.get_spell_cd('adrenaline_rush'),
                'ks':self.get_spell_cd('killing_spree')}
         
@@ -1449,17 +1604,13 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
                 
         return damage_breakdown
     
+    @timing_recorder.timed
     def combat_cpg_per_finisher(self, current_cp, ability_count):
-        if current_cp >= 5:
-            return ability_count
-        new_count = copy(ability_count)
-        new_count += 1
-        
-        normal = self.combat_cpg_per_finisher(current_cp+1, new_count)
-        rvs_proc = self.combat_cpg_per_finisher(current_cp+2, new_count)
-        
-        return (1 - self.extra_cp_chance)*normal + self.extra_cp_chance*rvs_proc
+        cp_per_cpg = combo_point_chain.get_cp_per_move(1, self.extra_cp_chance)
+        chain = combo_point_chain.get_chain(cp_per_cpg, start_cp=min(current_cp, 5))
+        return ability_count + chain.builders_per_finisher
     
+    @timing_recorder.timed
     def combat_attack_counts(self, current_stats, ar=False, crit_rates=None):
         attacks_per_second = {}
         additional_info = {}
@@ -1718,10 +1869,10 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
     # Subtlety DPS functions
     ###########################################################################
 
-    def subtlety_dps_estimate(self):
-        return sum(self.subtlety_dps_breakdown().values())
-
-    def subtlety_dps_breakdown(self):
+    @timing_recorder.timed
+    def init_subtlety(self):
+        # Call this before calling any of the subtlety_dps functions directly;
+        # see init_assassination.
         if not self.settings.is_subtlety_rogue():
             raise InputNotModeledException(_('You must specify a subtlety cycle to match your subtlety spec.'))
 
@@ -1737,6 +1888,7 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
         #set readiness coefficient
         self.readiness_spec_conversion = self.subtlety_readiness_conversion
         self.spec_convergence_stats = ['haste', 'multistrike']
+        self.spec_convergence_attributes = ['sc_trigger_rate', 'vanish_cd_modifier']
         
         #overrides setting, using Ambush + Vanish on CD is critical
         self.settings.use_opener = 'always'
@@ -1768,8 +1920,12 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
         self.settings.cycle.clip_fw = self.get_adv_param('clip_fw', self.settings.cycle.clip_fw, ignore_bounds=True)
         
         self.vanish_rate = 1. / (self.get_spell_cd('vanish') + self.settings.response_time) + 1. / (self.get_spell_cd('preparation') + self.settings.response_time * 3) #vanish CD + Prep CD
-        mos_multiplier = 1. + mos_value * (6 + 3 * self.talents.subterfuge * [1, 2][self.glyphs.vanish]) * self.vanish_rate
-        
+        self.mos_multiplier = 1. + mos_value * (6 + 3 * self.talents.subterfuge * [1, 2][self.glyphs.vanish]) * self.vanish_rate
+
+    def subtlety_dps_estimate(self):
+        return sum(self.subtlety_dps_breakdown().values())
+
+    def subtlety_dps_breakdown(self):
         stats, aps, crits, procs, additional_info = self.determine_stats(self.subtlety_attack_counts)
         damage_breakdown, additional_info  = self.compute_damage_from_aps(stats, aps, crits, procs, additional_info)
 
@@ -1832,7 +1988,7 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
                 damage_breakdown[key] *= soul_cap_mod
                 damage_breakdown[key] *= infallible_trinket_mod
             if "Mirror" not in key:
-                damage_breakdown[key] *= mos_multiplier
+                damage_breakdown[key] *= self.mos_multiplier
         
         #discard the loose rupture component to clean up the breakdown
         if 'rupture_sc' in damage_breakdown and self.settings.merge_damage:
@@ -1845,6 +2001,7 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
         
         return damage_breakdown
 
+    @timing_recorder.timed
     def subtlety_attack_counts(self, current_stats, crit_rates=None):
         attacks_per_second = {}
         additional_info = {}
@@ -2021,7 +2178,7 @@ class AldrianasRogueDamageCalculator(RogueDamageCalculator):
         base_cp_per_second += self.vanish_rate * 2
         #if we've consumed more CP's than we have for base functionality, lets generate some more CPs
         if base_cp_per_second < 0:
-            cpg_per_second = math.fabs(base_cp_per_second)
+            cpg_per_second = -base_cp_per_second
             base_cp_per_second += cpg_per_second
             attacks_per_second[cpg_name] += cpg_per_second
             if cpg_name == 'backstab':
@@ -5,7 +5,8 @@ class Settings(object):
 
     def __init__(self, cycle, time_in_execute_range=.35, response_time=.5, latency=.03, dmg_poison='dp', utl_poison=None,
                  duration=300, use_opener='always', opener_name='default', is_pvp=False, shiv_interval=0, adv_params=None,
-                 merge_damage=True, num_boss_adds=0, feint_interval=0, default_ep_stat='ap', is_day=False, is_demon=False):
+                 merge_damage=True, num_boss_adds=0, feint_interval=0, default_ep_stat='ap', is_day=False, is_demon=False,
+                 convergence='plain', convergence_tolerance=10 ** -7, max_convergence_iterations=100, warm_start=False):
         self.cycle = cycle
         self.time_in_execute_range = time_in_execute_range
         self.response_time = response_time
@@ -24,6 +25,14 @@ class Settings(object):
         self.shiv_interval = float(shiv_interval)
         self.adv_params = self.interpret_adv_params(adv_params)
         self.default_ep_stat = default_ep_stat
+        # How determine_stats converges: 'plain', 'aitken' or 'anderson'; see
+        # calcs.convergence.
+        self.convergence = convergence
+        self.convergence_tolerance = convergence_tolerance
+        self.max_convergence_iterations = max_convergence_iterations
+        # Start converging from the state the previous evaluation converged
+        # to; meant for ep and the like, where evaluations barely differ.
+        self.warm_start = warm_start
         if self.shiv_interval < 10 and not self.shiv_interval == 0:
             self.shiv_interval = 10
         allowed_openers_per_spec = {
@@ -44,6 +53,10 @@ class Settings(object):
             raise exceptions.InvalidInputException(_('You can only choose Deadly(dp) or Wound(wp) as a damage poison'))
         if utl_poison not in (None, 'cp', 'mnp', 'lp', 'pp'):
             raise exceptions.InvalidInputException(_('You can only choose Crippling(cp), Mind-Numbing(mnp), Leeching(lp) or Paralytic(pp) as a non-lethal poison'))
+        if convergence not in ('plain', 'aitken', 'anderson'):
+            raise exceptions.InvalidInputException(_('Convergence can only be plain, aitken or anderson'))
+        if max_convergence_iterations < 1:
+            raise exceptions.InvalidInputException(_('You need at least one convergence iteration'))
 
     def get_spec(self):
         return self.cycle._cycle_type
@@ -4,6 +4,7 @@ import __builtin__
 __builtin__._ = gettext.gettext
 
 from shadowcraft.calcs import DamageCalculator
+from shadowcraft.calcs import timing_recorder
 from shadowcraft.core import exceptions
 
 class RogueDamageCalculator(DamageCalculator):
@@ -125,6 +126,7 @@ class RogueDamageCalculator(DamageCalculator):
         average_hit = base_damage * (1 - crit_rate) + base_damage * crit_rate * crit_modifier
         return average_hit * frequency
     
+    @timing_recorder.timed
     def get_damage_breakdown(self, current_stats, attacks_per_second, crit_rates, damage_procs, additional_info):
         average_ap = current_stats['ap'] + current_stats['agi'] * self.stat_multipliers['ap']
         
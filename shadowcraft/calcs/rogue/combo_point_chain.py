@@ -0,0 +1,214 @@
+import gettext
+import __builtin__
+
+__builtin__._ = gettext.gettext
+
+from shadowcraft.calcs import convergence
+from shadowcraft.core import exceptions
+
+# Combo point generation as a Markov chain.
+#
+# A cycle starts at some combo point count, casts builders until it reaches
+# target_cp and then finishes. Each builder gains a random number of combo
+# points, given as a {cp gained: probability} dict, and the count is capped at
+# max_cp plus any anticipation charges. The finisher spends up to max_cp; with
+# anticipation the rest carries over to the next cycle. start_cp (a count or a
+# {cp: probability} dict) is added at the start of every cycle: Ruthlessness
+# or the T17 4pc, for instance.
+#
+# All the probability mass is pushed forward in a single pass over the cp
+# counts, lowest first: every builder gains at least one combo point, so a
+# count is only visited once everything that leads to it has been. With
+# anticipation the cycles are linked through the carried over combo points,
+# and the results are averaged over the stationary distribution of the count
+# each cycle starts at.
+
+
+def get_cp_per_move(base_cp=1, *extra_cp_chances):
+    # The {cp gained: probability} dict of a builder that gains base_cp, plus
+    # one for each of the independent chances in extra_cp_chances.
+    distribution = [1.]
+    for chance in extra_cp_chances:
+        if chance == 0:
+            continue
+        new_distribution = [0.] * (len(distribution) + 1)
+        for extra_cp, probability in enumerate(distribution):
+            new_distribution[extra_cp] += probability * (1 - chance)
+            new_distribution[extra_cp + 1] += probability * chance
+        distribution = new_distribution
+    cp_per_move = {}
+    for extra_cp, probability in enumerate(distribution):
+        cp_per_move[base_cp + extra_cp] = probability
+    return cp_per_move
+
+
+_chains = {}
+_max_cached_chains = 256
+
+
+def get_chain(cp_per_move, target_cp=5, max_cp=5, anticipation_charges=0, start_cp=0):
+    # A solved ComboPointChain for these arguments. Chains are immutable once
+    # solved, so the ones over plain numbers are cached and shared; dual
+    # numbers compare by value only, so those always get a chain of their own.
+    if isinstance(start_cp, dict):
+        start_key = tuple(sorted(start_cp.items()))
+    else:
+        start_key = start_cp
+    key = (tuple(sorted(cp_per_move.items())), target_cp, max_cp, anticipation_charges, start_key)
+    for number in _iterate_numbers(key):
+        if type(number) not in (int, long, float):
+            return ComboPointChain(cp_per_move, target_cp, max_cp, anticipation_charges, start_cp)
+    chain = _chains.get(key)
+    if chain is None:
+        if len(_chains) >= _max_cached_chains:
+            _chains.clear()
+        chain = _chains[key] = ComboPointChain(cp_per_move, target_cp, max_cp, anticipation_charges, start_cp)
+    return chain
+
+
+def _iterate_numbers(key):
+    for item in key:
+        if isinstance(item, tuple):
+            for number in _iterate_numbers(item):
+                yield number
+        else:
+            yield item
+
+
+class ComboPointChain(object):
+
+    def __init__(self, cp_per_move, target_cp=5, max_cp=5, anticipation_charges=0, start_cp=0):
+        self.cap = max_cp + anticipation_charges
+        if target_cp > self.cap:
+            raise exceptions.InvalidInputException(_('Can\'t build up to {target} combo points').format(target=target_cp))
+        self.moves = self.get_distribution_list(cp_per_move)
+        if self.moves[0]:
+            raise exceptions.InvalidInputException(_('Combo point builders have to gain at least one combo point'))
+        self.target_cp = target_cp
+        self.max_cp = max_cp
+        self.anticipation_charges = anticipation_charges
+        self.start_bonus = self.get_distribution_list(start_cp)
+        self.avg_cp_per_move = sum([cp * probability for cp, probability in enumerate(self.moves)])
+        self.solve()
+
+    def get_distribution_list(self, distribution):
+        # A count or a {count: probability} dict, as a list indexed by count.
+        if not isinstance(distribution, dict):
+            distribution = {distribution: 1.}
+        if min(distribution) < 0:
+            raise exceptions.InvalidInputException(_('Negative combo point count'))
+        distribution_list = [0.] * (max(distribution) + 1)
+        for count, probability in distribution.items():
+            distribution_list[count] += probability
+        return distribution_list
+
+    def walk(self, start):
+        # Returns, for a cycle starting at start, the probability of finishing
+        # at each cp count after each number of moves, and the probability of
+        # landing on each cp count along the way.
+        pending = [None] * (self.cap + 1)
+        pending[start] = [1.]
+        finished = [None] * (self.cap + 1)
+        landings = [0.] * (self.cap + 1)
+        for cp in xrange(start, self.cap + 1):
+            by_moves = pending[cp]
+            if by_moves is None:
+                continue
+            if cp >= self.target_cp:
+                finished[cp] = by_moves
+                continue
+            for gain, chance in enumerate(self.moves):
+                if not chance:
+                    continue
+                destination = min(cp + gain, self.cap)
+                destination_by_moves = pending[destination]
+                if destination_by_moves is None:
+                    destination_by_moves = pending[destination] = [0.] * (len(by_moves) + 1)
+                elif len(destination_by_moves) <= len(by_moves):
+                    destination_by_moves.extend([0.] * (len(by_moves) + 1 - len(destination_by_moves)))
+                for moves, probability in enumerate(by_moves):
+                    destination_by_moves[moves + 1] += probability * chance
+                    landings[destination] += probability * chance
+        return finished, landings
+
+    def get_start(self, leftover_cp):
+        # The distribution of the cp count a cycle starts at.
+        start = [0.] * (self.cap + 1)
+        for bonus, probability in enumerate(self.start_bonus):
+            if probability:
+                start[min(leftover_cp + bonus, self.cap)] += probability
+        return start
+
+    def solve(self):
+        walks = {}
+        if self.anticipation_charges:
+            self.start_distribution = self.get_stationary_distribution(walks)
+        else:
+            self.start_distribution = self.get_start(0)
+
+        self.builders_per_finisher = 0.
+        self.finisher_sizes = [0.] * (self.max_cp + 1)
+        self.time_at_cp = [0.] * (self.cap + 1)
+        self.finisher_distribution = {}
+        for start, start_probability in enumerate(self.start_distribution):
+            if not start_probability:
+                continue
+            if start not in walks:
+                walks[start] = self.walk(start)
+            finished, landings = walks[start]
+            for cp in xrange(self.cap + 1):
+                self.time_at_cp[cp] += start_probability * landings[cp]
+                if finished[cp] is None:
+                    continue
+                for moves, probability in enumerate(finished[cp]):
+                    if not probability:
+                        continue
+                    probability *= start_probability
+                    self.builders_per_finisher += moves * probability
+                    self.finisher_sizes[min(cp, self.max_cp)] += probability
+                    self.time_at_cp[cp] += probability
+                    self.finisher_distribution[(cp, moves)] = self.finisher_distribution.get((cp, moves), 0) + probability
+
+        total_weight = sum(self.time_at_cp)
+        for cp in xrange(self.cap + 1):
+            self.time_at_cp[cp] /= total_weight
+        self.avg_finisher_size = sum([cp * probability for cp, probability in enumerate(self.finisher_sizes)])
+
+    def get_stationary_distribution(self, walks):
+        # Links each starting count to the next through the carried over combo
+        # points, and solves for the long run distribution of starting counts
+        # over those reachable from the first cycle.
+        rows = {}
+        states = []
+        queue = [cp for cp, probability in enumerate(self.get_start(0)) if probability]
+        while queue:
+            start = queue.pop()
+            if start in rows:
+                continue
+            states.append(start)
+            walks[start] = self.walk(start)
+            row = [0.] * (self.cap + 1)
+            for cp, by_moves in enumerate(walks[start][0]):
+                if by_moves is None:
+                    continue
+                next_start = self.get_start(max(cp - self.max_cp, 0))
+                for next_cp, probability in enumerate(next_start):
+                    row[next_cp] += sum(by_moves) * probability
+            rows[start] = row
+            queue.extend([cp for cp, probability in enumerate(row) if probability and cp not in rows])
+
+        # pi = pi * P along with sum(pi) = 1, the latter replacing the last
+        # balance equation.
+        states.sort()
+        size = len(states)
+        matrix = []
+        for i, state in enumerate(states):
+            matrix.append([rows[other][state] - (i == j) for j, other in enumerate(states)] + [0.])
+        matrix[-1] = [1.] * size + [1.]
+        solution = convergence.solve_linear_system(matrix)
+        if solution is None:
+            raise exceptions.InvalidInputException(_('The combo point chain has no unique stationary distribution'))
+        distribution = [0.] * (self.cap + 1)
+        for state, probability in zip(states, solution):
+            distribution[state] = probability
+        return distribution
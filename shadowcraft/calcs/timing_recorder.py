@@ -0,0 +1,137 @@
+import functools
+import timeit
+
+# Opt-in timing of the calculator phases.
+#
+# Set a TimingRecorder as the recorder of a calculator and every phase marked
+# with the timed decorator, or run under calculator.timer(name), adds its wall
+# time and call count to a tree keyed by the nesting of the phases. With no
+# recorder the decorator costs one extra function call and an attribute test.
+
+
+class TimingRecorder(object):
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.root = TimingNode('total')
+        self.stack = [self.root]
+
+    def start(self, name):
+        node = self.stack[-1].get_child(name)
+        node.calls += 1
+        node.started = timeit.default_timer()
+        self.stack.append(node)
+
+    def stop(self):
+        node = self.stack.pop()
+        node.time += timeit.default_timer() - node.started
+
+    def timer(self, name):
+        return Timer(self, name)
+
+    def get_report(self):
+        # The timings as nested dicts, children in the order they first ran.
+        report = self.root.get_report()
+        report['time'] = sum([child['time'] for child in report['children']])
+        report['calls'] = 1
+        return report
+
+    def get_json(self, indent=2):
+        # json is only imported here, as it is slow to import.
+        import json
+        return json.dumps(self.get_report(), indent=indent)
+
+    def get_table(self):
+        # One line per phase, with its full path, call count, total and self
+        # time in milliseconds and share of the overall time.
+        report = self.get_report()
+        total = report['time'] or 1.
+        rows = []
+        self.add_rows(rows, report, '')
+        width = max([len(row[0]) for row in rows] + [5])
+        lines = ['{0:<{width}}  {1:>8}  {2:>11}  {3:>11}  {4:>6}'.format('phase', 'calls', 'total ms', 'self ms', '%', width=width)]
+        for path, calls, time, self_time in rows:
+            lines.append('{0:<{width}}  {1:>8}  {2:>11.3f}  {3:>11.3f}  {4:>6.1f}'.format(
+                path, calls, time * 1000, self_time * 1000, 100 * time / total, width=width))
+        return '\n'.join(lines)
+
+    def add_rows(self, rows, report, prefix):
+        for child in report['children']:
+            path = prefix + child['name']
+            self_time = child['time'] - sum([grandchild['time'] for grandchild in child['children']])
+            rows.append((path, child['calls'], child['time'], self_time))
+            self.add_rows(rows, child, path + '/')
+
+
+class TimingNode(object):
+    __slots__ = ('name', 'calls', 'time', 'started', 'children', 'child_names')
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.time = 0.
+        self.started = 0.
+        self.children = {}
+        self.child_names = []
+
+    def get_child(self, name):
+        child = self.children.get(name)
+        if child is None:
+            child = self.children[name] = TimingNode(name)
+            self.child_names.append(name)
+        return child
+
+    def get_report(self):
+        return {
+            'name': self.name,
+            'calls': self.calls,
+            'time': self.time,
+            'children': [self.children[name].get_report() for name in self.child_names],
+        }
+
+
+class Timer(object):
+    # Context manager timing a block as one call of a phase.
+
+    def __init__(self, recorder, name):
+        self.recorder = recorder
+        self.name = name
+
+    def __enter__(self):
+        self.recorder.start(self.name)
+        return self
+
+    def __exit__(self, exception_type, exception, traceback):
+        self.recorder.stop()
+        return False
+
+
+class NullTimer(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception, traceback):
+        return False
+
+null_timer = NullTimer()
+
+
+def timed(function):
+    # Decorator for methods of objects with a recorder attribute: times each
+    # call as a phase named after the method.
+    name = function.__name__
+
+    @functools.wraps(function)
+    def timed_function(self, *args, **kwargs):
+        recorder = self.recorder
+        if recorder is None:
+            return function(self, *args, **kwargs)
+        recorder.start(name)
+        try:
+            return function(self, *args, **kwargs)
+        finally:
+            recorder.stop()
+    return timed_function
@@ -1,3 +1,5 @@
+import array
+
 from shadowcraft.core import exceptions
 
 class Util(object):
@@ -1052,10 +1054,31 @@ class Util(object):
         return self.AGI_CRIT_INTERCEPT_VALUES[self.get_class_number(game_class)]
 
     def get_random_prop_point(self, item_level):
-        if item_level < 1:
-            raise exceptions.InvalidInputException(_('item_level={item_level} need to be >= 1').format(item_level=item_level))
-        return self.RANDOM_PROP_POINTS[item_level][1]
+        return get_random_prop_point(item_level)
     
     def get_constant_scaling_point(self, level):
         return self.CONSTANT_SCALING[level-1]
     
+
+
+# The random prop points as a flat array indexed by item level, built from
+# the table the first time it is needed.
+random_prop_points = None
+
+
+def load_random_prop_points():
+    global random_prop_points
+    points_by_level = array.array('l')
+    for item_level, points in Util.RANDOM_PROP_POINTS:
+        if item_level != len(points_by_level):
+            raise exceptions.InvalidInputException(_('Missing random prop points for item_level={item_level}').format(
+                item_level=len(points_by_level)))
+        points_by_level.append(points)
+    random_prop_points = points_by_level
+    return points_by_level
+
+
+def get_random_prop_point(item_level):
+    if item_level < 1:
+        raise exceptions.InvalidInputException(_('item_level={item_level} need to be >= 1').format(item_level=item_level))
+    return (random_prop_points or load_random_prop_points())[item_level]
@@ -11,6 +11,9 @@ class Glyphs(object):
 
     def __getattr__(self, name):
         # Any glyph we haven't assigned a value to, we don't have.
+        # Not set yet when the object is being unpickled or copied.
+        if name == 'allowed_glyphs':
+            raise AttributeError(name)
         if name in self.allowed_glyphs:
             return False
         object.__getattribute__(self, name)
@@ -1,10 +1,266 @@
+import gettext
+import __builtin__
+import operator
+import re
+
+__builtin__._ = gettext.gettext
+
+from shadowcraft.core import exceptions
+
+class InvalidPriorityListException(exceptions.InvalidInputException):
+    pass
+
+# Action priority lists: the actions of a rotation by priority, each with an
+# optional condition, written as in simc:
+#
+#   PriorityList('eviscerate,if=combo_points=5',
+#                'sinister_strike,if=combo_points<5&energy>=50')
+#
+# Conditions combine numbers and variables with + - * / (x/0 is 0), the
+# comparisons = != < <= > >=, the logical & | !, and parentheses; a value is
+# true when it isn't 0. Variables are dotted names such as energy,
+# buff.slice_and_dice.remains or cooldown.killing_spree.up, and which ones
+# exist is up to the engine the list is compiled for.
+#
+# The entries are parsed once, when the list is built. compile() turns each
+# condition into nested closures of (state, time), looking the variables up
+# once, so that choosing an action costs a few calls per action and no parsing.
+#
+# thresholds lists the (variable, number) pairs the conditions compare, and
+# (variable, None) for the variables used otherwise: an engine can work out
+# from them when a condition may change.
+
+token_pattern = re.compile(r'\s*(?:(\d+\.?\d*|\.\d+)|([a-z_][a-z0-9_.]*)|(==|<=|>=|!=|[-+*/<>=!&|()]))')
+
+def divide(left, right):
+    if not right:
+        return 0
+    return float(left) / right
+
+binary_operators = {
+    '|': None, # these two short-circuit, see compile_condition
+    '&': None,
+    '=': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': divide,
+}
+
+comparisons = ('=', '!=', '<', '<=', '>', '>=')
+
+# by increasing precedence; ! and unary - bind tighter than all of them
+precedence_levels = (('|',), ('&',), comparisons, ('+', '-'), ('*', '/'))
+
+
 class PriorityList(object):
 
-    def __init__(self, *args):
-        #for each arg (string), read conditionals and determine checks
-        for a in args:
-            print a #to implement later
+    def __init__(self, *entries):
+        # Each entry is 'action' or 'action,if=condition'.
+        self.entries = entries
+        self.actions = [parse_entry(entry) for entry in entries]
+        self.thresholds = []
+        for name, condition in self.actions:
+            if condition is not None:
+                add_thresholds(condition, self.thresholds)
+
+    def get_action_names(self):
+        return [name for name, condition in self.actions]
+
+    def compile(self, get_variable, get_ready_check=None):
+        # get_variable(name) returns a function of (state, time) giving the
+        # value of the variable name, or None when there is no such variable.
+        # get_ready_check(action), if given, returns a function of (state, time)
+        # telling whether action can be used; it is checked before the
+        # condition.
+        actions = []
+        conditions = []
+        for entry, (name, condition) in zip(self.entries, self.actions):
+            if condition is not None:
+                condition = compile_condition(condition, get_variable, entry)
+            check = condition
+            if get_ready_check is not None:
+                check = combine_checks(get_ready_check(name), condition)
+            actions.append((name, check))
+            conditions.append(condition)
+        return CompiledPriorityList(actions, conditions, self.thresholds)
+
+
+class CompiledPriorityList(object):
+
+    def __init__(self, actions, conditions=None, thresholds=()):
+        # actions are (name, check) tuples, check being a function of
+        # (state, time) or None for actions that are always usable. The
+        # conditions alone, without the ready checks, are in conditions.
+        self.actions = actions
+        self.conditions = conditions or [check for name, check in actions]
+        self.thresholds = thresholds
+
+    def get_action(self, state, time):
+        # The first action whose check passes, or None.
+        for name, check in self.actions:
+            if check is None or check(state, time):
+                return name
+        return None
+
+
+def parse_entry(entry):
+    name, separator, condition = entry.partition(',')
+    name = name.strip()
+    if not re.match(r'^[a-z_][a-z0-9_]*$', name):
+        raise InvalidPriorityListException(_('Invalid action name in {entry}').format(entry=entry))
+    if not separator:
+        return name, None
+    if not condition.startswith('if='):
+        raise InvalidPriorityListException(_('Expected if= after the action name in {entry}').format(entry=entry))
+    return name, parse_condition(condition[3:], entry)
+
+
+def tokenize(text, entry):
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = token_pattern.match(text, position)
+        if match is None:
+            raise InvalidPriorityListException(_('Unexpected character at {text} in {entry}').format(
+                text=text[position:].strip(), entry=entry))
+        number, name, symbol = match.groups()
+        if number is not None:
+            tokens.append(('number', float(number)))
+        elif name is not None:
+            tokens.append(('variable', name))
+        else:
+            tokens.append(('symbol', '=' if symbol == '==' else symbol))
+        position = match.end()
+    return tokens
+
+
+def parse_condition(text, entry):
+    # Returns the condition as a tree of tuples: ('number', value),
+    # ('variable', name), ('unary', symbol, operand) and
+    # ('binary', symbol, left, right).
+    tokens = tokenize(text, entry)
+    if not tokens:
+        raise InvalidPriorityListException(_('Empty condition in {entry}').format(entry=entry))
+    node, position = parse_level(tokens, 0, 0, entry)
+    if position != len(tokens):
+        raise InvalidPriorityListException(_('Unexpected {token} in {entry}').format(token=tokens[position][1], entry=entry))
+    return node
+
+
+def parse_level(tokens, position, level, entry):
+    if level == len(precedence_levels):
+        return parse_operand(tokens, position, entry)
+    symbols = precedence_levels[level]
+    node, position = parse_level(tokens, position, level + 1, entry)
+    while position < len(tokens) and tokens[position][0] == 'symbol' and tokens[position][1] in symbols:
+        symbol = tokens[position][1]
+        right, position = parse_level(tokens, position + 1, level + 1, entry)
+        node = ('binary', symbol, node, right)
+    return node, position
+
+
+def parse_operand(tokens, position, entry):
+    if position == len(tokens):
+        raise InvalidPriorityListException(_('Unexpected end of condition in {entry}').format(entry=entry))
+    kind, value = tokens[position]
+    if kind != 'symbol':
+        return (kind, value), position + 1
+    if value in ('!', '-'):
+        operand, position = parse_operand(tokens, position + 1, entry)
+        return ('unary', value, operand), position
+    if value == '(':
+        node, position = parse_level(tokens, position + 1, 0, entry)
+        if position == len(tokens) or tokens[position] != ('symbol', ')'):
+            raise InvalidPriorityListException(_('Missing ) in {entry}').format(entry=entry))
+        return node, position + 1
+    raise InvalidPriorityListException(_('Unexpected {token} in {entry}').format(token=value, entry=entry))
+
+
+def add_thresholds(node, thresholds):
+    kind = node[0]
+    if kind == 'variable':
+        threshold = (node[1], None)
+    elif kind == 'binary' and node[1] in comparisons and \
+         set((node[2][0], node[3][0])) == set(('variable', 'number')):
+        if node[2][0] == 'variable':
+            threshold = (node[2][1], node[3][1])
+        else:
+            threshold = (node[3][1], node[2][1])
+    else:
+        for child in node[2:]:
+            if type(child) is tuple:
+                add_thresholds(child, thresholds)
         return
-    
-    def __getattr__(self, name):
-        object.__getattribute__(self, name)
+    if threshold not in thresholds:
+        thresholds.append(threshold)
+
+
+def fold_constants(node):
+    # The node with the operations on numbers only already done.
+    if node[0] == 'unary':
+        operand = fold_constants(node[2])
+        if operand[0] == 'number':
+            return ('number', float(not operand[1]) if node[1] == '!' else -operand[1])
+        return ('unary', node[1], operand)
+    if node[0] == 'binary':
+        symbol = node[1]
+        left = fold_constants(node[2])
+        right = fold_constants(node[3])
+        if left[0] == 'number' and right[0] == 'number':
+            if symbol == '&':
+                return ('number', float(bool(left[1] and right[1])))
+            if symbol == '|':
+                return ('number', float(bool(left[1] or right[1])))
+            return ('number', float(binary_operators[symbol](left[1], right[1])))
+        return ('binary', symbol, left, right)
+    return node
+
+
+def compile_condition(node, get_variable, entry):
+    return compile_node(fold_constants(node), get_variable, entry)
+
+
+def compile_node(node, get_variable, entry):
+    kind = node[0]
+    if kind == 'number':
+        value = node[1]
+        return lambda state, time: value
+    if kind == 'variable':
+        function = get_variable(node[1])
+        if function is None:
+            raise InvalidPriorityListException(_('Unknown variable {variable} in {entry}').format(variable=node[1], entry=entry))
+        return function
+    if kind == 'unary':
+        operand = compile_node(node[2], get_variable, entry)
+        if node[1] == '!':
+            return lambda state, time: not operand(state, time)
+        return lambda state, time: -operand(state, time)
+
+    symbol = node[1]
+    left = compile_node(node[2], get_variable, entry)
+    if symbol == '&':
+        right = compile_node(node[3], get_variable, entry)
+        return lambda state, time: left(state, time) and right(state, time)
+    if symbol == '|':
+        right = compile_node(node[3], get_variable, entry)
+        return lambda state, time: left(state, time) or right(state, time)
+    function = binary_operators[symbol]
+    if node[3][0] == 'number':
+        # the common variable <op> number case, without calling for the number
+        value = node[3][1]
+        return lambda state, time: function(left(state, time), value)
+    right = compile_node(node[3], get_variable, entry)
+    return lambda state, time: function(left(state, time), right(state, time))
+
+
+def combine_checks(ready_check, condition):
+    if condition is None:
+        return ready_check
+    return lambda state, time: ready_check(state, time) and condition(state, time)
@@ -8,46 +8,213 @@ class InvalidProcException(exceptions.InvalidInputException):
     pass
 
 
+# Proc data is compiled once, on first use, into templates: one read only class
+# per proc_data entry, holding everything that doesn't change between
+# profiles as class attributes. The Proc instances equipped in a ProcsList
+# only store the per-profile fields in slots (item_level, value, icd,
+# proc_rate, proc_rate_modifier, uptime, and mh_only and oh_only for weapon
+# enchants), so creating one is cheap and the templates can be shared freely.
+# Entries are validated as they are compiled, a whole table at a time, so
+# incomplete data fails on the first use of its table instead of in the
+# middle of a ranking.
+
+proc_types = ('rppm', 'ppm', 'icd', 'perc', 'perk')
+proc_triggers = ('all_attacks', 'auto_attacks', 'strikes', 'all_melee_attacks', 'all_spells_and_attacks', 'all_spells',
+                 'damaging_spells', 'healing_spells', 'all_periodic_damage', 'periodic_spell_damage', 'hots', 'bleeds')
+# Every field a proc_data entry can have, with its default.
+required = object()
+proc_fields = {
+    'stat': required,
+    'value': required,
+    'duration': required,
+    'proc_name': required,
+    'max_stacks': 1,
+    'can_crit': True,
+    'stats': (),
+    'upgradable': False,
+    'scaling': 0,
+    'buffs': None,
+    'base_value': 0,
+    'type': 'rppm',
+    'icd': 0,
+    'proc_rate': 1.0,
+    'trigger': 'all_attacks',
+    'haste_scales': False,
+    'item_level': 1,
+    'on_crit': False,
+    'on_procced_strikes': True,
+    'proc_rate_modifier': 1.,
+    'source': 'generic',
+    'att_spd_scales': False,
+}
+numeric_proc_fields = ('duration', 'max_stacks', 'base_value', 'icd', 'proc_rate', 'item_level', 'proc_rate_modifier')
+# Fields copied from the template to each proc, which may then change them.
+instance_proc_fields = ('item_level', 'value', 'icd', 'proc_rate', 'proc_rate_modifier')
+
+
+class ReadOnlyDict(dict):
+    # The stat values of a template, shared by all of its procs.
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError(_('Proc data is read only'))
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _read_only
+
+    def __reduce__(self):
+        return (ReadOnlyDict, (dict(self),))
+
+
+class ProcTemplate(type):
+    # The class of the proc templates, which can't be changed once compiled.
+    # Calling Proc itself with the fields of a proc_data entry, as in
+    # Proc(**data), compiles a one-off template for them.
+
+    def __call__(cls, *args, **kwargs):
+        if cls is Proc:
+            template = compile_template(kwargs.get('proc_name'), kwargs, ('data', dict(kwargs)))
+            return template(kwargs.get('item_level'))
+        return type.__call__(cls, *args, **kwargs)
+
+    def __setattr__(cls, name, value):
+        raise AttributeError(_('Proc templates are read only'))
+
+    def __delattr__(cls, name):
+        raise AttributeError(_('Proc templates are read only'))
+
+
+def compile_template(name, data, reference):
+    # Validates a proc_data entry and returns its template. reference tells
+    # _restore_proc how to find the template again when unpickling.
+    def fail(problem):
+        raise InvalidProcException(_('Invalid data for proc {proc}: {problem}').format(proc=name, problem=problem))
+
+    for field in data:
+        if field not in proc_fields:
+            fail(_('unknown field {field}').format(field=field))
+    fields = {}
+    for field, default in proc_fields.items():
+        if field in data:
+            fields[field] = data[field]
+        elif default is required:
+            fail(_('missing field {field}').format(field=field))
+        else:
+            fields[field] = default
+    for field in numeric_proc_fields:
+        if not isinstance(fields[field], (int, long, float)):
+            fail(_('{field} is not a number').format(field=field))
+    if fields['scaling'] is None:
+        fields['scaling'] = 0
+    if fields['type'] not in proc_types:
+        fail(_('unknown type {type}').format(type=fields['type']))
+    if fields['trigger'] not in proc_triggers:
+        fail(_('unknown trigger {trigger}').format(trigger=fields['trigger']))
+    if fields['type'] in ('rppm', 'ppm') and fields['proc_rate'] <= 0:
+        fail(_('no proc rate'))
+    value = fields['value']
+    if isinstance(value, dict):
+        for stat in value:
+            if not isinstance(value[stat], (int, long, float)):
+                fail(_('the {stat} value is not a number').format(stat=stat))
+        value = ReadOnlyDict(value)
+    elif not isinstance(value, (int, long, float)):
+        fail(_('value is not a number or a dict of numbers'))
+    elif fields['stat'] in ('stats', 'stats_modifier') or (fields['scaling'] and fields['source'] == 'trinket'):
+        fail(_('{stat} procs need a dict of values').format(stat=fields['stat']))
+
+    attributes = {
+        '__slots__': (),
+        'template_name': name,
+        'template_reference': reference,
+        'stat': fields['stat'],
+        'duration': fields['duration'],
+        'proc_name': fields['proc_name'],
+        'max_stacks': fields['max_stacks'],
+        'can_crit': fields['can_crit'],
+        'upgradable': fields['upgradable'],
+        'scaling': fields['scaling'],
+        'buffs': fields['buffs'],
+        'base_value': fields['base_value'],
+        'proc_type': fields['type'],
+        'type': fields['type'],
+        'trigger': fields['trigger'],
+        'haste_scales': fields['haste_scales'],
+        'on_crit': fields['on_crit'],
+        'on_procced_strikes': fields['on_procced_strikes'],
+        'source': fields['source'],
+        'att_spd_scales': fields['att_spd_scales'],
+        'default_value': value,
+        'default_item_level': fields['item_level'],
+        'default_icd': fields['icd'],
+        'default_proc_rate': fields['proc_rate'],
+        'default_proc_rate_modifier': fields['proc_rate_modifier'],
+    }
+    if fields['stats']:
+        attributes['stats'] = frozenset(fields['stats'])
+    return ProcTemplate(str(name), (Proc,), attributes)
+
+
+# The scaled stat values of the templates, by template and item level. They
+# only depend on those two, so they are computed once and shared by every
+# proc, read only like the templates' own values.
+scaled_values = {}
+
+
+def get_scaled_value(template, item_level):
+    key = (template, item_level)
+    value = scaled_values.get(key)
+    if value is None:
+        points = class_data.get_random_prop_point(item_level)
+        value = ReadOnlyDict((e, round(template.scaling * points)) for e in template.default_value)
+        if template.template_reference[0] != 'data':
+            # One-off templates from Proc(**data) aren't worth keeping.
+            scaled_values[key] = value
+    return value
+
+
+def _restore_proc(reference, state):
+    kind, key = reference
+    if kind == 'data':
+        template = compile_template(key.get('proc_name'), key, reference)
+    else:
+        template = template_tables[kind][key]
+    proc = object.__new__(template)
+    for field, value in state.items():
+        setattr(proc, field, value)
+    return proc
+
+
 class Proc(object):
-    def __init__(self, stat, value, duration, proc_name, max_stacks=1, can_crit=True, stats=None, upgradable=False, scaling=None,
-                 buffs=None, base_value=0, type='rppm', icd=0, proc_rate=1.0, trigger='all_attacks', haste_scales=False, item_level=1,
-                 on_crit=False, on_procced_strikes=True, proc_rate_modifier=1., source='generic', att_spd_scales=False,):
-        self.stat = stat
-        if stats is not None:
-            self.stats = set(stats)
-        self.value = value
-        self.base_value = base_value
-        self.buffs = buffs
-        self.can_crit = can_crit
-        self.duration = duration
-        self.max_stacks = max_stacks
-        self.upgradable = upgradable
-        self.scaling = scaling
-        self.proc_name = proc_name
-        self.proc_type = type
-        self.icd = icd
-        self.type = type
-        self.source = source
-        self.proc_rate = proc_rate
-        self.trigger = trigger
-        self.haste_scales = haste_scales
-        self.att_spd_scales = att_spd_scales
+    __metaclass__ = ProcTemplate
+    __slots__ = instance_proc_fields + ('uptime', 'mh_only', 'oh_only')
+
+    def __init__(self, item_level=None):
+        if item_level is None:
+            item_level = self.default_item_level
         self.item_level = item_level
-        self.on_crit = on_crit
-        self.on_procced_strikes = on_procced_strikes
-        self.proc_rate_modifier = proc_rate_modifier
-        
+        self.value = self.default_value
+        self.icd = self.default_icd
+        self.proc_rate = self.default_proc_rate
+        self.proc_rate_modifier = self.default_proc_rate_modifier
+        self.mh_only = False
+        self.oh_only = False
+
         #separate method just to keep the constructor clean
         self.update_proc_value()
-    
+
+    def __reduce__(self):
+        # The template is pickled by reference, so unpickled procs share it.
+        state = {}
+        for field in Proc.__slots__:
+            if hasattr(self, field):
+                state[field] = getattr(self, field)
+        return (_restore_proc, (self.template_reference, state))
+
     def update_proc_value(self):
-        tools = class_data.Util()
         #http://forums.elitistjerks.com/topic/130561-shadowcraft-for-mists-of-pandaria/page-3
         #see above for stat value initialization
         if self.scaling:
             if self.source in ('trinket',):
-                for e in self.value:
-                    self.value[e] = round(self.scaling * tools.get_random_prop_point(self.item_level))
+                self.value = get_scaled_value(type(self), self.item_level)
 
     def procs_off_auto_attacks(self):
         if self.trigger in ('all_attacks', 'auto_attacks', 'all_spells_and_attacks', 'all_melee_attacks'):
@@ -143,22 +310,111 @@ class Proc(object):
         # probably should configure this somehow, but type check is probably enough
         raise InvalidProcException(_('Invalid data for proc {proc}').format(proc=self.proc_name))
 
+class TemplateTable(object):
+    # The templates of one table of proc data, by name, read only. The whole
+    # table is compiled, and so validated, the first time a template is
+    # looked up, which keeps the compilation out of the import. Names,
+    # membership and length come from the data and don't compile anything.
+
+    def __init__(self, kind, data):
+        self.kind = kind
+        self.data = data
+        self._templates = None
+
+    def _get_templates(self):
+        if self._templates is None:
+            templates = {}
+            for name, data in self.data.items():
+                templates[name] = compile_template(name, data, (self.kind, name))
+            self._templates = templates
+        return self._templates
+
+    def __getitem__(self, name):
+        return self._get_templates()[name]
+
+    def get(self, name, default=None):
+        return self._get_templates().get(name, default)
+
+    def __contains__(self, name):
+        return name in self.data
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def keys(self):
+        return self.data.keys()
+
+    def values(self):
+        return self._get_templates().values()
+
+    def items(self):
+        return self._get_templates().items()
+
+    def iteritems(self):
+        return self._get_templates().iteritems()
+
+templates = TemplateTable('procs', proc_data.allowed_procs)
+enchant_templates = TemplateTable('enchants', proc_data.allowed_melee_enchants)
+template_tables = {'procs': templates, 'enchants': enchant_templates}
+
+
+def get_proc_group(proc):
+    # The group get_proc_groups puts proc in, if any.
+    if proc.stat == 'stats':
+        if proc.is_real_ppm():
+            return 'stats_rppm'
+        return 'stats'
+    elif proc.stat == 'stats_modifier':
+        return 'stats_modifier'
+    elif proc.stat in ('spell_damage', 'physical_damage', 'physical_dot'):
+        return 'damage'
+    elif proc.stat == 'extra_weapon_damage':
+        return 'extra_weapon_damage'
+    return None
+
+proc_groups = ('stats_rppm', 'stats', 'stats_modifier', 'damage', 'extra_weapon_damage')
+
+
 class ProcsList(object):
     allowed_procs = proc_data.allowed_procs
+    templates = templates
+    # Position of each proc in allowed_procs, which the active procs are
+    # listed in.
+    proc_order = dict((name, position) for position, name in enumerate(allowed_procs))
 
     def __init__(self, *args):
+        # The equipped procs by name, kept up to date on every assignment or
+        # deletion of a proc attribute, and their groups, rebuilt on demand.
+        self.active_procs = {}
+        self.groups = None
         for arg in args:
             if not isinstance(arg, (list,tuple)):
                 arg = (arg,100)
             if arg[0] in self.allowed_procs:
-                proc_data = self.allowed_procs[arg[0]]
-                proc_data['item_level'] = arg[1]
-                setattr(self, arg[0], Proc(**proc_data))
+                self.set_proc(arg[0], arg[1])
             else:
                 raise InvalidProcException(_('No data for proc {proc}').format(proc=arg[0]))
 
-    def set_proc(self, proc):
-        setattr(self, proc, Proc(**self.allowed_procs[proc]))
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if name in self.allowed_procs:
+            if value:
+                self.active_procs[name] = value
+            else:
+                self.active_procs.pop(name, None)
+            self.groups = None
+
+    def __delattr__(self, name):
+        object.__delattr__(self, name)
+        if name in self.allowed_procs:
+            self.active_procs.pop(name, None)
+            self.groups = None
+
+    def set_proc(self, proc, item_level=None):
+        setattr(self, proc, self.templates[proc](item_level))
     
     def del_proc(self, proc):
         setattr(self, proc, False)
@@ -168,25 +424,37 @@ class ProcsList(object):
         if proc in self.allowed_procs:
             return False
         object.__getattribute__(self, proc)
+
+    def get_active_procs(self):
+        return [self.active_procs[name] for name in sorted(self.active_procs, key=self.proc_order.get)]
+
+    def get_proc_groups(self):
+        # The active procs by group, see get_proc_group. Stat procs with an
+        # icd are in the same group as those without, as icds can change
+        # after a proc is equipped. The lists are shared, don't change them.
+        if self.groups is None:
+            groups = dict((group, []) for group in proc_groups)
+            for proc in self.get_active_procs():
+                group = get_proc_group(proc)
+                if group is not None:
+                    groups[group].append(proc)
+            self.groups = groups
+        return self.groups
     
     def get_all_procs_for_stat(self, stat=None):
         procs = []
-        for proc_name in self.allowed_procs:
-            proc = getattr(self, proc_name)
-            if proc:
-                if stat is None:
-                    procs.append(proc)
-                elif proc.stat in ('stats', 'highest', 'random') and stat in proc.value:
-                    procs.append(proc)
+        for proc in self.get_active_procs():
+            if stat is None:
+                procs.append(proc)
+            elif proc.stat in ('stats', 'highest', 'random') and stat in proc.value:
+                procs.append(proc)
 
         return procs
 
     def get_all_damage_procs(self):
         procs = []
-        for proc_name in self.allowed_procs:
-            proc = getattr(self, proc_name)
-            if proc:
-                if proc.stat in ('spell_damage', 'physical_damage'):
-                    procs.append(proc)
+        for proc in self.get_active_procs():
+            if proc.stat in ('spell_damage', 'physical_damage'):
+                procs.append(proc)
 
-        return procs
\ No newline at end of file
+        return procs
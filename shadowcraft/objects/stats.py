@@ -139,7 +139,7 @@ class Weapon(object):
             if self.is_melee():
                 if enchant in self.allowed_melee_enchants:
                     self.del_enchant()
-                    proc = procs.Proc(**self.allowed_melee_enchants[enchant])
+                    proc = procs.enchant_templates[enchant]()
                     setattr(self, enchant, proc)
                 else:
                     raise exceptions.InvalidInputException(_('Enchant {enchant} is not allowed.').format(enchant=enchant))
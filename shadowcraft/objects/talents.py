@@ -22,6 +22,9 @@ class Talents(object):
     def __getattr__(self, name):
         # If someone tries to access a talent not initialized (the talent
         # string was shorter than 6) we return False
+        # Not set yet when the object is being unpickled or copied.
+        if name == 'allowed_talents':
+            raise AttributeError(name)
         if name in self.allowed_talents:
             return False
         object.__getattribute__(self, name)
@@ -0,0 +1,47 @@
+import unittest
+from shadowcraft.calcs import convergence
+from shadowcraft.core import exceptions
+
+class TestConvergence(unittest.TestCase):
+    def iterate(self, strategy, function, guess, precision=1e-10):
+        # Returns the fixed point and the number of function evaluations.
+        for iterations in xrange(1, 1000):
+            result = function(guess)
+            if max([abs(result[key] - guess[key]) for key in result]) < precision:
+                return result, iterations
+            guess = strategy.next_guess(guess, result)
+        self.fail('No convergence')
+
+    def linear_map(self, values):
+        return {'a': .9 * values['a'] + .1, 'b': .5 * values['a'] + .4 * values['b']}
+
+    def test_plain(self):
+        strategy = convergence.get_strategy('plain')
+        result = {'a': 1.}
+        self.assertTrue(strategy.next_guess({'a': 0.}, result) is result)
+        fixed_point, iterations = self.iterate(strategy, self.linear_map, {'a': 0., 'b': 0.})
+        self.assertAlmostEqual(fixed_point['a'], 1.)
+        self.assertAlmostEqual(fixed_point['b'], 5. / 6)
+
+    def test_accelerated(self):
+        plain_iterations = self.iterate(convergence.get_strategy('plain'), self.linear_map, {'a': 0., 'b': 0.})[1]
+        for name in ('aitken', 'anderson'):
+            fixed_point, iterations = self.iterate(convergence.get_strategy(name), self.linear_map, {'a': 0., 'b': 0.})
+            self.assertAlmostEqual(fixed_point['a'], 1.)
+            self.assertAlmostEqual(fixed_point['b'], 5. / 6)
+            self.assertTrue(iterations < plain_iterations / 2)
+
+    def test_nested_values(self):
+        values = {'b': [1., 2.], 'a': {'d': 3., 'c': 4.}, 'e': 5.}
+        layout = convergence.get_layout(values)
+        self.assertEqual(convergence.flatten(values, layout), [4., 3., 1., 2., 5.])
+        self.assertEqual(convergence.unflatten(convergence.flatten(values, layout), layout), values)
+
+    def test_layout_change(self):
+        strategy = convergence.get_strategy('anderson')
+        strategy.next_guess({'a': 0.}, {'a': 1.})
+        result = {'a': 1., 'b': 2.}
+        self.assertTrue(strategy.next_guess({'a': 1., 'b': 0.}, result) is result)
+
+    def test_unknown_strategy(self):
+        self.assertRaises(exceptions.InvalidInputException, convergence.get_strategy, 'newton')
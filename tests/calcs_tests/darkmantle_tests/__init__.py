@@ -0,0 +1,39 @@
+from shadowcraft.calcs.darkmantle import DarkmantleCalculator
+from shadowcraft.calcs.darkmantle import settings
+from shadowcraft.calcs.darkmantle.rogue import RogueDarkmantleCalculator
+from shadowcraft.objects import buffs
+from shadowcraft.objects import glyphs
+from shadowcraft.objects import procs
+from shadowcraft.objects import race
+from shadowcraft.objects import stats
+from shadowcraft.objects import talents
+
+def make_calculator(style='time', limit=10, oh_speed=2.6, priority_list=None):
+    # With an empty priority_list, only the autoattacks run.
+    test_buffs = buffs.Buffs('stat_multiplier_buff', 'crit_chance_buff', 'attack_power_buff')
+    test_mh = stats.Weapon(571.0, 2.6, 'axe', 'dancing_steel')
+    test_oh = stats.Weapon(571.0, oh_speed, 'axe', 'dancing_steel')
+    test_stats = stats.Stats(test_mh, test_oh, procs.ProcsList(), stats.GearBuffs('gear_specialization'), agi=862,
+                             stam=1000, crit=87, haste=553, mastery=200, versatility=160, multistrike=120)
+    test_settings = settings.Settings(settings.CombatCycle(priority_list), style=style, limit=limit)
+    return RogueDarkmantleCalculator(test_stats, talents.Talents('332213', 'rogue', 90), glyphs.Glyphs('rogue'),
+                                     test_buffs, race.Race('pandaren'), test_settings, 90)
+
+class LooseKeyCalculator(RogueDarkmantleCalculator):
+    # Leaves the weapon speeds out of the key, so that actors with different
+    # speeds start in one group and split on their first swings.
+    def get_lockstep_key(self):
+        return DarkmantleCalculator.get_lockstep_key(self)
+
+def make_calculators(style='time', limits=(10, 33), oh_speeds=(2.6, 1.3, 1.8), loose_key=False):
+    calculators = []
+    for limit in limits:
+        for oh_speed in oh_speeds:
+            for agi in (0, 150):
+                calculator = make_calculator(style=style, limit=limit, oh_speed=oh_speed)
+                if loose_key:
+                    calculator.__class__ = LooseKeyCalculator
+                calculator.state.current_stats['agi'] += agi
+                calculator.calculate_effective_ap()
+                calculators.append(calculator)
+    return calculators
@@ -0,0 +1,106 @@
+import unittest
+from shadowcraft.calcs.darkmantle import InputNotModeledException
+from shadowcraft.calcs.darkmantle import auras
+from shadowcraft.calcs.darkmantle import batch
+from shadowcraft.calcs.darkmantle import timeline
+from shadowcraft.calcs.darkmantle import tracing
+from shadowcraft.calcs.darkmantle.generic_event import GenericEvent
+from shadowcraft.calcs.darkmantle.rogue import RogueDarkmantleCalculator
+from shadowcraft.objects.priority_list import PriorityList
+from calcs_tests.darkmantle_tests import make_calculator
+from calcs_tests.darkmantle_tests import make_calculators
+
+aura_definitions = {
+    'insight': auras.Aura('insight', 5, max_stacks=3),
+    'stance': auras.Aura('stance'),
+}
+
+class InsightEvent(GenericEvent):
+    _name = 'insight_buff'
+
+    def calculate_breakdown(self):
+        self.engine.apply_aura(self.state, self.timeline, self.time, 'insight')
+        return self.breakdown
+
+class AuraCalculator(RogueDarkmantleCalculator):
+    # Opens the fight with insight up.
+    aura_definitions = aura_definitions
+
+    def get_timeline(self):
+        events = super(AuraCalculator, self).get_timeline()
+        self.apply_aura(self.state, events, 0, 'insight', 2)
+        return events
+
+class TestAuras(unittest.TestCase):
+    def setUp(self):
+        self.calculator = make_calculator(priority_list=PriorityList())
+        self.calculator.aura_definitions = aura_definitions
+        self.state = self.calculator.state
+        self.events = timeline.Timeline()
+
+    def test_apply(self):
+        self.calculator.apply_aura(self.state, self.events, 0, 'insight')
+        self.assertEqual((self.state.auras['insight'], self.state.aura_stacks['insight']), (5, 1))
+        self.assertEqual(list(self.events), [(5, 'insight_expires')])
+        # refreshing adds stacks, up to max_stacks, and moves the expiration
+        self.calculator.apply_aura(self.state, self.events, 2, 'insight', 4)
+        self.assertEqual((self.state.auras['insight'], self.state.aura_stacks['insight']), (7, 3))
+        self.assertEqual(list(self.events), [(7, 'insight_expires')])
+        time, name = self.events.pop()
+        self.calculator.get_next_attack(name)(self.calculator, {}, time, self.events, 0, self.state).calculate_breakdown()
+        self.assertFalse('insight' in self.state.auras or 'insight' in self.state.aura_stacks)
+        self.assertFalse(self.events)
+
+    def test_expired_stacks(self):
+        # Applied again as it runs out, the aura starts from no stacks.
+        self.calculator.apply_aura(self.state, self.events, 0, 'insight', 2)
+        self.calculator.apply_aura(self.state, self.events, 5, 'insight')
+        self.assertEqual(self.state.aura_stacks['insight'], 1)
+        self.assertEqual(list(self.events), [(10, 'insight_expires')])
+
+    def test_remove(self):
+        self.calculator.apply_aura(self.state, self.events, 0, 'insight')
+        self.calculator.apply_aura(self.state, self.events, 0, 'stance')
+        self.assertEqual(self.state.auras['stance'], float('inf'))
+        self.assertEqual(list(self.events), [(5, 'insight_expires')])
+        for name in ('insight', 'stance', 'insight'):
+            self.calculator.remove_aura(self.state, self.events, name)
+        self.assertFalse(self.events)
+        self.assertFalse('stance' in self.state.auras or 'insight' in self.state.auras)
+
+    def test_errors(self):
+        self.assertRaises(InputNotModeledException, self.calculator.apply_aura, self.state, self.events, 0, 'shadow_dance')
+        self.assertRaises(InputNotModeledException, self.calculator.get_next_attack, 'shadow_dance_expires')
+
+    def test_priority_list(self):
+        self.calculator.settings.cycle.priority_list = PriorityList('sinister_strike,if=buff.insight.stack>=2')
+        self.calculator.apply_aura(self.state, self.events, 0, 'insight', 2)
+        priority_list = self.calculator.get_priority_list()
+        self.assertEqual(priority_list.get_action(self.state, 1), 'sinister_strike')
+        self.assertEqual(priority_list.get_action(self.state, 5), None)
+        self.assertEqual(self.calculator.get_crossing_times('buff.insight.stack', 2, self.state, 1), (5,))
+
+    def test_fight(self):
+        self.calculator.ability_constructors = dict(self.calculator.ability_constructors, insight_buff=InsightEvent)
+        self.calculator.tracer = tracing.Tracer(tracing.EVENTS)
+        events = timeline.Timeline([(0.0, 'mh_autoattack'), (1.0, 'insight_buff'), (3.0, 'insight_buff')])
+        self.calculator.run_timeline(events, {})
+        expirations = [record.time for record in self.calculator.tracer.buffer.get_records(tracing.EVENTS)
+                       if record.name == 'insight_expires']
+        self.assertEqual(expirations, [8.0])
+        self.assertFalse('insight' in self.state.auras)
+
+    def test_batch(self):
+        serial = make_calculators()
+        for calculator in serial:
+            calculator.__class__ = AuraCalculator
+        expected = [calculator.get_dps_breakdown() for calculator in serial]
+        for use_numpy in set([False, batch.numpy is not None]):
+            batched = make_calculators()
+            for calculator in batched:
+                calculator.__class__ = AuraCalculator
+            simulation = batch.BatchSimulation(batched, use_numpy=use_numpy, lockstep=True)
+            self.assertEqual(simulation.get_dps_breakdowns(), expected)
+            self.assertEqual([calculator.state.snapshot() for calculator in batched],
+                             [calculator.state.snapshot() for calculator in serial])
+            self.assertFalse('insight' in batched[0].state.auras)
@@ -0,0 +1,68 @@
+import random
+import unittest
+from shadowcraft.calcs.darkmantle import batch
+from shadowcraft.core import exceptions
+from shadowcraft.objects.priority_list import PriorityList
+from calcs_tests.darkmantle_tests import make_calculators
+
+class TestBatchSimulation(unittest.TestCase):
+    def assertMatchesSerial(self, **kwargs):
+        serial = make_calculators(**kwargs)
+        expected = [calculator.get_dps_breakdown() for calculator in serial]
+        # the Vector fallback always runs, NumPy when it's installed
+        for use_numpy in set([False, batch.numpy is not None]):
+            batched = make_calculators(**kwargs)
+            simulation = batch.BatchSimulation(batched, use_numpy=use_numpy, lockstep=True)
+            self.assertEqual(simulation.get_dps_breakdowns(), expected)
+            self.assertEqual([calculator.fight_length for calculator in batched],
+                             [calculator.fight_length for calculator in serial])
+            self.assertEqual([calculator.state.snapshot() for calculator in batched],
+                             [calculator.state.snapshot() for calculator in serial])
+
+    def test_time_limit(self):
+        self.assertMatchesSerial()
+
+    def test_health_limit(self):
+        # Actors with more agility finish first and are masked out.
+        self.assertMatchesSerial(style='health', limits=(20000, 50000))
+
+    def test_split(self):
+        self.assertMatchesSerial(loose_key=True)
+
+    def test_vector(self):
+        vector = batch.Vector([1, 2.5, 3])
+        self.assertEqual((2 * vector - 1).values, (1, 4., 5))
+        self.assertEqual((vector / batch.Vector([2., 5, 3])).values, (.5, .5, 1))
+        self.assertEqual((vector >= 2.5).values, (False, True, True))
+        self.assertEqual(batch.select(vector, [False, True, False]), 2.5)
+        self.assertEqual(batch.select(vector, [True, False, True]).values, (1, 3))
+        self.assertEqual(batch.collapse([{'a': 1, 'b': 2}, {'a': 1, 'b': 3}], batch.Vector)['a'], 1)
+        self.assertRaises(ValueError, bool, vector > 0)
+
+    def test_serial(self):
+        calculators = make_calculators()
+        expected = [calculator.get_dps_breakdown() for calculator in make_calculators()]
+        simulation = batch.BatchSimulation(calculators, use_numpy=False)
+        self.assertEqual(simulation.get_dps_breakdowns(), expected)
+        simulation = batch.BatchSimulation(make_calculators(), use_numpy=False)
+        self.assertEqual(simulation.get_dps(), [sum(breakdown.values()) for breakdown in expected])
+
+    def test_rng(self):
+        calculators = make_calculators()
+        calculators[1].rng = random.Random(1)
+        self.assertRaises(exceptions.InvalidInputException, batch.BatchSimulation(calculators).get_dps_breakdowns)
+
+    def test_default_lockstep(self):
+        # Priority lists run on their own by default, autoattacks in lockstep
+        # when NumPy is installed.
+        calculators = make_calculators()
+        self.assertFalse(batch.BatchSimulation(calculators).lockstep)
+        for calculator in calculators:
+            calculator.settings.cycle.priority_list = PriorityList()
+        self.assertEqual(batch.BatchSimulation(calculators).lockstep, batch.numpy is not None)
+
+    @unittest.skipIf(batch.numpy is not None, 'NumPy is installed')
+    def test_without_numpy(self):
+        self.assertFalse(batch.BatchSimulation(make_calculators()).use_numpy)
+        self.assertFalse(batch.BatchSimulation(make_calculators()).lockstep)
+        self.assertRaises(ImportError, batch.BatchSimulation, [], use_numpy=True)
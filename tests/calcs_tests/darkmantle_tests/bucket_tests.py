@@ -0,0 +1,97 @@
+import unittest
+from shadowcraft.calcs.darkmantle import buckets
+from shadowcraft.calcs.darkmantle import monte_carlo
+from shadowcraft.calcs.darkmantle import tracing
+from shadowcraft.core import exceptions
+from shadowcraft.objects.priority_list import PriorityList
+from calcs_tests.darkmantle_tests import make_calculator
+from calcs_tests.parallel_tests import InProcessExecutor
+
+def run_buckets(calculator, width):
+    received = []
+    sink = buckets.BucketSink(width, received.append)
+    calculator.tracer = tracing.Tracer(tracing.EVENTS, [sink])
+    breakdown = calculator.get_dps_breakdown()
+    sink.finish(calculator.fight_length)
+    return breakdown, received
+
+class TestBucketSink(unittest.TestCase):
+    def test_time_limit(self):
+        breakdown, received = run_buckets(make_calculator(limit=10), 3)
+        self.assertEqual([bucket.index for bucket in received], [0, 1, 2, 3])
+        self.assertEqual([bucket.duration for bucket in received], [3, 3, 3, 1])
+        for ability, damage in breakdown.items():
+            self.assertAlmostEqual(sum(bucket.damage.get(ability, 0) for bucket in received), damage, 6)
+        self.assertEqual(set(received[0].resources), set(['current_power', 'current_second_power', 'anticipation']))
+        self.assertTrue('attack_power_buff' in received[-1].auras)
+
+    def test_streaming(self):
+        # Buckets are handed over as the fight moves past them.
+        calculator = make_calculator(limit=30, priority_list=PriorityList())
+        received = []
+        sink = buckets.BucketSink(5, lambda bucket: received.append((bucket.index, calculator.fight_length)))
+        calculator.tracer = tracing.Tracer(tracing.EVENTS, [sink])
+        calculator.get_dps_breakdown()
+        self.assertEqual([index for index, time in received], range(5))
+        for index, time in received:
+            self.assertTrue((index + 1) * 5 <= time < (index + 1) * 5 + 2.6)
+        sink.finish(calculator.fight_length)
+        self.assertEqual(sink.bucket, None)
+
+    def test_empty_buckets(self):
+        # Buckets without events carry the resources over.
+        breakdown, received = run_buckets(make_calculator(limit=6, priority_list=PriorityList()), 1)
+        self.assertEqual(len(received), 6)
+        self.assertEqual(received[1].damage, {})
+        self.assertEqual(received[1].resources, received[0].resources)
+
+    def test_health_limit(self):
+        calculator = make_calculator(style='health', limit=20000)
+        breakdown, received = run_buckets(calculator, 2)
+        self.assertEqual(received[-1].start + received[-1].duration, calculator.fight_length)
+        self.assertAlmostEqual(sum(sum(bucket.damage.values()) for bucket in received), sum(breakdown.values()), 6)
+
+class TestBucketStatistics(unittest.TestCase):
+    def make_bucket(self, index, damage, auras=()):
+        bucket = buckets.Bucket(index, 2, {'current_power': 50}, auras)
+        bucket.damage = damage
+        return bucket
+
+    def test_add_and_merge(self):
+        fights = [
+            [self.make_bucket(0, {'a': 10.}), self.make_bucket(1, {'a': 4., 'b': 2.}, ('flurry',))],
+            [self.make_bucket(0, {'b': 6.}, ('flurry',))],
+            [self.make_bucket(0, {'a': 2.}), self.make_bucket(1, {})],
+        ]
+        statistics = buckets.BucketStatistics(2)
+        parts = []
+        for fight in fights:
+            part = buckets.BucketStatistics(2)
+            for bucket in fight:
+                statistics.add(bucket)
+                part.add(bucket)
+            parts.append(part)
+        merged = buckets.BucketStatistics(2)
+        for part in parts:
+            merged.merge(part)
+        for results in (statistics.get_results(), merged.get_results()):
+            self.assertEqual([result['fights'] for result in results], [3, 2])
+            self.assertAlmostEqual(results[0]['dps'], 3, 10)
+            self.assertAlmostEqual(results[0]['breakdown']['a'], 2, 10)
+            self.assertAlmostEqual(results[0]['breakdown']['b'], 1, 10)
+            self.assertAlmostEqual(results[0]['uptimes']['flurry'], 1. / 3, 10)
+            self.assertAlmostEqual(results[1]['breakdown']['b'], .5, 10)
+            self.assertAlmostEqual(results[1]['resources']['current_power'], 50, 10)
+        self.assertAlmostEqual(merged.ability_dps[0]['a'].get_variance(), statistics.ability_dps[0]['a'].get_variance(), 10)
+
+    def test_monte_carlo(self):
+        calculator = make_calculator(limit=20)
+        calculator.rng = None
+        result = monte_carlo.run(calculator, iterations=6, batch_size=2, bucket_width=5)
+        self.assertEqual(len(result['buckets']), 4)
+        self.assertAlmostEqual(sum(bucket['dps'] for bucket in result['buckets']) / 4, result['dps'], 6)
+        self.assertEqual(result['buckets'][0]['fights'], 6)
+        parallel = monte_carlo.run(calculator, iterations=6, batch_size=2, bucket_width=5, executor=InProcessExecutor())
+        self.assertEqual(parallel['buckets'], result['buckets'])
+        self.assertTrue(calculator.tracer is tracing.null_tracer)
+        self.assertRaises(exceptions.InvalidInputException, monte_carlo.run, calculator, bucket_width=0)
@@ -0,0 +1,91 @@
+import math
+import random
+import unittest
+from shadowcraft.calcs.darkmantle import monte_carlo
+from shadowcraft.core import exceptions
+from calcs_tests.darkmantle_tests import make_calculator
+from calcs_tests.parallel_tests import InProcessExecutor
+
+class TestRunningStatistics(unittest.TestCase):
+    def test_add_and_merge(self):
+        rng = random.Random(1)
+        values = [rng.uniform(0, 20) for i in xrange(100)]
+        statistics = monte_carlo.RunningStatistics()
+        for value in values:
+            statistics.add(value)
+        mean = sum(values) / len(values)
+        variance = sum((value - mean) ** 2 for value in values) / (len(values) - 1)
+        self.assertEqual(statistics.count, 100)
+        self.assertAlmostEqual(statistics.mean, mean, 10)
+        self.assertAlmostEqual(statistics.get_variance(), variance, 10)
+        self.assertAlmostEqual(statistics.get_standard_error(), math.sqrt(variance / 100), 10)
+        merged = monte_carlo.RunningStatistics()
+        for start in (0, 30, 60, 90):
+            part = monte_carlo.RunningStatistics()
+            for value in values[start:start + 30]:
+                part.add(value)
+            merged.merge(part)
+        self.assertEqual(merged.count, 100)
+        self.assertAlmostEqual(merged.mean, mean, 10)
+        self.assertAlmostEqual(merged.get_variance(), variance, 10)
+
+    def test_empty(self):
+        statistics = monte_carlo.RunningStatistics()
+        self.assertEqual((statistics.count, statistics.get_variance(), statistics.get_standard_error()), (0, 0., 0.))
+
+class TestMonteCarlo(unittest.TestCase):
+    def test_identical_iterations(self):
+        # When crits don't change the damage all iterations are the same pass.
+        breakdown = make_calculator(limit=60).get_dps_breakdown()
+        calculator = make_calculator(limit=60)
+        calculator.crit_damage_multiplier = 1.
+        result = monte_carlo.run(calculator, iterations=20, batch_size=5, target_error=.01, min_iterations=10)
+        self.assertEqual(result['iterations'], 10)
+        self.assertTrue(result['converged'])
+        self.assertEqual(result['standard_error'], 0)
+        self.assertAlmostEqual(result['dps'], sum(breakdown.values()) / 60, 8)
+        self.assertAlmostEqual(result['breakdown']['mh_autoattack'], breakdown['mh_autoattack'] / 60, 8)
+
+    def test_crit_rolls(self):
+        base_dps = sum(make_calculator(limit=60).get_dps_breakdown().values()) / 60
+        calculator = make_calculator(limit=60)
+        snapshot = calculator.state.snapshot()
+        crit_rate = calculator.calculate_crit_rate()
+        result = monte_carlo.run(calculator, iterations=200, seed=3, batch_size=50)
+        self.assertEqual(result['iterations'], 200)
+        self.assertFalse(result['converged'])
+        self.assertTrue(result['standard_error'] > 0)
+        self.assertTrue(abs(result['dps'] - base_dps * (1 + crit_rate)) < 4 * result['standard_error'])
+        self.assertAlmostEqual(sum(result['breakdown'].values()), result['dps'], 8)
+        # The calculator is left as it was.
+        self.assertTrue(calculator.rng is None)
+        self.assertEqual(calculator.state.snapshot(), snapshot)
+        self.assertEqual(sum(calculator.get_dps_breakdown().values()) / 60, base_dps)
+
+    def test_seeds(self):
+        calculator = make_calculator(limit=30)
+        result = monte_carlo.run(calculator, iterations=40, seed=7, batch_size=8)
+        self.assertEqual(result, monte_carlo.run(calculator, iterations=40, seed=7, batch_size=8))
+        self.assertNotEqual(result['dps'], monte_carlo.run(calculator, iterations=40, seed=8, batch_size=8)['dps'])
+        self.assertNotEqual(monte_carlo.get_iteration_seed(0, 1), monte_carlo.get_iteration_seed(1, 0))
+
+    def test_executor(self):
+        calculator = make_calculator(limit=30)
+        serial = monte_carlo.run(calculator, iterations=40, seed=5, batch_size=8)
+        for parallel_batches in (1, 3):
+            parallel = monte_carlo.run(calculator, iterations=40, seed=5, batch_size=8, executor=InProcessExecutor(),
+                                       parallel_batches=parallel_batches)
+            self.assertEqual(parallel, serial)
+
+    def test_early_stop(self):
+        calculator = make_calculator(limit=30)
+        result = monte_carlo.run(calculator, iterations=10000, seed=1, target_error=.005, batch_size=50)
+        self.assertTrue(result['converged'])
+        self.assertTrue(result['iterations'] < 10000)
+        self.assertTrue(result['standard_error'] <= .005 * result['dps'])
+
+    def test_validation(self):
+        calculator = make_calculator(limit=30)
+        self.assertRaises(exceptions.InvalidInputException, monte_carlo.run, calculator, iterations=0)
+        self.assertRaises(exceptions.InvalidInputException, monte_carlo.run, calculator, target_error=0)
+        self.assertRaises(exceptions.InvalidInputException, monte_carlo.run, calculator, seed=-1)
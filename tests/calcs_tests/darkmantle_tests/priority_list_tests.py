@@ -0,0 +1,113 @@
+import cPickle
+import unittest
+from shadowcraft.calcs.darkmantle import InputNotModeledException
+from shadowcraft.calcs.darkmantle import settings
+from shadowcraft.objects.priority_list import InvalidPriorityListException
+from shadowcraft.objects.priority_list import PriorityList
+from calcs_tests.darkmantle_tests import make_calculator
+
+class TestRoguePriorityList(unittest.TestCase):
+    def setUp(self):
+        self.calculator = make_calculator()
+        self.state = self.calculator.state
+
+    def test_default_combat(self):
+        self.assertEqual(self.calculator.combat_priority_list(0), 'sinister_strike')
+        self.state.current_second_power = 5
+        self.assertEqual(self.calculator.combat_priority_list(0), 'eviscerate')
+        self.state.current_power = 20
+        self.assertEqual(self.calculator.combat_priority_list(0), 'wait')
+        # compiled once
+        self.assertTrue(self.calculator.get_priority_list() is self.calculator.get_priority_list())
+
+    def test_ready_time(self):
+        self.state.current_power = 10
+        self.state.power_time = 5
+        regen = self.calculator.get_power_regen(self.state)
+        self.assertTrue(regen > 12)
+        self.assertAlmostEqual(self.calculator.get_ready_time('sinister_strike', self.state, 5), 5 + 40 / regen, 10)
+        self.assertFalse(self.calculator.can_cast_ability('sinister_strike', 5))
+        self.state.cooldowns['sinister_strike'] = 100
+        self.assertEqual(self.calculator.get_ready_time('sinister_strike', self.state, 5), 100)
+        self.assertTrue(self.calculator.can_cast_ability('mh_autoattack', 5))
+
+    def get_action(self, time, power):
+        # the energy is power at time
+        self.state.current_power = power
+        self.state.power_time = time
+        return self.calculator.combat_priority_list(time)
+
+    def test_variables(self):
+        self.state.cooldowns['killing_spree'] = 10
+        self.state.auras['slice_and_dice'] = 12
+        self.calculator.settings.cycle = settings.CombatCycle(PriorityList(
+            'eviscerate,if=buff.slice_and_dice.remains>5&buff.stat_multiplier_buff.up&buff.recuperate.down',
+            'sinister_strike,if=cooldown.killing_spree.remains<3&energy.deficit>=80',
+            'instant_poison,if=action.sinister_strike.ready_in<1&!cooldown.killing_spree.up'))
+        self.assertEqual(self.get_action(6, 40), 'eviscerate')
+        self.assertEqual(self.get_action(7.5, 40), 'instant_poison')
+        self.state.max_power = 130
+        self.assertEqual(self.get_action(7.5, 50), 'sinister_strike')
+        self.assertEqual(self.get_action(7.5, 0), 'wait')
+
+    def test_regen(self):
+        self.state.current_power = 0
+        regen = self.calculator.get_power_regen(self.state)
+        self.assertEqual(self.calculator.combat_priority_list(1), 'wait')
+        self.assertEqual((self.state.current_power, self.state.power_time), (regen, 1))
+        self.assertEqual(self.calculator.combat_priority_list(100), 'sinister_strike')
+        self.assertEqual(self.state.current_power, self.state.max_power)
+
+    def test_errors(self):
+        self.calculator.settings.cycle = settings.CombatCycle(PriorityList('shadowstep'))
+        self.assertRaises(InputNotModeledException, self.calculator.get_priority_list)
+        self.calculator.settings.cycle = settings.CombatCycle(PriorityList('eviscerate,if=focus>5'))
+        self.assertRaises(InvalidPriorityListException, self.calculator.get_priority_list)
+        self.calculator.settings.cycle = settings.AssassinationCycle()
+        self.assertRaises(InputNotModeledException, self.calculator.get_priority_list)
+
+    def test_pickle(self):
+        self.calculator.get_priority_list()
+        calculator = cPickle.loads(cPickle.dumps(self.calculator, cPickle.HIGHEST_PROTOCOL))
+        self.assertEqual(calculator.combat_priority_list(0), 'sinister_strike')
+
+class TestWakeUps(unittest.TestCase):
+    def run_decisions(self, calculator):
+        decisions = []
+        decide = calculator.decide
+        def record(state, time):
+            event = decide(state, time)
+            decisions.append((time, state.current_power, event))
+            return event
+        calculator.decide = record
+        breakdown = calculator.get_dps_breakdown()
+        return breakdown, decisions
+
+    def test_no_idle_wake_ups(self):
+        calculator = make_calculator(limit=300)
+        breakdown, decisions = self.run_decisions(calculator)
+        casts = [event for time, power, event in decisions if event is not None and event[1] != 'priority_queue']
+        self.assertTrue(len(casts) > 50)
+        self.assertTrue(len(decisions) <= 2 * len(casts) + 1)
+        # every wake-up finds an action ready
+        for (time, power, event), (next_time, next_power, next_event) in zip(decisions, decisions[1:]):
+            if event[1] == 'priority_queue':
+                self.assertEqual(next_time, event[0])
+                self.assertNotEqual(next_event[1], 'priority_queue')
+
+    def test_thresholds(self):
+        calculator = make_calculator(limit=60, priority_list=PriorityList('sinister_strike,if=energy>=90'))
+        breakdown, decisions = self.run_decisions(calculator)
+        wake_ups = [event[0] for time, power, event in decisions if event[1] == 'priority_queue']
+        casts = [(time, power) for time, power, event in decisions if event[1] == 'sinister_strike']
+        self.assertTrue(len(casts) > 10)
+        # one wake-up after each cast, at the time the energy gets to 90
+        self.assertEqual(len(wake_ups), len(casts))
+        for (time, power), wake_up in zip(casts[1:], wake_ups):
+            self.assertEqual(time, wake_up)
+            self.assertTrue(90 <= power < 90 + 1e-9)
+
+    def test_no_actions(self):
+        calculator = make_calculator(limit=60, priority_list=PriorityList('sinister_strike,if=combo_points>5'))
+        breakdown, decisions = self.run_decisions(calculator)
+        self.assertEqual(decisions, [(0, 100, None)])
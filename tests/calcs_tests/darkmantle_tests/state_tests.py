@@ -0,0 +1,56 @@
+import cPickle
+import pickle
+import unittest
+from shadowcraft.calcs.darkmantle import state
+from shadowcraft.calcs.darkmantle.rogue import RogueSimulationState
+from calcs_tests.darkmantle_tests import make_calculator
+
+class TestSimulationState(unittest.TestCase):
+    def setUp(self):
+        self.state = state.SimulationState()
+        self.state.current_power = 100
+        self.state.cooldowns['killing_spree'] = 120.
+        self.state.auras['slice_and_dice'] = 30.
+
+    def test_fields(self):
+        self.assertEqual(RogueSimulationState.fields[:len(state.SimulationState.fields)], state.SimulationState.fields)
+        self.assertTrue('anticipation' in RogueSimulationState.fields)
+        self.assertRaises(AttributeError, setattr, self.state, 'current_energy', 100)
+        self.assertRaises(AttributeError, setattr, self.state, 'anticipation', 1)
+        self.assertFalse(hasattr(self.state, '__dict__'))
+
+    def test_snapshot_restore(self):
+        snapshot = self.state.snapshot()
+        for i in xrange(2):
+            self.state.current_power -= 35
+            self.state.cooldowns['killing_spree'] = 0
+            self.state.auras['blade_flurry'] = float('inf')
+            self.state.restore(snapshot)
+            self.assertEqual(self.state.current_power, 100)
+            self.assertEqual(self.state.cooldowns, {'killing_spree': 120.})
+            self.assertEqual(self.state.auras, {'slice_and_dice': 30.})
+
+    def test_copy(self):
+        copy = self.state.copy()
+        copy.auras['blade_flurry'] = float('inf')
+        copy.current_power = 0
+        self.assertEqual(self.state.auras, {'slice_and_dice': 30.})
+        self.assertEqual(self.state.current_power, 100)
+        self.assertEqual(copy.cooldowns, self.state.cooldowns)
+
+    def test_pickle(self):
+        rogue_state = RogueSimulationState()
+        rogue_state.anticipation = 3
+        for module in (pickle, cPickle):
+            for protocol in xrange(cPickle.HIGHEST_PROTOCOL + 1):
+                loaded = module.loads(module.dumps(rogue_state, protocol))
+                self.assertTrue(type(loaded) is RogueSimulationState)
+                self.assertEqual(loaded.snapshot(), rogue_state.snapshot())
+
+    def test_calculator_state(self):
+        calculator = make_calculator()
+        self.assertTrue(type(calculator.state) is RogueSimulationState)
+        self.assertEqual(calculator.state.current_power, calculator.state.max_power)
+        self.assertEqual(calculator.state.anticipation_max, 5)
+        self.assertEqual(sorted(calculator.state.auras), sorted(calculator.buffs.buffs_debuffs))
+        self.assertEqual(set(calculator.get_resources()), set(calculator.resource_names))
@@ -0,0 +1,116 @@
+import sys
+import unittest
+from shadowcraft.calcs.darkmantle import timeline
+from shadowcraft.calcs.darkmantle import tracing
+from shadowcraft.calcs.darkmantle.generic_event import GenericEvent
+from shadowcraft.objects import priority_list as apl
+from calcs_tests.darkmantle_tests import make_calculator
+
+class HasteEvent(GenericEvent):
+    _name = 'haste_buff'
+
+    def calculate_breakdown(self):
+        self.engine.set_haste_multiplier(self.state, self.timeline, self.time, 1.5)
+        return self.breakdown
+
+class TestTimeline(unittest.TestCase):
+    def test_order(self):
+        events = timeline.Timeline([(2.0, 'b'), (1.0, 'a')])
+        events.append((2.0, 'a'))
+        events.append((0.5, 'c'))
+        self.assertEqual(len(events), 4)
+        self.assertEqual(events.peek(), (0.5, 'c'))
+        self.assertEqual(list(events), [(0.5, 'c'), (1.0, 'a'), (2.0, 'b'), (2.0, 'a')])
+        self.assertEqual([events.pop() for i in xrange(4)], [(0.5, 'c'), (1.0, 'a'), (2.0, 'b'), (2.0, 'a')])
+        self.assertFalse(events)
+
+    def test_cancel(self):
+        events = timeline.Timeline([(1.0, 'a'), (2.0, 'b'), (2.0, 'b'), (3.0, 'c')])
+        events.cancel((2.0, 'b'))
+        self.assertEqual(len(events), 3)
+        self.assertEqual(list(events), [(1.0, 'a'), (2.0, 'b'), (3.0, 'c')])
+        copy = events.copy()
+        events.cancel((1.0, 'a'))
+        self.assertEqual(events.peek(), (2.0, 'b'))
+        self.assertEqual([events.pop() for i in xrange(2)], [(2.0, 'b'), (3.0, 'c')])
+        self.assertFalse(events)
+        self.assertEqual([copy.pop() for i in xrange(3)], [(1.0, 'a'), (2.0, 'b'), (3.0, 'c')])
+
+    def test_reschedule(self):
+        events = timeline.Timeline([(1.0, 'a'), (2.0, 'b')])
+        handle = events.reschedule((2.0, 'b'), 0.5)
+        self.assertEqual(handle, (0.5, 'b'))
+        self.assertEqual(events.reschedule(handle, 0.5), handle)
+        self.assertEqual(events.reschedule((1.0, 'a'), 4.0), (4.0, 'a'))
+        self.assertEqual(len(events), 2)
+        self.assertEqual(list(events), [(0.5, 'b'), (4.0, 'a')])
+        self.assertEqual([events.pop() for i in xrange(2)], [(0.5, 'b'), (4.0, 'a')])
+
+    def test_compact(self):
+        # Cancelled entries don't pile up.
+        events = timeline.Timeline([(0.0, 'swing'), (1.0, 'a'), (2.0, 'b')])
+        handle = (0.0, 'swing')
+        for i in xrange(1, 1000):
+            handle = events.reschedule(handle, i * .001)
+        self.assertTrue(len(events.queue) <= 2 * len(events) + 1)
+        self.assertEqual(list(events), [(.999, 'swing'), (1.0, 'a'), (2.0, 'b')])
+        self.assertEqual(events.cancelled_count, len(events.queue) - 3)
+
+class TestRunTimeline(unittest.TestCase):
+    def test_long_fight(self):
+        # Far more events than the recursion limit.
+        calculator = make_calculator(limit=3600, priority_list=apl.PriorityList())
+        breakdown = calculator.get_dps_breakdown()
+        swings = int(3600 / 2.6) + 1
+        self.assertTrue(swings > sys.getrecursionlimit())
+        self.assertAlmostEqual(breakdown['mh_autoattack'], 2 * breakdown['oh_autoattack'], 6)
+        mh_attack = calculator.get_next_attack('mh_autoattack')(calculator, {}, 0, None, 0, calculator.state)
+        self.assertAlmostEqual(breakdown['mh_autoattack'], swings * mh_attack.calculate_damage(), 4)
+
+    def test_time_order(self):
+        # With different weapon speeds the swings interleave by time.
+        calculator = make_calculator(limit=10, oh_speed=1.3, priority_list=apl.PriorityList())
+        calculator.tracer = tracing.Tracer(tracing.EVENTS)
+        calculator.get_dps_breakdown()
+        swings = [record.name[:2] for record in calculator.tracer.buffer.get_records(tracing.EVENTS)
+                  if record.level == tracing.EVENTS]
+        self.assertEqual(swings, ['mh', 'oh', 'oh', 'mh', 'oh', 'oh', 'mh', 'oh', 'oh', 'mh', 'oh', 'oh'])
+
+    def test_haste(self):
+        # The swing in flight when the haste buff comes finishes at the new
+        # speed, and so do the swings after it.
+        calculator = make_calculator(limit=10, priority_list=apl.PriorityList())
+        calculator.ability_constructors = dict(calculator.ability_constructors, haste_buff=HasteEvent)
+        calculator.tracer = tracing.Tracer(tracing.EVENTS)
+        events = timeline.Timeline([(0.0, 'mh_autoattack'), (0.01, 'oh_autoattack'), (5.0, 'haste_buff')])
+        calculator.run_timeline(events, {})
+        swings = [record.time for record in calculator.tracer.buffer.get_records(tracing.EVENTS)
+                  if record.name == 'mh_autoattack']
+        expected = [0.0, 2.6, 5.0 + .2 / 1.5]
+        expected += [expected[-1] + 2.6 / 1.5, expected[-1] + 2 * 2.6 / 1.5]
+        self.assertEqual(len(swings), len(expected))
+        for swing, expected_swing in zip(swings, expected):
+            self.assertAlmostEqual(swing, expected_swing, 10)
+        self.assertAlmostEqual(calculator.state.swing_times['mh_autoattack'], 5.0 + .2 / 1.5 + 3 * 2.6 / 1.5, 10)
+
+    def test_haste_wake_up(self):
+        # Faster regeneration brings the pending wake-up forward.
+        calculator = make_calculator()
+        state = calculator.state
+        state.current_power = 0
+        events = timeline.Timeline([calculator.decide(state, 0)])
+        wake_up_time = state.wake_up_time
+        self.assertEqual(events.peek(), (wake_up_time, 'priority_queue'))
+        regen = calculator.get_power_regen(state)
+        calculator.set_haste_multiplier(state, events, 1, 1.5)
+        self.assertEqual((state.current_power, state.power_time), (regen, 1))
+        self.assertEqual(list(events), [(1, 'priority_queue')])
+        self.assertTrue(calculator.decide(state, 1)[0] < wake_up_time)
+
+    def test_health_limit(self):
+        calculator = make_calculator(style='health', limit=100000, priority_list=apl.PriorityList())
+        breakdown = calculator.get_dps_breakdown()
+        total = sum(breakdown.values())
+        mh_attack = calculator.get_next_attack('mh_autoattack')(calculator, {}, 0, None, 0, calculator.state)
+        # The last swing is the one that reached the limit.
+        self.assertTrue(100000 <= total < 100000 + mh_attack.calculate_damage())
@@ -0,0 +1,61 @@
+import StringIO
+import sys
+import unittest
+from shadowcraft.calcs.darkmantle import tracing
+from shadowcraft.objects.priority_list import PriorityList
+from calcs_tests.darkmantle_tests import make_calculator
+
+class TestTracing(unittest.TestCase):
+    def test_disabled(self):
+        calculator = make_calculator(limit=30)
+        self.assertTrue(calculator.tracer is tracing.null_tracer)
+        stdout = sys.stdout
+        sys.stdout = StringIO.StringIO()
+        try:
+            breakdown = calculator.get_dps_breakdown()
+            self.assertEqual(sys.stdout.getvalue(), '')
+        finally:
+            sys.stdout = stdout
+        calculator = make_calculator(limit=30)
+        calculator.tracer = tracing.Tracer(tracing.EVENTS)
+        self.assertEqual(calculator.get_dps_breakdown(), breakdown)
+
+    def test_records(self):
+        calculator = make_calculator(limit=10, priority_list=PriorityList())
+        calculator.tracer = tracing.Tracer(tracing.EVENTS)
+        breakdown = calculator.get_dps_breakdown()
+        records = calculator.tracer.buffer.get_records()
+        self.assertEqual([record.name for record in records[:3]], ['start', 'mh_autoattack', 'oh_autoattack'])
+        self.assertEqual(records[-1].name, 'end')
+        self.assertEqual(records[-1].time, 10.4)
+        events = [record for record in records if record.level == tracing.EVENTS]
+        self.assertEqual([record.time for record in events[:3]], [0, 0.01, 2.6])
+        self.assertAlmostEqual(sum(record.damage for record in events), sum(breakdown.values()), 6)
+        self.assertEqual(events[0].resources, {'current_power': 100, 'current_second_power': 0, 'anticipation': 0})
+        self.assertEqual([aura[0] for aura in events[0].auras], sorted(calculator.buffs.buffs_debuffs))
+        self.assertEqual(calculator.tracer.buffer.get_records(tracing.SUMMARY), [records[0], records[-1]])
+
+    def test_levels(self):
+        calculator = make_calculator(limit=10)
+        calculator.tracer = tracing.Tracer(tracing.SUMMARY)
+        calculator.get_dps_breakdown()
+        self.assertEqual([record.name for record in calculator.tracer.buffer.get_records()], ['start', 'end'])
+
+    def test_ring_buffer(self):
+        calculator = make_calculator(limit=600)
+        calculator.tracer = tracing.Tracer(tracing.EVENTS, capacity=5)
+        calculator.get_dps_breakdown()
+        records = calculator.tracer.buffer.get_records()
+        self.assertEqual(len(records), 5)
+        self.assertEqual(records[-1].name, 'end')
+
+    def test_sinks(self):
+        stream = StringIO.StringIO()
+        buffer = tracing.RingBuffer()
+        calculator = make_calculator(limit=3)
+        calculator.tracer = tracing.Tracer(tracing.EVENTS, [tracing.StreamSink(stream), buffer])
+        calculator.get_dps_breakdown()
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(len(lines), len(buffer))
+        self.assertEqual(lines, [tracing.format_record(record) for record in buffer.get_records()])
+        self.assertEqual(lines[1].split()[:3], ['0.000', 'mh_autoattack', 'damage={0:.1f}'.format(buffer.get_records()[1].damage)])
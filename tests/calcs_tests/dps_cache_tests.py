@@ -0,0 +1,104 @@
+import cPickle
+import unittest
+from shadowcraft.calcs import dps_cache
+from shadowcraft.calcs.rogue.Aldriana import AldrianasRogueDamageCalculator
+from shadowcraft.calcs.rogue.Aldriana import settings
+from shadowcraft.objects import buffs
+from shadowcraft.objects import race
+from shadowcraft.objects import stats
+from shadowcraft.objects import procs
+from shadowcraft.objects import talents
+from shadowcraft.objects import glyphs
+
+def make_calculator(agi=3650, talent_string='3111121', item_level=691):
+    test_buffs = buffs.Buffs('stat_multiplier_buff', 'crit_chance_buff', 'mastery_buff', 'haste_buff', 'attack_power_buff')
+    test_mh = stats.Weapon(410., 2.6, 'sword', 'dancing_steel')
+    test_oh = stats.Weapon(410., 2.6, 'sword', 'dancing_steel')
+    test_procs = procs.ProcsList(('scales_of_doom', item_level), 'draenic_agi_pot')
+    test_gear_buffs = stats.GearBuffs('gear_specialization')
+    test_stats = stats.Stats(test_mh, test_oh, test_procs, test_gear_buffs, agi=agi, stam=2426, crit=1039, haste=1100,
+                             mastery=1015, readiness=0, versatility=122, multistrike=1034)
+    test_talents = talents.Talents(talent_string, 'rogue', 100)
+    test_glyphs = glyphs.Glyphs('rogue', 'energy', 'disappearance')
+    test_cycle = settings.CombatCycle(revealing_strike_pooling=True, blade_flurry=False)
+    test_settings = settings.Settings(test_cycle, response_time=.5, duration=360, dmg_poison='dp', utl_poison='lp')
+    return AldrianasRogueDamageCalculator(test_stats, test_talents, test_glyphs, test_buffs, race.Race('troll'), test_settings, 100)
+
+class TestDpsCache(unittest.TestCase):
+    def test_hits_and_misses(self):
+        cache = dps_cache.DpsCache()
+        self.assertEqual(cache.get('a', lambda: 1), 1)
+        self.assertEqual(cache.get('a', lambda: 2), 1)
+        self.assertEqual(cache.get('b', lambda: 3), 3)
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+        cache.clear()
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (0, 0, 0))
+
+    def test_least_recently_used_eviction(self):
+        cache = dps_cache.DpsCache(max_size=2)
+        cache.get('a', lambda: 1)
+        cache.get('b', lambda: 2)
+        cache.get('a', lambda: 1)
+        cache.get('c', lambda: 3)
+        self.assertTrue('a' in cache)
+        self.assertFalse('b' in cache)
+        self.assertTrue('c' in cache)
+        self.assertEqual(len(cache), 2)
+
+    def test_zero_size(self):
+        cache = dps_cache.DpsCache(max_size=0)
+        self.assertEqual(cache.get('a', lambda: 1), 1)
+        self.assertEqual(len(cache), 0)
+
+class TestFingerprint(unittest.TestCase):
+    def test_same_inputs(self):
+        self.assertEqual(make_calculator().get_fingerprint(), make_calculator().get_fingerprint())
+
+    def test_different_inputs(self):
+        fingerprint = make_calculator().get_fingerprint()
+        self.assertNotEqual(fingerprint, make_calculator(agi=3651).get_fingerprint())
+        self.assertNotEqual(fingerprint, make_calculator(talent_string='3111122').get_fingerprint())
+        self.assertNotEqual(fingerprint, make_calculator(item_level=700).get_fingerprint())
+        calculator = make_calculator()
+        calculator.stats.oh.set_enchant(None)
+        self.assertNotEqual(fingerprint, calculator.get_fingerprint())
+        calculator = make_calculator()
+        calculator.settings.cycle.blade_flurry = True
+        self.assertNotEqual(fingerprint, calculator.get_fingerprint())
+
+    def test_equal_numbers(self):
+        # A stat taken up by 1. and back down is a float equal to the int.
+        calculator = make_calculator()
+        fingerprint = calculator.get_fingerprint()
+        calculator.stats.agi += 1.
+        calculator.stats.agi -= 1.
+        self.assertTrue(type(calculator.stats.agi) is float)
+        self.assertEqual(calculator.get_fingerprint(), fingerprint)
+        calculator.dps_cache = dps_cache.DpsCache()
+        calculator.get_dps()
+        calculator.ep_helper('agi')
+        self.assertEqual(calculator.get_dps(), make_calculator().get_dps())
+        self.assertEqual((calculator.dps_cache.hits, calculator.dps_cache.misses), (1, 2))
+
+    def test_cached_dps(self):
+        dps = make_calculator().get_dps()
+        breakdown = make_calculator().get_dps_breakdown()
+        cache = dps_cache.DpsCache()
+        calculator = make_calculator()
+        calculator.dps_cache = cache
+        self.assertEqual(calculator.get_dps(), dps)
+        self.assertEqual(calculator.get_dps(), dps)
+        self.assertEqual(calculator.get_dps_breakdown(), breakdown)
+        calculator.get_dps_breakdown().clear()
+        self.assertEqual(calculator.get_dps_breakdown(), breakdown)
+        other_calculator = make_calculator()
+        other_calculator.dps_cache = cache
+        self.assertEqual(other_calculator.get_dps(), dps)
+        self.assertEqual((cache.hits, cache.misses), (4, 2))
+        calculator.stats.agi += 100
+        self.assertNotEqual(calculator.get_dps(), dps)
+
+    def test_cache_not_pickled(self):
+        calculator = make_calculator()
+        calculator.dps_cache = dps_cache.DpsCache()
+        self.assertTrue(cPickle.loads(cPickle.dumps(calculator, cPickle.HIGHEST_PROTOCOL)).dps_cache is None)
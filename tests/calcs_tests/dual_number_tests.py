@@ -0,0 +1,39 @@
+import math
+import unittest
+from shadowcraft.calcs import dual_number
+
+class TestDualNumber(unittest.TestCase):
+    def setUp(self):
+        self.x = dual_number.DualNumber.variable(3., 0, 2)
+        self.y = dual_number.DualNumber.variable(2., 1, 2)
+
+    def assertDerivatives(self, number, derivatives):
+        self.assertEqual(len(number.derivatives), len(derivatives))
+        for actual, expected in zip(number.derivatives, derivatives):
+            self.assertAlmostEqual(actual, expected)
+
+    def test_variable(self):
+        self.assertEqual(self.x.value, 3.)
+        self.assertEqual(self.x.derivatives, (1., 0.))
+
+    def test_arithmetic(self):
+        self.assertDerivatives(self.x + self.y, (1., 1.))
+        self.assertDerivatives(1 - self.x, (-1., 0.))
+        self.assertDerivatives(self.x * self.y, (2., 3.))
+        self.assertDerivatives(self.x / self.y, (.5, -.75))
+        self.assertDerivatives(1. / self.y, (0., -.25))
+        self.assertDerivatives(self.x ** 2, (6., 0.))
+        self.assertDerivatives(math.e ** self.y, (0., math.e ** 2))
+        self.assertDerivatives(sum([self.x, self.y, 1.]), (1., 1.))
+
+    def test_comparisons(self):
+        self.assertTrue(self.x > self.y)
+        self.assertTrue(self.x > 2)
+        self.assertEqual(min(self.x, 2.5), 2.5)
+        self.assertTrue(max(self.x, 2.5) is self.x)
+        self.assertDerivatives(abs(-self.x), (1., 0.))
+
+    def test_value_of(self):
+        self.assertEqual(dual_number.value_of(self.x), 3.)
+        self.assertEqual(dual_number.value_of(4.), 4.)
+        self.assertEqual(dual_number.derivatives_of(4., 2), (0., 0.))
@@ -0,0 +1,86 @@
+import unittest
+from shadowcraft.calcs import parallel
+from shadowcraft.calcs.rogue.Aldriana import AldrianasRogueDamageCalculator
+from shadowcraft.calcs.rogue.Aldriana import settings
+from shadowcraft.objects import buffs
+from shadowcraft.objects import race
+from shadowcraft.objects import stats
+from shadowcraft.objects import procs
+from shadowcraft.objects import talents
+from shadowcraft.objects import glyphs
+
+class InProcessExecutor(object):
+    # Goes through the same snapshot path as a process pool.
+    def map(self, function, iterable):
+        return map(function, iterable)
+
+class TestParallel(unittest.TestCase):
+    def setUp(self):
+        test_buffs = buffs.Buffs('stat_multiplier_buff', 'crit_chance_buff', 'mastery_buff', 'haste_buff', 'attack_power_buff')
+        test_mh = stats.Weapon(410., 2.6, 'sword', 'dancing_steel')
+        test_oh = stats.Weapon(410., 2.6, 'sword', 'dancing_steel')
+        test_procs = procs.ProcsList(('scales_of_doom', 691), 'draenic_agi_pot')
+        test_gear_buffs = stats.GearBuffs('gear_specialization')
+        test_stats = stats.Stats(test_mh, test_oh, test_procs, test_gear_buffs, agi=3650, stam=2426, crit=1039, haste=1100,
+                                 mastery=1015, readiness=0, versatility=122, multistrike=1034)
+        test_talents = talents.Talents('3111121', 'rogue', 100)
+        test_glyphs = glyphs.Glyphs('rogue', 'energy', 'disappearance')
+        test_cycle = settings.CombatCycle(revealing_strike_pooling=True, blade_flurry=False)
+        test_settings = settings.Settings(test_cycle, response_time=.5, duration=360, dmg_poison='dp', utl_poison='lp')
+        self.calculator = AldrianasRogueDamageCalculator(test_stats, test_talents, test_glyphs, test_buffs, race.Race('troll'), test_settings, 100)
+
+    def test_apply_and_revert_changes(self):
+        old_proc = self.calculator.stats.procs.scales_of_doom
+        old_speed = self.calculator.stats.mh.speed
+        undo_list = parallel.apply_changes(self.calculator, [('stat', 'agi', 10.), ('talent', 'anticipation'),
+                                                             ('del_proc', 'scales_of_doom'), ('set_proc', 'malicious_censer', 700),
+                                                             ('weapon', 'mh', 'speed', 1.8), ('enchant', 'oh', None)])
+        self.assertEqual(self.calculator.stats.agi, 3660)
+        self.assertTrue(self.calculator.talents.anticipation)
+        self.assertFalse(self.calculator.stats.procs.scales_of_doom)
+        self.assertEqual(self.calculator.stats.procs.malicious_censer.item_level, 700)
+        self.assertEqual(self.calculator.stats.mh.speed, 1.8)
+        self.assertFalse(self.calculator.stats.oh.dancing_steel)
+        parallel.revert_changes(self.calculator, undo_list)
+        self.assertEqual(self.calculator.stats.agi, 3650)
+        self.assertFalse(self.calculator.talents.anticipation)
+        self.assertTrue(self.calculator.stats.procs.scales_of_doom is old_proc)
+        self.assertFalse(self.calculator.stats.procs.malicious_censer)
+        self.assertEqual(self.calculator.stats.mh.speed, old_speed)
+        self.assertTrue(self.calculator.stats.oh.dancing_steel)
+
+    def test_executor(self):
+        executor = InProcessExecutor()
+        self.assertEqual(self.calculator.get_ep(), self.calculator.get_ep(executor=executor))
+        self.assertEqual(self.calculator.get_talents_ranking(), self.calculator.get_talents_ranking(executor=executor))
+        upgrades = {'scales_of_doom': [680, 691, 700]}
+        self.assertEqual(self.calculator.get_upgrades_ep(upgrades), self.calculator.get_upgrades_ep(upgrades, executor=executor))
+
+    def test_upgrades_ep_fast_exclude_list(self):
+        # scales_of_doom stays equipped and gets measured against the dps
+        # without it, as if ranked one by one.
+        upgrades = {'scales_of_doom': [680, 700], 'malicious_censer': [700]}
+        ep_values = self.calculator.get_upgrades_ep_fast(upgrades, 'agi', exclude_list=['malicious_censer'])
+        self.assertTrue(self.calculator.stats.procs.scales_of_doom)
+        undo_list = parallel.apply_changes(self.calculator, [('del_proc', 'scales_of_doom')])
+        try:
+            base_dps = self.calculator.get_dps()
+            normalize_dps = self.calculator.get_dps_for_changes([[('stat', 'agi', 1.)]])[0]
+            for item_level in upgrades['scales_of_doom']:
+                new_dps = self.calculator.get_dps_for_changes([[('set_proc', 'scales_of_doom', item_level)]])[0]
+                self.assertAlmostEqual(ep_values['scales_of_doom'][item_level], (new_dps - base_dps) / (normalize_dps - base_dps), 10)
+        finally:
+            parallel.revert_changes(self.calculator, undo_list)
+        self.assertTrue(ep_values['scales_of_doom'][680] > 100)
+        self.assertEqual(self.calculator.get_upgrades_ep_fast(upgrades, 'agi', exclude_list=['malicious_censer'],
+                                                              executor=InProcessExecutor()), ep_values)
+
+    def test_executor_warm_start(self):
+        self.calculator.settings.warm_start = True
+        executor = InProcessExecutor()
+        self.assertEqual(self.calculator.get_ep(), self.calculator.get_ep(executor=executor))
+
+    def test_invalid_change(self):
+        jobs = [[], [('stat', 'not_a_stat', 1.)]]
+        self.assertRaises(AttributeError, self.calculator.get_dps_for_changes, jobs)
+        self.assertRaises(AttributeError, parallel.apply_changes, self.calculator, [('stat', 'not_a_stat', 1.)])
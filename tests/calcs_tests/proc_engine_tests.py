@@ -0,0 +1,61 @@
+import math
+import unittest
+from shadowcraft.calcs import dual_number
+from shadowcraft.calcs import proc_engine
+from shadowcraft.objects import procs
+from calcs_tests.dps_cache_tests import make_calculator
+
+def make_procs():
+    # One proc for each formula: no icd, no icd with stacks, and an icd.
+    stacking = procs.Proc(stat='stats', value={'agi': 1}, duration=20, max_stacks=5, type='rppm', proc_rate=2,
+                          haste_scales=True, proc_name='Stacking')
+    return [procs.templates['scales_of_doom'](691), stacking, procs.templates['legendary_capacitive_meta'](),
+            procs.templates['fury_of_xuen']()]
+
+class TestRppmEngine(unittest.TestCase):
+    def test_uptimes(self):
+        engine = proc_engine.RppmEngine(make_procs())
+        haste_factors = engine.get_haste_factors(1.2)
+        self.assertEqual(haste_factors, [1., 1.2, 1.2, 1.2])
+        uptimes = engine.get_uptimes(1.2)
+        scales = engine.procs[0]
+        self.assertAlmostEqual(uptimes[0], 1.1307 * (1 - math.exp(-scales.proc_rate * scales.duration / 60.)), 12)
+        for proc, haste, uptime in zip(engine.procs, haste_factors, uptimes):
+            self.assertEqual(uptime, proc_engine.get_rppm_uptime(haste, proc.get_rppm_proc_rate(), proc.duration,
+                                                                 proc.icd, proc.max_stacks))
+        engine.set_uptimes(1.2)
+        self.assertEqual([proc.uptime for proc in engine.procs], uptimes)
+
+    def test_frequencies(self):
+        engine = proc_engine.RppmEngine(make_procs())
+        frequencies = engine.get_frequencies(1.2)
+        meta = engine.procs[2]
+        # The meta only does damage at max stacks.
+        self.assertAlmostEqual(frequencies[2], 1.1307 / ((60. / (1.2 * meta.proc_rate) + meta.icd - 1) * 5), 12)
+        self.assertAlmostEqual(frequencies[0], 1.1307 * engine.procs[0].proc_rate / 60, 12)
+
+    def test_calculator(self):
+        # The batched uptimes are the ones of set_rppm_uptime, bit for bit.
+        calculator = make_calculator()
+        calculator.get_dps()
+        engine = proc_engine.RppmEngine(make_procs())
+        for proc, uptime in zip(engine.procs, engine.get_uptimes(calculator.get_rppm_haste_multiplier())):
+            calculator.set_rppm_uptime(proc)
+            self.assertEqual(proc.uptime, uptime)
+
+    def test_empty(self):
+        engine = proc_engine.RppmEngine([])
+        self.assertEqual(len(engine), 0)
+        self.assertEqual(engine.get_uptimes(1.), [])
+        self.assertEqual(engine.get_frequencies(1.), [])
+
+    def test_dual_number(self):
+        # Derivatives go through the engine, for DamageCalculator.get_dps_gradient.
+        engine = proc_engine.RppmEngine(make_procs())
+        haste = dual_number.DualNumber.variable(1.2, 0, 1)
+        step = 1e-6
+        for values, get_values in ((engine.get_uptimes(haste), engine.get_uptimes),
+                                   (engine.get_frequencies(haste), engine.get_frequencies)):
+            for value, plain_value, stepped_value in zip(values, get_values(1.2), get_values(1.2 + step)):
+                self.assertEqual(dual_number.value_of(value), plain_value)
+                self.assertAlmostEqual(dual_number.derivatives_of(value, 1)[0], (stepped_value - plain_value) / step, 4)
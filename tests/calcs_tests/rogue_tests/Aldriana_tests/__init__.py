@@ -1,4 +1,5 @@
 import unittest
+from shadowcraft.calcs import DamageCalculator
 from shadowcraft.calcs.rogue.Aldriana import AldrianasRogueDamageCalculator
 from shadowcraft.calcs.rogue.Aldriana import settings
 
@@ -6,8 +7,12 @@ from shadowcraft.objects import buffs
 from shadowcraft.objects import race
 from shadowcraft.objects import stats
 from shadowcraft.objects import procs
-from shadowcraft.objects.rogue import rogue_talents
-from shadowcraft.objects.rogue import rogue_glyphs
+from shadowcraft.objects import talents
+from shadowcraft.objects import glyphs
+
+class FiniteDifferenceCalculator(AldrianasRogueDamageCalculator):
+    # A model without dual number support.
+    get_dps_gradient = DamageCalculator.__dict__['get_dps_gradient']
 
 class TestAldrianasRogueDamageCalculator(unittest.TestCase):
     def test_get_ep(self):
@@ -33,3 +38,104 @@ class TestAldrianasRogueDamageCalculator(unittest.TestCase):
         self.assertTrue(ep_values['yellow_hit'] > 1.0)
         self.assertTrue(ep_values['crit'] < 2.0)
         self.assertTrue(ep_values['crit'] > 0.0)
+
+
+class TestAldrianasRogueDamageCalculatorEP(unittest.TestCase):
+    def setUp(self):
+        test_buffs = buffs.Buffs('stat_multiplier_buff', 'crit_chance_buff', 'mastery_buff', 'haste_buff', 'multistrike_buff',
+                                 'versatility_buff', 'attack_power_buff', 'physical_vulnerability_debuff', 'spell_damage_debuff')
+        test_mh = stats.Weapon(812.0, 1.8, 'dagger', 'mark_of_the_shattered_hand')
+        test_oh = stats.Weapon(812.0, 1.8, 'dagger', 'mark_of_the_frostwolf')
+        test_procs = procs.ProcsList(('scales_of_doom', 691), 'draenic_agi_pot', 'draenic_agi_prepot')
+        test_gear_buffs = stats.GearBuffs('gear_specialization')
+        test_stats = stats.Stats(test_mh, test_oh, test_procs, test_gear_buffs, agi=3650, stam=2426, crit=1539, haste=0,
+                                 mastery=1615, readiness=0, versatility=122, multistrike=1034)
+        test_talents = talents.Talents('3322122', 'rogue', 100)
+        test_glyphs = glyphs.Glyphs('rogue', 'disappearance', 'vendetta')
+        test_cycle = settings.AssassinationCycle(min_envenom_size_non_execute=4, min_envenom_size_execute=5)
+        test_settings = settings.Settings(test_cycle, response_time=.5, duration=360, dmg_poison='dp', utl_poison='lp')
+        self.calculator = AldrianasRogueDamageCalculator(test_stats, test_talents, test_glyphs, test_buffs, race.Race('none'), test_settings, 100)
+
+    def test_get_ep_batch(self):
+        ep_values = self.calculator.get_ep()
+        batch_ep_values = self.calculator.get_ep_batch()
+        for stat in ep_values:
+            self.assertAlmostEqual(ep_values[stat], batch_ep_values[stat])
+        # Larger perturbations give per point values.
+        scaled_ep_values = self.calculator.get_ep(deltas={'agi': 10., 'crit': 10.})
+        for stat in ep_values:
+            self.assertAlmostEqual(ep_values[stat], scaled_ep_values[stat], places=2)
+
+    def test_get_dps_for_stat_deltas(self):
+        # State the estimate creates doesn't outlive the runs.
+        self.calculator.get_dps_for_stat_deltas([{'agi': 100.}])
+        self.assertFalse(hasattr(self.calculator, 'emp_envenom_percentage'))
+        self.assertFalse(hasattr(self.calculator, 'current_variables'))
+        baseline_dps = self.calculator.get_dps()
+        dps_values = self.calculator.get_dps_for_stat_deltas([{}, {'agi': 100.}, {}])
+        self.assertAlmostEqual(dps_values[0], baseline_dps)
+        self.assertAlmostEqual(dps_values[2], baseline_dps)
+        self.assertTrue(dps_values[1] > baseline_dps)
+        self.assertAlmostEqual(self.calculator.get_dps(), baseline_dps)
+
+    def test_shared_proc_setup(self):
+        # The real ppm values are shared until haste changes.
+        deltas_list = [{}, {'haste': 100.}, {'agi': 100.}, {'haste': 100.}, {}]
+        jobs = [[('stat', stat, delta) for stat, delta in deltas.items()] for deltas in deltas_list]
+        dps_values = self.calculator.get_dps_for_changes(jobs)
+        for dps, expected_dps in zip(self.calculator.get_dps_for_stat_deltas(deltas_list), dps_values):
+            self.assertAlmostEqual(dps, expected_dps)
+        self.assertTrue(self.calculator.proc_setup is None)
+
+    def test_get_ep_gradient(self):
+        ep_values = self.calculator.get_ep()
+        gradient_ep_values = self.calculator.get_ep_gradient()
+        for stat in ep_values:
+            self.assertAlmostEqual(ep_values[stat], gradient_ep_values[stat], places=2)
+        dps, gradient = self.calculator.get_dps_gradient(['agi'])
+        self.assertAlmostEqual(dps, self.calculator.get_dps())
+        self.assertTrue(gradient['agi'] > 0)
+
+    def test_finite_difference_gradient(self):
+        ep_values = self.calculator.get_ep()
+        exact_dps, exact_gradient = self.calculator.get_dps_gradient()
+        self.calculator.__class__ = FiniteDifferenceCalculator
+        dps, gradient = self.calculator.get_dps_gradient()
+        self.assertAlmostEqual(dps, exact_dps)
+        for stat in exact_gradient:
+            self.assertAlmostEqual(gradient[stat], exact_gradient[stat], places=2)
+        gradient_ep_values = self.calculator.get_ep_gradient()
+        for stat in ep_values:
+            self.assertAlmostEqual(ep_values[stat], gradient_ep_values[stat])
+
+    def test_assassination_cp_distribution_for_finisher(self):
+        crit_rates = {'mutilate': 0., 'dispatch': 0.}
+        ability_count = {'mutilate': 0, 'dispatch': 0}
+        size_breakdown = [0, 0, 0, 0, 0, 0]
+        avg_cp, avg_bs, avg_count, avg_breakdown = self.calculator.assassination_cp_distribution_for_finisher(0, crit_rates, ability_count,
+                                                                                                              size_breakdown, cp_limit=2)
+        self.assertAlmostEqual(avg_cp, 2.3)
+        self.assertAlmostEqual(avg_bs, 0.)
+        self.assertAlmostEqual(avg_count['mutilate'], 1.)
+        self.assertAlmostEqual(avg_count['dispatch'], .3)
+        for size, chance in zip(avg_breakdown, [0, 0, .7, .3, 0, 0]):
+            self.assertAlmostEqual(size, chance)
+        avg_cp, avg_bs, avg_count, avg_breakdown = self.calculator.assassination_cp_distribution_for_finisher(0, crit_rates, ability_count,
+                                                                                                              size_breakdown, execute=True)
+        self.assertAlmostEqual(avg_cp, 5.)
+        self.assertAlmostEqual(avg_count['dispatch'], 5.)
+        self.assertAlmostEqual(avg_breakdown[5], 1.)
+
+    def test_convergence_strategies(self):
+        baseline_dps = self.calculator.get_dps()
+        for strategy in ('aitken', 'anderson'):
+            self.calculator.settings.convergence = strategy
+            self.assertAlmostEqual(self.calculator.get_dps(), baseline_dps, places=4)
+
+    def test_warm_start(self):
+        ep_values = self.calculator.get_ep()
+        self.calculator.settings.warm_start = True
+        warm_ep_values = self.calculator.get_ep()
+        self.assertTrue(self.calculator.warm_start_states)
+        for stat in ep_values:
+            self.assertAlmostEqual(ep_values[stat], warm_ep_values[stat])
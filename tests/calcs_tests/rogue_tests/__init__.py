@@ -5,7 +5,7 @@ from shadowcraft.objects import buffs
 from shadowcraft.objects import race
 from shadowcraft.objects import stats
 from shadowcraft.objects import procs
-from shadowcraft.objects.rogue import rogue_talents
+from shadowcraft.objects import talents
 
 class TestRogueDamageCalculator(unittest.TestCase):
     def setUp(self):
@@ -0,0 +1,37 @@
+import unittest
+from shadowcraft.calcs.rogue import combo_point_chain
+from shadowcraft.core import exceptions
+
+class TestComboPointChain(unittest.TestCase):
+    def test_get_cp_per_move(self):
+        self.assertEqual(combo_point_chain.get_cp_per_move(1), {1: 1.})
+        cp_per_move = combo_point_chain.get_cp_per_move(1, .2, .5)
+        self.assertAlmostEqual(cp_per_move[1], .4)
+        self.assertAlmostEqual(cp_per_move[2], .5)
+        self.assertAlmostEqual(cp_per_move[3], .1)
+
+    def test_builders_per_finisher(self):
+        chain = combo_point_chain.ComboPointChain({1: .75, 2: .25}, start_cp=3)
+        # From 3: one builder reaches 4 or 5; from 4 one more is needed.
+        self.assertAlmostEqual(chain.builders_per_finisher, 1.75)
+        self.assertAlmostEqual(chain.finisher_sizes[5], 1.)
+        self.assertAlmostEqual(sum(chain.time_at_cp), 1.)
+
+    def test_finisher_distribution(self):
+        chain = combo_point_chain.ComboPointChain({1: .5, 2: .5}, target_cp=2)
+        self.assertAlmostEqual(chain.finisher_distribution[(2, 1)], .5)
+        self.assertAlmostEqual(chain.finisher_distribution[(2, 2)], .25)
+        self.assertAlmostEqual(chain.finisher_distribution[(3, 2)], .25)
+        self.assertAlmostEqual(chain.avg_finisher_size, 2.25)
+        self.assertAlmostEqual(chain.avg_cp_per_move, 1.5)
+
+    def test_anticipation(self):
+        # Nothing is wasted with anticipation, so each finisher costs its cp
+        # over the average gain per builder.
+        chain = combo_point_chain.ComboPointChain({1: .8, 2: .2}, anticipation_charges=5, start_cp=1)
+        self.assertAlmostEqual(chain.builders_per_finisher, 4. / 1.2)
+        self.assertAlmostEqual(chain.finisher_sizes[5], 1.)
+
+    def test_invalid_chain(self):
+        self.assertRaises(exceptions.InvalidInputException, combo_point_chain.ComboPointChain, {0: .5, 1: .5})
+        self.assertRaises(exceptions.InvalidInputException, combo_point_chain.ComboPointChain, {1: 1.}, target_cp=6)
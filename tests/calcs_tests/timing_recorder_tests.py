@@ -0,0 +1,55 @@
+import json
+import unittest
+from shadowcraft.calcs import timing_recorder
+from shadowcraft.calcs.rogue.Aldriana import settings
+from calcs_tests.dps_cache_tests import make_calculator
+
+class TestTimingRecorder(unittest.TestCase):
+    def test_nested_report(self):
+        recorder = timing_recorder.TimingRecorder()
+        with recorder.timer('outer'):
+            for i in xrange(3):
+                with recorder.timer('inner'):
+                    pass
+        with recorder.timer('other'):
+            pass
+        report = recorder.get_report()
+        self.assertEqual([child['name'] for child in report['children']], ['outer', 'other'])
+        outer = report['children'][0]
+        self.assertEqual(outer['calls'], 1)
+        self.assertEqual([(child['name'], child['calls']) for child in outer['children']], [('inner', 3)])
+        self.assertTrue(outer['time'] >= outer['children'][0]['time'])
+        self.assertEqual(json.loads(recorder.get_json()), json.loads(json.dumps(report)))
+        lines = recorder.get_table().splitlines()
+        self.assertEqual([line.split()[0] for line in lines], ['phase', 'outer', 'outer/inner', 'other'])
+        recorder.clear()
+        self.assertEqual(recorder.get_report()['children'], [])
+
+    def test_stopped_on_exception(self):
+        recorder = timing_recorder.TimingRecorder()
+        try:
+            with recorder.timer('failing'):
+                raise ValueError()
+        except ValueError:
+            pass
+        self.assertEqual(recorder.stack, [recorder.root])
+
+    def test_calculator_phases(self):
+        calculator = make_calculator()
+        calculator.settings.cycle = settings.SubtletyCycle(5, use_hemorrhage='always')
+        calculator.recorder = timing_recorder.TimingRecorder()
+        calculator.get_dps()
+        report = calculator.recorder.get_report()
+        self.assertEqual([child['name'] for child in report['children']], ['get_dps'])
+        phases = dict((child['name'], child) for child in report['children'][0]['children'])
+        for phase in ('init_subtlety', 'determine_stats', 'get_damage_breakdown'):
+            self.assertTrue(phase in phases)
+        self.assertEqual(phases['init_subtlety']['children'][0]['name'], 'set_constants')
+        iterations = [child for child in phases['determine_stats']['children'] if child['name'] == 'determine_stats_iteration'][0]
+        self.assertTrue(iterations['calls'] > 1)
+        self.assertTrue('subtlety_attack_counts' in [child['name'] for child in iterations['children']])
+
+    def test_disabled(self):
+        calculator = make_calculator()
+        self.assertTrue(calculator.timer('phase') is timing_recorder.null_timer)
+        self.assertEqual(calculator.get_dps(), make_calculator().get_dps())
@@ -0,0 +1,60 @@
+import unittest
+from shadowcraft.objects import priority_list
+
+class State(object):
+    def __init__(self, **values):
+        self.__dict__.update(values)
+
+def get_variable(name):
+    if name in ('energy', 'combo_points', 'anticipation'):
+        return lambda state, time: getattr(state, name)
+    if name == 'time':
+        return lambda state, time: time
+    return None
+
+class TestPriorityList(unittest.TestCase):
+    def get_value(self, condition, time=0, **values):
+        apl = priority_list.PriorityList('yes,if=' + condition)
+        compiled = apl.compile(get_variable)
+        return compiled.get_action(State(**values), time) == 'yes'
+
+    def test_parse(self):
+        apl = priority_list.PriorityList('eviscerate,if=combo_points>=5', 'sinister_strike')
+        self.assertEqual(apl.get_action_names(), ['eviscerate', 'sinister_strike'])
+        self.assertEqual(apl.actions[0][1], ('binary', '>=', ('variable', 'combo_points'), ('number', 5.)))
+        self.assertEqual(apl.actions[1][1], None)
+
+    def test_precedence(self):
+        self.assertTrue(self.get_value('energy>=30+2*10&combo_points<5', energy=50, combo_points=4))
+        self.assertFalse(self.get_value('energy>=30+2*10&combo_points<5', energy=49, combo_points=4))
+        self.assertTrue(self.get_value('combo_points=5|energy>90&anticipation=0', combo_points=5, energy=0, anticipation=3))
+        self.assertFalse(self.get_value('(combo_points=5|energy>90)&anticipation=0', combo_points=5, energy=0, anticipation=3))
+        self.assertTrue(self.get_value('!anticipation&-energy<-10', energy=20, anticipation=0))
+        self.assertTrue(self.get_value('energy/0=0&energy==20&energy!=19', energy=20))
+        self.assertTrue(self.get_value('time>1.5', time=2))
+        self.assertTrue(self.get_value('energy', energy=1))
+        self.assertFalse(self.get_value('energy', energy=0))
+
+    def test_constant_folding(self):
+        apl = priority_list.PriorityList('a,if=2*3>5&!0')
+        self.assertEqual(priority_list.fold_constants(apl.actions[0][1]), ('number', 1.))
+
+    def test_thresholds(self):
+        apl = priority_list.PriorityList('a,if=energy>=50&(5<combo_points|anticipation)', 'b,if=energy>=50', 'c')
+        self.assertEqual(apl.thresholds, [('energy', 50.), ('combo_points', 5.), ('anticipation', None)])
+
+    def test_order_and_ready_checks(self):
+        apl = priority_list.PriorityList('a,if=energy>50', 'b', 'c')
+        ready = {'a': True, 'b': False, 'c': True}
+        compiled = apl.compile(get_variable, lambda name: lambda state, time: ready[name])
+        self.assertEqual(compiled.get_action(State(energy=60), 0), 'a')
+        self.assertEqual(compiled.get_action(State(energy=40), 0), 'c')
+        ready['c'] = False
+        self.assertEqual(compiled.get_action(State(energy=40), 0), None)
+
+    def test_errors(self):
+        for entry in ('Bad Name', 'a,when=energy', 'a,if=', 'a,if=energy>', 'a,if=(energy', 'a,if=energy)',
+                      'a,if=energy$1', 'a,if=energy 5'):
+            self.assertRaises(priority_list.InvalidPriorityListException, priority_list.PriorityList, entry)
+        apl = priority_list.PriorityList('a,if=focus>5')
+        self.assertRaises(priority_list.InvalidPriorityListException, apl.compile, get_variable)
@@ -1,4 +1,7 @@
+import cPickle
 import unittest
+from shadowcraft.core import exceptions
+from shadowcraft.objects import class_data
 from shadowcraft.objects import procs
     
 class TestProcsList(unittest.TestCase):
@@ -74,3 +77,113 @@ class TestProc(unittest.TestCase):
 
     def test_proc_rate(self):
         self.assertEqual(self.proc.proc_rate(), self.proc.proc_chance)
+
+
+class TestProcTemplates(unittest.TestCase):
+    def test_compiled(self):
+        for name in procs.ProcsList.allowed_procs:
+            self.assertTrue(issubclass(procs.templates[name], procs.Proc))
+        proc = procs.templates['scales_of_doom']()
+        self.assertEqual(proc.item_level, 665)
+        self.assertEqual(proc.stat, 'stats')
+        self.assertEqual(proc.icd, 0)
+
+    def test_profiles_independent(self):
+        low = procs.ProcsList(('scales_of_doom', 665)).scales_of_doom
+        high = procs.ProcsList(('scales_of_doom', 700)).scales_of_doom
+        self.assertTrue(type(low) is type(high))
+        self.assertTrue(low.value['multistrike'] < high.value['multistrike'])
+        self.assertEqual(procs.ProcsList.allowed_procs['scales_of_doom']['item_level'], 665)
+        procs_list = procs.ProcsList()
+        procs_list.set_proc('scales_of_doom')
+        self.assertEqual(procs_list.scales_of_doom.item_level, 665)
+
+    def test_read_only(self):
+        proc = procs.templates['draenic_agi_pot']()
+        self.assertRaises(AttributeError, setattr, proc, 'duration', 1)
+        self.assertRaises(AttributeError, setattr, procs.templates['draenic_agi_pot'], 'duration', 1)
+        self.assertRaises(TypeError, proc.value.__setitem__, 'agi', 1)
+        proc.icd = 360
+        self.assertEqual(procs.templates['draenic_agi_pot']().icd, 0)
+
+    def test_validation(self):
+        data = {'stat': 'stats', 'value': {'agi': 1}, 'duration': 10, 'proc_name': 'Test'}
+        self.assertEqual(procs.Proc(**data).value, {'agi': 1})
+        for field, value in (('type', 'unknown'), ('trigger', 'unknown'), ('icd', None), ('value', 1), ('unknown', 1)):
+            bad_data = dict(data)
+            bad_data[field] = value
+            self.assertRaises(procs.InvalidProcException, procs.compile_template, 'test', bad_data, ('data', bad_data))
+        del data['duration']
+        self.assertRaises(procs.InvalidProcException, procs.compile_template, 'test', data, ('data', data))
+
+    def test_scaled_values(self):
+        proc = procs.templates['scales_of_doom'](700)
+        self.assertEqual(proc.value, {'multistrike': round(proc.scaling * class_data.Util().get_random_prop_point(700))})
+        self.assertTrue(procs.templates['scales_of_doom'](700).value is proc.value)
+        self.assertFalse(procs.templates['scales_of_doom'](705).value is proc.value)
+        self.assertRaises(TypeError, proc.value.__setitem__, 'multistrike', 1)
+        self.assertEqual(class_data.get_random_prop_point(700), class_data.Util.RANDOM_PROP_POINTS[700][1])
+        self.assertRaises(exceptions.InvalidInputException, class_data.get_random_prop_point, 0)
+
+    def test_table(self):
+        table = procs.TemplateTable('procs', procs.ProcsList.allowed_procs)
+        self.assertEqual(sorted(table), sorted(procs.ProcsList.allowed_procs))
+        self.assertTrue('scales_of_doom' in table)
+        self.assertEqual(len(table), len(procs.ProcsList.allowed_procs))
+        template = table['scales_of_doom']
+        self.assertTrue(table['scales_of_doom'] is template)
+        self.assertEqual(template.template_reference, ('procs', 'scales_of_doom'))
+        self.assertEqual(len(table.items()), len(table))
+        self.assertEqual(len(table.values()), len(table))
+        self.assertEqual(dict(table), dict(table.iteritems()))
+        self.assertTrue(table.get('unknown') is None)
+        self.assertRaises(KeyError, table.__getitem__, 'unknown')
+
+    def test_table_validation(self):
+        # One incomplete entry fails the lookups of every other one.
+        data = dict(procs.ProcsList.allowed_procs)
+        data['incomplete'] = {'stat': 'stats', 'value': {'agi': 1}}
+        table = procs.TemplateTable('procs', data)
+        self.assertEqual(len(table), len(data))
+        self.assertRaises(procs.InvalidProcException, table.__getitem__, 'scales_of_doom')
+        self.assertRaises(procs.InvalidProcException, table.get, 'scales_of_doom')
+
+    def test_pickle(self):
+        proc = procs.ProcsList(('scales_of_doom', 700)).scales_of_doom
+        proc.uptime = .5
+        copy = cPickle.loads(cPickle.dumps(proc, cPickle.HIGHEST_PROTOCOL))
+        self.assertTrue(type(copy) is type(proc))
+        self.assertEqual((copy.item_level, copy.value, copy.uptime), (proc.item_level, proc.value, proc.uptime))
+
+
+class TestActiveProcs(unittest.TestCase):
+    def setUp(self):
+        self.procsList = procs.ProcsList(('scales_of_doom', 691), 'draenic_agi_pot', 'mark_of_the_shattered_hand_dot')
+
+    def test_index(self):
+        self.assertEqual(sorted(self.procsList.active_procs), ['draenic_agi_pot', 'mark_of_the_shattered_hand_dot', 'scales_of_doom'])
+        self.procsList.del_proc('draenic_agi_pot')
+        del self.procsList.scales_of_doom
+        self.procsList.set_proc('virmens_bite')
+        self.assertEqual(sorted(self.procsList.active_procs), ['mark_of_the_shattered_hand_dot', 'virmens_bite'])
+        self.procsList.level = 100
+        self.assertEqual(len(self.procsList.active_procs), 2)
+
+    def test_order(self):
+        order = [name for name in procs.ProcsList.allowed_procs if name in self.procsList.active_procs]
+        self.assertEqual([proc.template_name for proc in self.procsList.get_active_procs()], order)
+
+    def test_groups(self):
+        groups = self.procsList.get_proc_groups()
+        self.assertEqual([proc.template_name for proc in groups['stats_rppm']], ['scales_of_doom'])
+        self.assertEqual([proc.template_name for proc in groups['stats']], ['draenic_agi_pot'])
+        self.assertEqual([proc.template_name for proc in groups['damage']], ['mark_of_the_shattered_hand_dot'])
+        self.assertTrue(self.procsList.get_proc_groups() is groups)
+        self.procsList.del_proc('draenic_agi_pot')
+        self.assertEqual(self.procsList.get_proc_groups()['stats'], [])
+
+    def test_pickle(self):
+        copy = cPickle.loads(cPickle.dumps(self.procsList, cPickle.HIGHEST_PROTOCOL))
+        self.assertTrue(copy.active_procs['scales_of_doom'] is copy.scales_of_doom)
+        copy.del_proc('scales_of_doom')
+        self.assertEqual(copy.get_proc_groups()['stats_rppm'], [])
@@ -6,13 +6,30 @@ sys.path.append(path.abspath(path.join(path.dirname(__file__), '..')))
 
 from calcs_tests import TestDamageCalculator
 from calcs_tests.armor_mitigation_tests import TestArmorMitigation
+from calcs_tests.convergence_tests import TestConvergence
+from calcs_tests.darkmantle_tests.aura_tests import TestAuras
+from calcs_tests.darkmantle_tests.batch_tests import TestBatchSimulation
+from calcs_tests.darkmantle_tests.bucket_tests import TestBucketSink, TestBucketStatistics
+from calcs_tests.darkmantle_tests.monte_carlo_tests import TestRunningStatistics, TestMonteCarlo
+from calcs_tests.darkmantle_tests.priority_list_tests import TestRoguePriorityList, TestWakeUps
+from calcs_tests.darkmantle_tests.state_tests import TestSimulationState
+from calcs_tests.darkmantle_tests.timeline_tests import TestTimeline, TestRunTimeline
+from calcs_tests.darkmantle_tests.tracing_tests import TestTracing
+from calcs_tests.dps_cache_tests import TestDpsCache, TestFingerprint
+from calcs_tests.dual_number_tests import TestDualNumber
+from calcs_tests.parallel_tests import TestParallel
+from calcs_tests.proc_engine_tests import TestRppmEngine
+from calcs_tests.timing_recorder_tests import TestTimingRecorder
 from calcs_tests.rogue_tests import TestRogueDamageCalculator
 from calcs_tests.rogue_tests import TestRogueDamageCalculatorLevels
+from calcs_tests.rogue_tests.combo_point_chain_tests import TestComboPointChain
 from calcs_tests.rogue_tests.Aldriana_tests import TestAldrianasRogueDamageCalculator
+from calcs_tests.rogue_tests.Aldriana_tests import TestAldrianasRogueDamageCalculatorEP
 from core_tests.exceptions_tests import TestInvalidInputException
 from objects_tests.buffs_tests import TestBuffsTrue, TestBuffsFalse, TestBuffsLevel
 from objects_tests.stats_tests import TestStats, TestWeapon, TestGearBuffs
-from objects_tests.procs_tests import TestProcsList, TestProc
+from objects_tests.procs_tests import TestProcsList, TestProc, TestProcTemplates, TestActiveProcs
+from objects_tests.priority_list_tests import TestPriorityList
 from objects_tests.race_tests import TestRace
 from objects_tests.rogue_tests.rogue_glyphs_tests import TestRogueGlyphs
 from objects_tests.rogue_tests.rogue_talents_tests import TestAssassinationTalents